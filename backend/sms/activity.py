@@ -0,0 +1,110 @@
+"""Admin activity feed over the append-only ActivityEvent log.
+
+Events are written once (``record_event``) and read newest first with
+keyset pagination on (created_at, id), so a page is one indexed query
+however long the log grows. SMS events join their message for its current
+delivery status; recipients are not part of the feed and are loaded per
+entry through ``/api/messages/<id>/recipients/``.
+"""
+
+import logging
+
+from django.db.models import Q
+
+from .analytics import local_day_bounds
+from .models import ActivityEvent
+from .pagination import keyset_page
+
+logger = logging.getLogger(__name__)
+
+FEED_PAGE_SIZE = 25
+
+# Feed status of an SMS event, from its message's status
+_SMS_STATUS_FILTERS = {
+    "success": Q(message__status="sent"),
+    "failed": Q(message__status="failed"),
+    "info": Q(message__isnull=False) & ~Q(message__status__in=["sent", "failed"]),
+}
+
+
+def record_event(category, action, user=None, status="info", details="", message=None):
+    """Append an event to the activity log; never raises into the caller."""
+    try:
+        ActivityEvent.objects.create(
+            category=category,
+            action=action[:100],
+            user=user if getattr(user, "pk", None) else None,
+            status=status,
+            details=(details or "")[:255],
+            message=message,
+        )
+    except Exception:
+        logger.warning(f"⚠️ Could not record {category} activity: {action}")
+
+
+def _status_filter(status):
+    sms = _SMS_STATUS_FILTERS.get(status)
+    if sms is None:
+        return None
+    return sms | Q(message__isnull=True, status=status)
+
+
+def activity_feed(cursor=None, limit=FEED_PAGE_SIZE, user_id=None, status=None, category=None,
+                  start_day=None, end_day=None):
+    """One page of the activity feed, newest first.
+
+    Optional filters: a user id, a feed status (success/failed/info), an
+    event category and a range of local days. Raises
+    pagination.InvalidCursor for a malformed cursor.
+
+    Returns (entries, next_cursor).
+    """
+    events = ActivityEvent.objects.all()
+    if user_id:
+        events = events.filter(user_id=user_id)
+    if category:
+        events = events.filter(category=category)
+    if status:
+        condition = _status_filter(status)
+        events = events.filter(condition) if condition is not None else events.none()
+    if start_day or end_day:
+        start_dt, end_dt = local_day_bounds(start_day or end_day, end_day or start_day)
+        events = events.filter(created_at__range=[start_dt, end_dt])
+
+    rows, next_cursor = keyset_page(
+        events.values(
+            "id", "created_at", "category", "action", "status", "details",
+            "user__email", "user__username", "message_id", "message__status",
+            "message__message_text", "message__total_recipients",
+            "message__successful_deliveries", "message__failed_deliveries",
+        ),
+        cursor=cursor,
+        limit=limit,
+    )
+    return [_entry(row) for row in rows], next_cursor
+
+
+def _entry(row):
+    entry = {
+        "id": row["id"],
+        "timestamp": row["created_at"],
+        "category": row["category"],
+        "action": row["action"],
+        "status": row["status"],
+        "details": row["details"],
+        "user": row["user__email"] or row["user__username"] or "system",
+        "message_id": row["message_id"],
+        "message_text": None,
+    }
+    if row["message_id"]:
+        message_status = row["message__status"]
+        sent = row["message__successful_deliveries"] or 0
+        failed = row["message__failed_deliveries"] or 0
+        entry.update(
+            status="success" if message_status == "sent" else "failed" if message_status == "failed" else "info",
+            action="SMS sent" if message_status == "sent" else "SMS failed" if message_status == "failed"
+            else f"SMS {message_status}",
+            details=f"Recipients: {row['message__total_recipients'] or '-'}, Sent: {sent}, Failed: {failed}",
+            message_text=row["message__message_text"],
+        )
+    return entry
@@ -0,0 +1,488 @@
+"""Report aggregation helpers shared by the reports API and report pages.
+
+Everything here answers a report with a handful of grouped queries rather
+than one query per day/user/row, so report cost depends on the number of
+buckets returned, not on how much history is stored. Daily figures come from
+``DailyUsageRollup``; only sub-day (hourly) series touch recipient rows.
+
+Counts are individual SMS (recipient rows): ``sent`` is every recipient,
+``failed`` includes submit failures.
+"""
+
+from datetime import datetime, timedelta
+
+from django.conf import settings
+
+from django.db.models import Count, F, Max, Q, Sum
+from django.db.models.functions import Coalesce, TruncDate, TruncHour, TruncMonth
+from django.utils import timezone
+
+from .api_error_code_dict import PERMANENT_ERROR_CODES, error_kind, get_error_description
+from .models import SMSMessage, SMSRecipient, User
+from .report_cache import cached_report
+from .rollups import BILLED, FAILED_STATUSES, segment_cost
+
+
+def scoped_messages(user):
+    """SMSMessage queryset visible to `user` (admins see everything)."""
+    if user.role == "admin":
+        return SMSMessage.objects.all()
+    return SMSMessage.objects.filter(user=user)
+
+
+def scoped_recipients(user):
+    """SMSRecipient queryset visible to `user` (admins see everything)."""
+    if user.role == "admin":
+        return SMSRecipient.objects.all()
+    return SMSRecipient.objects.filter(message__user=user)
+
+
+def local_day_bounds(start_day, end_day):
+    """Aware datetimes covering local calendar days start_day..end_day inclusive."""
+    start_dt = timezone.make_aware(datetime.combine(start_day, datetime.min.time()))
+    end_dt = timezone.make_aware(datetime.combine(end_day, datetime.max.time()))
+    return start_dt, end_dt
+
+
+def bucketed_delivery_counts(messages_qs, start_dt, end_dt, bucket="day"):
+    """Sent/delivered/failed SMS per day (or hour) of `messages_qs` in one GROUP BY.
+
+    Buckets are local (TIME_ZONE, Asia/Kolkata) days or hours of the message
+    creation time; on MySQL this relies on the server's time zone tables for
+    CONVERT_TZ. Buckets with no messages are filled with zeros so charts get
+    a continuous series.
+
+    Returns a list of {'date', 'sent', 'delivered', 'failed'} dicts.
+    """
+    tz = timezone.get_current_timezone()
+    if bucket == "hour":
+        trunc = TruncHour("message__created_at", tzinfo=tz)
+    else:
+        trunc = TruncDate("message__created_at", tzinfo=tz)
+
+    rows = (
+        SMSRecipient.objects.filter(message__in=messages_qs.filter(created_at__range=[start_dt, end_dt]))
+        .annotate(bucket=trunc)
+        .values("bucket")
+        .annotate(
+            sent=Count("id"),
+            delivered=Count("id", filter=Q(status="delivered")),
+            failed=Count("id", filter=Q(status__in=FAILED_STATUSES)),
+        )
+        .order_by("bucket")
+    )
+
+    if bucket == "hour":
+        def label(value):
+            return timezone.localtime(value, tz).strftime("%Y-%m-%d %H:00")
+        step = timedelta(hours=1)
+        current = timezone.localtime(start_dt, tz).replace(minute=0, second=0, microsecond=0)
+        last = timezone.localtime(end_dt, tz)
+    else:
+        def label(value):
+            return value.strftime("%Y-%m-%d")
+        step = timedelta(days=1)
+        current = timezone.localtime(start_dt, tz).date()
+        last = timezone.localtime(end_dt, tz).date()
+
+    found = {label(row["bucket"]): row for row in rows if row["bucket"] is not None}
+
+    trends = []
+    while current <= last:
+        key = label(current)
+        row = found.get(key, {})
+        trends.append({
+            "date": key,
+            "sent": row.get("sent", 0),
+            "delivered": row.get("delivered", 0),
+            "failed": row.get("failed", 0),
+        })
+        current += step
+    return trends
+
+
+def rollup_trends(rollups_qs, start_day, end_day):
+    """Daily sent/delivered/failed for local days start_day..end_day from the usage rollup.
+
+    Same shape as bucketed_delivery_counts(); admins' querysets span every
+    user and are summed per day.
+    """
+    rows = (
+        rollups_qs.filter(date__range=[start_day, end_day])
+        .values("date")
+        .annotate(sent=Sum("sent"), delivered=Sum("delivered"), failed=Sum("failed"))
+        .order_by("date")
+    )
+    found = {row["date"]: row for row in rows}
+
+    trends = []
+    day = start_day
+    while day <= end_day:
+        row = found.get(day, {})
+        trends.append({
+            "date": day.strftime("%Y-%m-%d"),
+            "sent": row.get("sent") or 0,
+            "delivered": row.get("delivered") or 0,
+            "failed": row.get("failed") or 0,
+        })
+        day += timedelta(days=1)
+    return trends
+
+
+def monthly_message_stats(messages_qs, months=12):
+    """Messages sent and failed per local month over the trailing `months`, in one GROUP BY.
+
+    A message is dated by sent_at, falling back to created_at. Only months
+    with messages are returned, oldest first.
+    """
+    tz = timezone.get_current_timezone()
+    first_month = timezone.localdate().replace(day=1)
+    for _ in range(max(months, 1) - 1):
+        first_month = (first_month - timedelta(days=1)).replace(day=1)
+    since = timezone.make_aware(datetime.combine(first_month, datetime.min.time()))
+
+    rows = (
+        # Same window as Coalesce(...) >= since, written so each branch can use an index
+        messages_qs.filter(Q(sent_at__gte=since) | Q(sent_at__isnull=True, created_at__gte=since))
+        .annotate(month=TruncMonth(Coalesce("sent_at", "created_at"), tzinfo=tz))
+        .values("month")
+        .annotate(sent=Count("id"), failed=Count("id", filter=Q(status="failed")))
+        .order_by("month")
+    )
+    rows = [row for row in rows if row["month"] is not None]
+    return {
+        "months": [row["month"].strftime("%Y-%m") for row in rows],
+        "sent": [row["sent"] for row in rows],
+        "failed": [row["failed"] for row in rows],
+    }
+
+
+def cached_monthly_stats(user):
+    """monthly_message_stats() for the user's scope, cached until its data changes."""
+    months = settings.APP_SETTINGS.get("DASHBOARD_CHART_MONTHS", 12)
+    return cached_report(
+        user, "monthly_stats", {"months": months},
+        lambda: monthly_message_stats(scoped_messages(user), months),
+    )
+
+
+def summarize_trends(trends):
+    """Totals and delivery rate over a list produced by bucketed_delivery_counts()."""
+    total_sent = sum(d["sent"] for d in trends)
+    total_delivered = sum(d["delivered"] for d in trends)
+    total_failed = sum(d["failed"] for d in trends)
+    delivery_rate = (total_delivered / total_sent * 100) if total_sent > 0 else 0
+    return {
+        "total_sent": total_sent,
+        "total_delivered": total_delivered,
+        "total_failed": total_failed,
+        "delivery_rate": round(delivery_rate, 1),
+    }
+
+
+# Usage report sort keys -> ORM ordering
+USAGE_SORT_FIELDS = {
+    "user": "email",
+    "role": "role",
+    "messages_sent": "messages_sent",
+    "last_activity": "last_activity",
+}
+
+
+def usage_report(users_qs, start_dt, end_dt, sort="-messages_sent", page=1, page_size=50):
+    """Messages sent and last activity per user in the range, sorted and paged in SQL.
+
+    One annotated query returns the page and one aggregate over the same
+    annotation returns the totals, regardless of the number of users.
+
+    Returns (rows, stats, pagination).
+    """
+    in_range = Q(sms_messages__created_at__range=[start_dt, end_dt])
+    annotated = users_qs.annotate(
+        messages_sent=Count("sms_messages", filter=in_range),
+        last_activity=Max("sms_messages__created_at", filter=in_range),
+    )
+
+    field = USAGE_SORT_FIELDS.get(sort.lstrip("-"), "messages_sent")
+    # Users without activity in the range sort last either way
+    key = F(field).desc(nulls_last=True) if sort.startswith("-") else F(field).asc(nulls_last=True)
+    ordering = [key, "id"]
+
+    stats = annotated.aggregate(
+        total_users=Count("id"),
+        active_users=Count("id", filter=Q(messages_sent__gt=0)),
+        total_sent=Sum("messages_sent"),
+    )
+    stats["total_sent"] = stats["total_sent"] or 0
+
+    page_size = max(1, min(page_size, 500))
+    pages = max(1, -(-stats["total_users"] // page_size))
+    page = max(1, min(page, pages))
+    offset = (page - 1) * page_size
+
+    rows = []
+    for u in annotated.order_by(*ordering)[offset:offset + page_size]:
+        rows.append({
+            "user": u.email,
+            "role": u.get_role_display(),
+            "messages_sent": u.messages_sent,
+            "last_activity": timezone.localtime(u.last_activity).strftime("%Y-%m-%d %H:%M") if u.last_activity else "N/A",
+            "status": "Active" if u.messages_sent > 0 else "Inactive",
+        })
+
+    pagination = {"page": page, "page_size": page_size, "total": stats["total_users"], "pages": pages}
+    return rows, stats, pagination
+
+
+def top_senders(rollups_qs, start_day, end_day, limit=10):
+    """Users with the most SMS sent in local days start_day..end_day, from the usage rollup."""
+    rows = (
+        rollups_qs.filter(date__range=[start_day, end_day])
+        .values("user_id", "user__email", "user__role")
+        .annotate(sent=Sum("sent"), delivered=Sum("delivered"), failed=Sum("failed"), cost=Sum("cost"))
+        .filter(sent__gt=0)
+        .order_by("-sent", "user_id")[:limit]
+    )
+    roles = dict(User.ROLE_CHOICES)
+    return [
+        {
+            "user": row["user__email"],
+            "role": roles.get(row["user__role"], row["user__role"]),
+            "messages_sent": row["sent"],
+            "delivered": row["delivered"],
+            "failed": row["failed"],
+            "cost": round(float(row["cost"]), 2),
+        }
+        for row in rows
+    ]
+
+
+def financial_report(recipients_qs, start_dt, end_dt):
+    """Monthly, per-user and per-campaign SMS cost for messages created in the range.
+
+    One GROUP BY (month, user, campaign) over recipient rows prices every
+    billed row in SQL as segments x tariff(route, encoding) (see
+    rollups.segment_cost); submit failures are counted as sent but not
+    priced. The three breakdowns are folded from that result in Python.
+
+    Returns (monthly, by_user, by_campaign, totals).
+    """
+    tz = timezone.get_current_timezone()
+    rows = (
+        recipients_qs.filter(message__created_at__range=[start_dt, end_dt])
+        .annotate(month=TruncMonth("message__created_at", tzinfo=tz))
+        .values(
+            "month",
+            "message__user_id", "message__user__email",
+            "message__campaign_id", "message__campaign__title",
+        )
+        .annotate(
+            sent=Count("id"),
+            billed_segments=Sum("segments", filter=BILLED),
+            cost=Sum(segment_cost(), filter=BILLED),
+        )
+        .order_by("month")
+    )
+
+    monthly, by_user, by_campaign = {}, {}, {}
+    for row in rows:
+        amounts = (row["sent"], row["billed_segments"] or 0, row["cost"] or 0)
+        buckets = (
+            (monthly, row["month"].strftime("%Y-%m"), {"month": row["month"].strftime("%Y-%m")}),
+            (by_user, row["message__user_id"], {"user": row["message__user__email"]}),
+            (by_campaign, row["message__campaign_id"], {
+                "campaign_id": row["message__campaign_id"],
+                "campaign": row["message__campaign__title"] or "No campaign",
+            }),
+        )
+        for target, key, label in buckets:
+            entry = target.setdefault(key, dict(label, messages_sent=0, segments=0, cost=0))
+            entry["messages_sent"] += amounts[0]
+            entry["segments"] += amounts[1]
+            entry["cost"] += amounts[2]
+
+    def finish(entries):
+        for entry in entries:
+            entry["cost"] = round(float(entry["cost"]), 2)
+        return entries
+
+    monthly = finish(list(monthly.values()))
+    by_user = finish(sorted(by_user.values(), key=lambda e: e["cost"], reverse=True))
+    by_campaign = finish(sorted(by_campaign.values(), key=lambda e: e["cost"], reverse=True))
+    totals = {
+        "total_sent": sum(e["messages_sent"] for e in monthly),
+        "total_segments": sum(e["segments"] for e in monthly),
+        "total_cost": round(sum(e["cost"] for e in monthly), 2),
+    }
+    return monthly, by_user, by_campaign, totals
+
+
+LATENCY_PERCENTILES = (50, 90, 99)
+
+
+def _latency_stats(latencies, within_seconds):
+    import numpy as np
+
+    values = np.frombuffer(latencies, dtype=np.float64)
+    p50, p90, p99 = np.percentile(values, LATENCY_PERCENTILES)
+    return {
+        "delivered": int(values.size),
+        "p50": round(float(p50), 1),
+        "p90": round(float(p90), 1),
+        "p99": round(float(p99), 1),
+        "within_pct": round(float(np.count_nonzero(values <= within_seconds)) / values.size * 100, 1),
+    }
+
+
+def latency_report(recipients_qs, start_dt, end_dt, within_minutes=5):
+    """Submit-to-delivery latency percentiles per day, sender ID and campaign.
+
+    Covers delivered SMS of messages created in the range that have both
+    provider timestamps. Rows are streamed from one query and only the
+    latencies are kept (8 bytes each, in compact arrays), then NumPy computes
+    p50/p90/p99 and the share delivered within `within_minutes`. Latencies
+    are in seconds; negative values from provider clock skew count as 0.
+
+    Raises ImportError when NumPy is not installed and there are delivered
+    rows to summarize.
+
+    Returns (by_day, by_sender, by_campaign, overall).
+    """
+    from array import array
+
+    rows = (
+        recipients_qs.filter(
+            message__created_at__range=[start_dt, end_dt],
+            status="delivered",
+            submit_time__isnull=False,
+            delivery_time__isnull=False,
+        )
+        .order_by()
+        .values_list(
+            "submit_time", "delivery_time",
+            "message__sender_name", "message__campaign_id", "message__campaign__title",
+        )
+        .iterator(chunk_size=2000)
+    )
+
+    overall = array("d")
+    by_day, by_sender, by_campaign = {}, {}, {}
+    campaign_titles = {}
+    for submitted, delivered, sender, campaign_id, campaign_title in rows:
+        latency = max((delivered - submitted).total_seconds(), 0.0)
+        overall.append(latency)
+        by_day.setdefault(timezone.localtime(submitted).date(), array("d")).append(latency)
+        by_sender.setdefault(sender or "Unknown", array("d")).append(latency)
+        by_campaign.setdefault(campaign_id, array("d")).append(latency)
+        campaign_titles[campaign_id] = campaign_title
+
+    within_seconds = within_minutes * 60
+    by_day = [
+        dict(date=day.strftime("%Y-%m-%d"), **_latency_stats(values, within_seconds))
+        for day, values in sorted(by_day.items())
+    ]
+    by_sender = sorted(
+        (dict(sender=sender, **_latency_stats(values, within_seconds)) for sender, values in by_sender.items()),
+        key=lambda e: e["p90"], reverse=True,
+    )
+    by_campaign = sorted(
+        (
+            dict(
+                campaign_id=campaign_id,
+                campaign=campaign_titles[campaign_id] or "No campaign",
+                **_latency_stats(values, within_seconds),
+            )
+            for campaign_id, values in by_campaign.items()
+        ),
+        key=lambda e: e["p90"], reverse=True,
+    )
+    if overall:
+        overall = _latency_stats(overall, within_seconds)
+    else:
+        overall = {"delivered": 0, "p50": None, "p90": None, "p99": None, "within_pct": None}
+    return by_day, by_sender, by_campaign, overall
+
+
+def error_breakdown(recipients_qs, start_dt, end_dt):
+    """Failed SMS by error code, sender ID and local day for messages created in the range.
+
+    One GROUP BY (error code, sender ID, day) over failed recipient rows; the
+    three breakdowns are folded from it in Python. Each code carries its
+    description and whether retrying can help (see api_error_code_dict).
+    Failed rows stored with code 0 (the provider's success code, written by
+    older status refreshes) count as having no error code.
+
+    Returns (by_code, by_sender, by_day, totals).
+    """
+    tz = timezone.get_current_timezone()
+    rows = (
+        recipients_qs.filter(
+            message__created_at__range=[start_dt, end_dt],
+            status__in=FAILED_STATUSES,
+        )
+        .annotate(day=TruncDate("message__created_at", tzinfo=tz))
+        .values("error_code", "message__sender_name", "day")
+        .annotate(failed=Count("id"))
+        .order_by()
+    )
+
+    by_code, by_sender, by_day = {}, {}, {}
+    for row in rows:
+        code = row["error_code"] or None
+        sender = row["message__sender_name"] or "Unknown"
+        code_entry = by_code.setdefault(code, {
+            "error_code": code,
+            "description": get_error_description(code) if code is not None else "No error code",
+            "kind": error_kind(code),
+            "failed": 0,
+        })
+        code_entry["failed"] += row["failed"]
+        sender_entry = by_sender.setdefault(sender, {"sender": sender, "failed": 0, "permanent": 0})
+        sender_entry["failed"] += row["failed"]
+        if code_entry["kind"] == "permanent":
+            sender_entry["permanent"] += row["failed"]
+        by_day[row["day"]] = by_day.get(row["day"], 0) + row["failed"]
+
+    by_code = sorted(by_code.values(), key=lambda e: e["failed"], reverse=True)
+    by_sender = sorted(by_sender.values(), key=lambda e: e["failed"], reverse=True)
+    by_day = [{"date": day.strftime("%Y-%m-%d"), "failed": failed} for day, failed in sorted(by_day.items())]
+    totals = {
+        "total_failed": sum(e["failed"] for e in by_code),
+        "permanent": sum(e["failed"] for e in by_code if e["kind"] == "permanent"),
+        "transient": sum(e["failed"] for e in by_code if e["kind"] == "transient"),
+    }
+    return by_code, by_sender, by_day, totals
+
+
+def top_failing_numbers(recipients_qs, start_dt, end_dt, limit=20):
+    """Numbers that failed most often across campaigns, worst first.
+
+    Grouped over the (status, phone_number) index. A number whose failures
+    include permanent errors (invalid, DND, ...) will keep failing and is
+    flagged for removal from groups.
+    """
+    rows = (
+        recipients_qs.filter(
+            message__created_at__range=[start_dt, end_dt],
+            status__in=FAILED_STATUSES,
+        )
+        .values("phone_number")
+        .annotate(
+            failed=Count("id"),
+            permanent=Count("id", filter=Q(error_code__in=PERMANENT_ERROR_CODES)),
+            campaigns=Count("message__campaign", distinct=True),
+            last_failed=Max("message__created_at"),
+        )
+        .order_by("-failed", "phone_number")[:limit]
+    )
+    return [
+        {
+            "phone_number": row["phone_number"],
+            "failed": row["failed"],
+            "permanent": row["permanent"],
+            "campaigns": row["campaigns"],
+            "last_failed": timezone.localtime(row["last_failed"]).strftime("%Y-%m-%d %H:%M"),
+            "drop_suggested": row["permanent"] > 0,
+        }
+        for row in rows
+    ]
@@ -48,3 +48,64 @@ SMS_ERROR_CODES = {
     "1094": "Invalid HTTP gateway config",
     "1095": "HTTP Request Exception"
 }
+
+
+# Failures worth retrying: provider/queue hiccups, validity expiries, credit
+# shortfalls and account problems an admin can fix all succeed on a later
+# attempt. Every other non-zero code (invalid number, DND, template/sender
+# mismatch, spam, ...) fails the same way again, so resending only burns credits.
+TRANSIENT_ERROR_CODES = {
+    6,     # Internal Server Error Occurred
+    7,     # Invalid ApiCredentials
+    9,     # User account locked
+    10,    # Unauthorized API access
+    11,    # Unauthorized IP address
+    33,    # Queue Connection Closed
+    34,    # Unable to create campaign at this time
+    36,    # Error While Publishing DLR
+    1025,  # Insufficient Credits
+    1047,  # User account inactive
+    1084,  # Expired
+    1087,  # Failover expired
+    1089,  # Failover failed
+    1090,  # Account Validity Expired
+    1093,  # Queue Message Expired
+    1094,  # Invalid HTTP gateway config
+    1095,  # HTTP Request Exception
+}
+
+PERMANENT_ERROR_CODES = {int(code) for code in SMS_ERROR_CODES} - TRANSIENT_ERROR_CODES - {0}
+
+
+def normalize_error_code(code):
+    """Return `code` as an int ("013" -> 13), or None if it is not numeric."""
+    try:
+        return int(code)
+    except (TypeError, ValueError):
+        return None
+
+
+def is_permanent_error(code):
+    """True when retrying a recipient that failed with `code` cannot succeed."""
+    return normalize_error_code(code) in PERMANENT_ERROR_CODES
+
+
+def error_kind(code):
+    """"transient", "permanent" or "unknown" (missing or unlisted code)."""
+    code = normalize_error_code(code)
+    if code in TRANSIENT_ERROR_CODES:
+        return "transient"
+    if code in PERMANENT_ERROR_CODES:
+        return "permanent"
+    return "unknown"
+
+
+def get_error_description(code):
+    """Human readable description for a provider error code."""
+    code = normalize_error_code(code)
+    if code is None:
+        return "Unknown error"
+    for key, description in SMS_ERROR_CODES.items():
+        if int(key) == code:
+            return description
+    return "Unknown error code"
@@ -0,0 +1,97 @@
+"""Campaign category classification.
+
+A campaign's category is derived from keywords in its title and description
+and stored on the row, so category breakdowns are a single GROUP BY instead
+of re-scanning every campaign's text. All keywords are compiled into one
+regex alternation; when keywords from several categories occur, the one
+listed first in CATEGORY_KEYWORDS wins. Keywords match anywhere in the
+text, not only as whole words ("tests" and "contest" both count as "test").
+"""
+
+import re
+
+from django.db.models import Sum
+
+ACADEMIC = "academic"
+ADMINISTRATIVE = "administrative"
+EVENTS = "events"
+EMERGENCY = "emergency"
+OTHER = "other"
+
+CATEGORY_CHOICES = [
+    (ACADEMIC, "Academic"),
+    (ADMINISTRATIVE, "Administrative"),
+    (EVENTS, "Events"),
+    (EMERGENCY, "Emergency"),
+    (OTHER, "Other"),
+]
+
+# In priority order
+CATEGORY_KEYWORDS = [
+    (EMERGENCY, ["urgent", "emergency", "alert", "important", "immediate"]),
+    (ACADEMIC, ["exam", "test", "result", "homework", "assignment", "class", "lecture"]),
+    (ADMINISTRATIVE, ["meeting", "notice", "announcement", "circular", "reminder"]),
+    (EVENTS, ["event", "fest", "competition", "celebration", "program", "function"]),
+]
+
+_KEYWORD_PRIORITY = {
+    keyword: (priority, category)
+    for priority, (category, keywords) in enumerate(CATEGORY_KEYWORDS)
+    for keyword in keywords
+}
+# Zero-width lookahead so overlapping keywords ("eventest") are all found
+_KEYWORD_PATTERN = re.compile(
+    "(?=(%s))" % "|".join(re.escape(kw) for kw in sorted(_KEYWORD_PRIORITY, key=len, reverse=True))
+)
+
+
+def categorize(*texts):
+    """Category for a campaign with the given title/description texts."""
+    text = " ".join(t for t in texts if t).lower()
+    best = None
+    for match in _KEYWORD_PATTERN.finditer(text):
+        priority, category = _KEYWORD_PRIORITY[match.group(1)]
+        if best is None or priority < best[0]:
+            best = (priority, category)
+            if priority == 0:
+                break
+    return best[1] if best else OTHER
+
+
+def category_breakdown(campaigns_qs):
+    """SMS sent per category over `campaigns_qs`, in one grouped query.
+
+    Returns [{'name', 'count', 'percentage'}] in CATEGORY_CHOICES order;
+    'Other' is left out when empty.
+    """
+    counts = dict(
+        campaigns_qs.order_by()
+        .values_list("category")
+        .annotate(count=Sum("total_sent"))
+    )
+    total = sum(c or 0 for c in counts.values())
+
+    breakdown = []
+    for category, label in CATEGORY_CHOICES:
+        count = counts.get(category) or 0
+        if category == OTHER and not count:
+            continue
+        breakdown.append({
+            "name": label,
+            "count": count,
+            "percentage": round(count / total * 100, 1) if total else 0,
+        })
+    return breakdown
+
+
+def user_category_breakdown(user):
+    """``category_breakdown`` over every campaign visible to `user` (admins see all).
+
+    Drafts have sent nothing, so they add no counts; campaigns still sending
+    or stopped part-way are included with what they have sent so far.
+    """
+    # sms.models imports the category constants from here
+    from .models import Campaign
+
+    campaigns = Campaign.objects.all() if user.role == "admin" else Campaign.objects.filter(user=user)
+    return category_breakdown(campaigns)
@@ -0,0 +1,104 @@
+"""Phone number → StudentContact resolution for recipient logs.
+
+Recipient rows only keep the phone number they were sent to, in whichever
+form the sender typed it (``9812345678``, ``919812345678``,
+``+919812345678``). ``ContactResolver`` turns a batch of such numbers into
+contacts with one ``phone_number IN (...)`` query over every stored form of
+each number, matching on the normalized 10-digit subscriber number, and
+memoizes the answers so repeated numbers on later pages or export chunks
+cost nothing. Views share one resolver per request via
+``contact_resolver(request)``.
+
+Contacts are scoped like the group pages: admins resolve against every
+contact, teachers against universal groups and the groups they own. When
+a number is in several groups the oldest contact wins.
+"""
+
+from django.db.models import Q
+
+from .models import StudentContact
+from .suppression import normalize_phone
+
+# Numbers per lookup query; each contributes up to five IN (...) candidates
+LOOKUP_CHUNK_SIZE = 1000
+
+
+def phone_forms(phone):
+    """Stored forms a number may have been saved in, normalized form first."""
+    key = normalize_phone(phone)
+    if not key:
+        return []
+    forms = [key, f"91{key}", f"+91{key}", f"0{key}"]
+    raw = str(phone).strip()
+    if raw not in forms:
+        forms.append(raw)
+    return forms
+
+
+class ContactResolver:
+    """Batch phone → contact lookups with a memo (see module docstring)."""
+
+    def __init__(self, user=None):
+        self.user = user
+        self._memo = {}
+
+    def _contacts(self):
+        contacts = StudentContact.objects.all()
+        if self.user is not None and self.user.role != 'admin':
+            contacts = contacts.filter(Q(class_dept__is_universal=True) | Q(class_dept__teacher=self.user))
+        return contacts.only('id', 'name', 'phone_number', 'class_dept_id')
+
+    def resolve(self, phones):
+        """Dict of phone (as given) → StudentContact or None."""
+        keys = {phone: normalize_phone(phone) for phone in phones}
+        missing = {key for key in keys.values() if key and key not in self._memo}
+        missing_list = list(missing)
+        for start in range(0, len(missing_list), LOOKUP_CHUNK_SIZE):
+            chunk = missing_list[start:start + LOOKUP_CHUNK_SIZE]
+            candidates = {form for key in chunk for form in phone_forms(key)}
+            for contact in self._contacts().filter(phone_number__in=candidates).order_by('id'):
+                self._memo.setdefault(normalize_phone(contact.phone_number), contact)
+        for key in missing:
+            self._memo.setdefault(key, None)
+        return {phone: self._memo.get(key) if key else None for phone, key in keys.items()}
+
+    def get(self, phone):
+        return self.resolve([phone])[phone]
+
+    def names(self, phones):
+        """Dict of phone → contact name (None when unknown)."""
+        return {phone: contact.name if contact else None for phone, contact in self.resolve(phones).items()}
+
+    def attach(self, recipients):
+        """Resolve SMSRecipient instances in one go so `recipient.contact` needs no query."""
+        recipients = list(recipients)
+        contacts = self.resolve({r.phone_number for r in recipients})
+        for recipient in recipients:
+            recipient._contact = contacts[recipient.phone_number]
+        return recipients
+
+    def named_rows(self, rows, phone_index, chunk_size=LOOKUP_CHUNK_SIZE):
+        """Yield tuples from `rows` with the contact name inserted after column `phone_index`.
+
+        Rows are resolved a chunk at a time, so streamed exports stay streamed.
+        """
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                yield from self._named_chunk(chunk, phone_index)
+                chunk = []
+        yield from self._named_chunk(chunk, phone_index)
+
+    def _named_chunk(self, chunk, phone_index):
+        names = self.names({row[phone_index] for row in chunk})
+        for row in chunk:
+            yield row[:phone_index + 1] + (names[row[phone_index]],) + row[phone_index + 1:]
+
+
+def contact_resolver(request):
+    """The request's shared ContactResolver, scoped to its user."""
+    resolver = getattr(request, '_contact_resolver', None)
+    if resolver is None:
+        resolver = request._contact_resolver = ContactResolver(request.user)
+    return resolver
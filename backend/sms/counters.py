@@ -0,0 +1,221 @@
+"""Dashboard counters.
+
+``DashboardCounters`` keeps running totals per scope: ``all`` for the
+system and ``user:<id>`` for one user's own data (the report cache scopes).
+Creates, deletes and status changes of users, messages, templates and
+groups are booked by signal as deltas; sent/delivered/failed follow the
+daily usage rollup, which books them from the same places, including bulk
+recipient inserts and status transitions. Each delta is a single UPDATE over
+the system row and the owner's row.
+
+A row that does not exist yet is built from the source tables on first use,
+and ``manage.py reconcile_counters`` recomputes every row to correct drift
+(e.g. from queryset ``update()`` calls that bypass signals).
+"""
+
+import logging
+from collections import Counter
+
+from django.contrib.auth import get_user_model
+from django.db.models import Count, F, Q, Subquery, Sum
+
+from .models import DailyUsageRollup, DashboardCounters, Group, SMSMessage, SMSUsageStats, Template
+from .report_cache import ADMIN_SCOPE
+
+logger = logging.getLogger(__name__)
+
+COUNTER_FIELDS = (
+    "users", "messages", "templates", "approved_templates", "pending_templates",
+    "groups", "universal_groups", "sent", "delivered", "failed",
+)
+
+
+def _user_scope(user_id):
+    return f"user:{user_id}"
+
+
+def counter_scopes(owner_id):
+    """Rows a change to data owned by `owner_id` (None: no owner) is booked under."""
+    return [ADMIN_SCOPE] + ([_user_scope(owner_id)] if owner_id else [])
+
+
+def template_counts(template):
+    return {
+        "templates": 1,
+        "approved_templates": int(template.status == "approved"),
+        "pending_templates": int(template.status == "pending"),
+    }
+
+
+def group_counts(group):
+    return {"groups": 1, "universal_groups": int(bool(group.is_universal))}
+
+
+def apply_counter_deltas(owner_id, **deltas):
+    """Add ``field=+/-n`` deltas to the system row and the owner's row.
+
+    Missing rows are built from the source tables, which already include
+    the change being recorded.
+    """
+    updates = {field: F(field) + n for field, n in deltas.items() if n}
+    if not updates:
+        return
+    scopes = counter_scopes(owner_id)
+    try:
+        if DashboardCounters.objects.filter(scope__in=scopes).update(**updates) < len(scopes):
+            existing = set(DashboardCounters.objects.filter(scope__in=scopes).values_list("scope", flat=True))
+            reconcile_counters([scope for scope in scopes if scope not in existing])
+    except Exception:
+        logger.warning(f"⚠️ Could not update dashboard counters for {scopes}")
+
+
+def book_change(owner_before, counts_before, owner_after, counts_after):
+    """Book the difference between an object's contribution before and after a save."""
+    changes = Counter()
+    for owner, counts, sign in ((owner_before, counts_before, -1), (owner_after, counts_after, 1)):
+        for field, n in (counts or {}).items():
+            changes[(owner, field)] += sign * n
+    by_owner = {}
+    for (owner, field), n in changes.items():
+        if n:
+            by_owner.setdefault(owner, {})[field] = n
+    for owner, deltas in by_owner.items():
+        apply_counter_deltas(owner, **deltas)
+
+
+def _totals(user_ids=None):
+    """{scope: {field: n}} for the system (user_ids None) or for each of `user_ids`."""
+    User = get_user_model()
+    messages = SMSMessage.objects.all()
+    templates = Template.objects.all()
+    groups = Group.objects.all()
+    rollups = DailyUsageRollup.objects.all()
+    if user_ids is not None:
+        messages = messages.filter(user_id__in=user_ids)
+        templates = templates.filter(user_id__in=user_ids)
+        groups = groups.filter(teacher_id__in=user_ids)
+        rollups = rollups.filter(user_id__in=user_ids)
+
+    def grouped(queryset, owner_field, **aggregates):
+        if user_ids is None:
+            return {ADMIN_SCOPE: queryset.aggregate(**aggregates)}
+        rows = queryset.order_by().values(owner_field).annotate(**aggregates)
+        return {_user_scope(row.pop(owner_field)): row for row in rows}
+
+    totals = {scope: dict.fromkeys(COUNTER_FIELDS, 0) for scope in (
+        [ADMIN_SCOPE] if user_ids is None else [_user_scope(user_id) for user_id in user_ids]
+    )}
+    sources = [
+        grouped(messages, "user_id", messages=Count("id")),
+        grouped(
+            templates, "user_id",
+            templates=Count("id"),
+            approved_templates=Count("id", filter=Q(status="approved")),
+            pending_templates=Count("id", filter=Q(status="pending")),
+        ),
+        grouped(groups, "teacher_id", groups=Count("id"), universal_groups=Count("id", filter=Q(is_universal=True))),
+        grouped(rollups, "user_id", sent=Sum("sent"), delivered=Sum("delivered"), failed=Sum("failed")),
+    ]
+    if user_ids is None:
+        sources.append({ADMIN_SCOPE: {"users": User.objects.count()}})
+    for source in sources:
+        for scope, values in source.items():
+            if scope in totals:
+                totals[scope].update({field: n or 0 for field, n in values.items()})
+    return totals
+
+
+def reconcile_counters(scopes=None):
+    """Recompute counter rows from the source tables (every user and the system when `scopes` is None).
+
+    Returns the number of rows whose stored totals were wrong or missing.
+    """
+    # recipient_status -> rollups -> counters, so import the helper late
+    from .recipient_status import upsert_target
+
+    if scopes is None:
+        user_ids = list(get_user_model().objects.values_list("id", flat=True))
+        include_all = True
+    else:
+        user_ids = [int(scope.split(":", 1)[1]) for scope in scopes if scope != ADMIN_SCOPE]
+        include_all = ADMIN_SCOPE in scopes
+
+    totals = _totals(user_ids) if user_ids else {}
+    if include_all:
+        totals.update(_totals())
+
+    stored = {
+        row.pop("scope"): row
+        for row in DashboardCounters.objects.filter(scope__in=list(totals)).values("scope", *COUNTER_FIELDS)
+    }
+    drifted = [scope for scope, values in totals.items() if stored.get(scope) != values]
+    DashboardCounters.objects.bulk_create(
+        [DashboardCounters(scope=scope, **totals[scope]) for scope in drifted],
+        batch_size=500,
+        update_conflicts=True,
+        update_fields=[*COUNTER_FIELDS, "updated_at"],
+        **upsert_target(["scope"]),
+    )
+    if drifted:
+        logger.debug(f"🔢 Reconciled {len(drifted)} dashboard counter rows")
+    return len(drifted)
+
+
+def _counter_rows(scopes, credits_user_id=None):
+    """{scope: counter values} in one query, building missing rows first.
+
+    With `credits_user_id`, each row also carries that user's remaining credits.
+    """
+    def fetch():
+        rows = DashboardCounters.objects.filter(scope__in=scopes)
+        fields = list(COUNTER_FIELDS)
+        if credits_user_id is not None:
+            rows = rows.annotate(remaining_credits=Subquery(
+                SMSUsageStats.objects.filter(user_id=credits_user_id).values("remaining_credits")[:1]
+            ))
+            fields.append("remaining_credits")
+        return {row.pop("scope"): row for row in rows.values("scope", *fields)}
+
+    rows = fetch()
+    if len(rows) < len(scopes):
+        reconcile_counters([scope for scope in scopes if scope not in rows])
+        rows = fetch()
+    return rows
+
+
+def system_counters():
+    """System-wide counter values (one query)."""
+    return _counter_rows([ADMIN_SCOPE])[ADMIN_SCOPE]
+
+
+def dashboard_counters(user):
+    """Dashboard tiles for `user` from their counter rows, in one query.
+
+    Admins see system totals; teachers see their own messages and pending
+    templates, their own plus universal groups and their own plus approved
+    templates. Includes the user's remaining credits.
+    """
+    own = _user_scope(user.id)
+    rows = _counter_rows([ADMIN_SCOPE] if user.role == "admin" else [ADMIN_SCOPE, own], credits_user_id=user.id)
+
+    system = rows[ADMIN_SCOPE]
+    if user.role == "admin":
+        mine = system
+        templates = system["templates"]
+        groups = system["groups"]
+    else:
+        mine = rows[own]
+        templates = system["approved_templates"] + mine["templates"] - mine["approved_templates"]
+        groups = system["universal_groups"] + mine["groups"]
+
+    return {
+        "users": system["users"],
+        "messages": mine["messages"],
+        "templates": templates,
+        "pending_templates": mine["pending_templates"],
+        "groups": groups,
+        "sent": mine["sent"],
+        "delivered": mine["delivered"],
+        "failed": mine["failed"],
+        "remaining_credits": system["remaining_credits"] or 0,
+    }
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from sms.categories import categorize
+from sms.models import Campaign
+
+
+class Command(BaseCommand):
+    help = 'Re-derive every campaign category from its title and description (run after changing the keyword lists)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000, help='Campaigns read and updated per batch')
+
+    def handle(self, *args, **options):
+        batch_size = max(options['batch_size'], 1)
+        self.stdout.write(self.style.WARNING('Categorizing campaigns...'))
+
+        changed = 0
+        batch = []
+        campaigns = Campaign.objects.only('id', 'title', 'description', 'category').iterator(chunk_size=batch_size)
+        for campaign in campaigns:
+            category = categorize(campaign.title, campaign.description)
+            if category == campaign.category:
+                continue
+            campaign.category = category
+            batch.append(campaign)
+            if len(batch) >= batch_size:
+                changed += Campaign.objects.bulk_update(batch, ['category'])
+                batch = []
+        if batch:
+            changed += Campaign.objects.bulk_update(batch, ['category'])
+
+        self.stdout.write(self.style.SUCCESS(f'\n✅ Successfully recategorized {changed} campaigns!'))
@@ -0,0 +1,43 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from sms.models import Campaign, SMSMessage
+
+
+class Command(BaseCommand):
+    help = 'Delete draft campaigns that never had a message sent, in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than', type=int, default=30, help='Only drafts created more than this many days ago')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Campaigns deleted per batch')
+        parser.add_argument('--dry-run', action='store_true', help='Count the drafts without deleting them')
+
+    def handle(self, *args, **options):
+        if options['older_than'] < 0:
+            raise CommandError('--older-than must be zero or more days')
+        batch_size = max(options['batch_size'], 1)
+        cutoff = timezone.now() - timedelta(days=options['older_than'])
+        self.stdout.write(self.style.WARNING(f'Pruning empty draft campaigns created before {cutoff:%Y-%m-%d %H:%M}...'))
+
+        empty_drafts = Campaign.objects.filter(status='draft', created_at__lt=cutoff).filter(
+            ~Exists(SMSMessage.objects.filter(campaign=OuterRef('pk')))
+        )
+        if options['dry_run']:
+            self.stdout.write(self.style.SUCCESS(f'\n✅ Found {empty_drafts.count()} empty drafts (dry run, nothing deleted)!'))
+            return
+
+        deleted = 0
+        while True:
+            # Re-evaluated each pass, so a draft that got a message meanwhile is skipped
+            ids = list(empty_drafts.order_by('id').values_list('id', flat=True)[:batch_size])
+            if not ids:
+                break
+            deleted += Campaign.objects.filter(pk__in=ids).filter(
+                ~Exists(SMSMessage.objects.filter(campaign=OuterRef('pk')))
+            ).delete()[1].get('sms.Campaign', 0)
+            self.stdout.write(f'  {deleted} deleted')
+
+        self.stdout.write(self.style.SUCCESS(f'\n✅ Successfully pruned {deleted} draft campaigns!'))
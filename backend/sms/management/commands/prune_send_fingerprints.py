@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from sms.suppression import prune_fingerprints, suppression_window
+
+
+class Command(BaseCommand):
+    help = 'Delete duplicate-send fingerprints that fell out of the suppression window'
+
+    def handle(self, *args, **options):
+        window = suppression_window()
+        self.stdout.write(self.style.WARNING(f'Pruning send fingerprints older than {window or "0 (suppression disabled)"}...'))
+
+        deleted = prune_fingerprints(window)
+
+        self.stdout.write(self.style.SUCCESS(f'\n✅ Successfully pruned {deleted} fingerprints!'))
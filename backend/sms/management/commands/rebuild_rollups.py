@@ -0,0 +1,73 @@
+import os
+import socket
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Min
+from django.utils import timezone
+
+from sms.models import SMSMessage, SyncCheckpoint
+from sms.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = 'Recompute daily usage rollups in chunked, resumable passes (one grouped query per chunk)'
+
+    CHECKPOINT_NAME = 'daily_usage_rollups'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', help='First local day to rebuild (YYYY-MM-DD); defaults to the oldest message')
+        parser.add_argument('--days-per-pass', type=int, default=7, help='Days recomputed per grouped query')
+        parser.add_argument('--lease', type=int, default=600, help='Lock lease in seconds')
+        parser.add_argument('--reset', action='store_true', help='Ignore an interrupted run and start from --since')
+
+    def handle(self, *args, **options):
+        if options['since']:
+            try:
+                since = datetime.strptime(options['since'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError('--since must be YYYY-MM-DD')
+        else:
+            oldest = SMSMessage.objects.aggregate(oldest=Min('created_at'))['oldest']
+            if oldest is None:
+                self.stdout.write(self.style.SUCCESS('No messages, nothing to rebuild.'))
+                return
+            since = timezone.localtime(oldest).date()
+
+        owner = f"{socket.gethostname()}:{os.getpid()}"
+        checkpoint = SyncCheckpoint.acquire(self.CHECKPOINT_NAME, owner, options['lease'])
+        if checkpoint is None:
+            self.stdout.write(self.style.WARNING('Another node is already rebuilding rollups, skipping.'))
+            return
+
+        step = max(options['days_per_pass'], 1)
+        today = timezone.localdate()
+        start = since
+        # The watermark is the last day finished by an interrupted run
+        if checkpoint.watermark and not options['reset']:
+            resume = timezone.localtime(checkpoint.watermark).date() + timedelta(days=1)
+            if resume > start:
+                start = resume
+
+        self.stdout.write(self.style.WARNING(f'Rebuilding usage rollups from {start} to {today}...'))
+
+        written = 0
+        try:
+            while start <= today:
+                end = min(start + timedelta(days=step - 1), today)
+                written += rebuild_rollups(start, end)
+                self.stdout.write(f'  {start} .. {end}')
+
+                checkpoint.watermark = timezone.make_aware(datetime.combine(end, datetime.min.time()))
+                SyncCheckpoint.objects.filter(pk=checkpoint.pk, locked_by=owner).update(
+                    watermark=checkpoint.watermark,
+                    locked_until=timezone.now() + timedelta(seconds=options['lease']),
+                )
+                start = end + timedelta(days=1)
+
+            # Finished: the next run starts a fresh pass
+            checkpoint.watermark = None
+        finally:
+            checkpoint.release()
+
+        self.stdout.write(self.style.SUCCESS(f'\n✅ Successfully rebuilt {written} usage rollups!'))
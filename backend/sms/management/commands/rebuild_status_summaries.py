@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from sms.recipient_status import rebuild_summaries
+
+
+class Command(BaseCommand):
+    help = 'Rebuild per-message status summaries from recipient logs with one grouped query'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--message',
+            type=int,
+            action='append',
+            dest='message_ids',
+            help='Only rebuild the given SMSMessage id (repeatable)',
+        )
+
+    def handle(self, *args, **options):
+        message_ids = options.get('message_ids')
+
+        if message_ids:
+            self.stdout.write(self.style.WARNING(f'Rebuilding status summaries for {len(message_ids)} messages...'))
+        else:
+            self.stdout.write(self.style.WARNING('Rebuilding status summaries for all messages...'))
+
+        written = rebuild_summaries(message_ids)
+
+        self.stdout.write(self.style.SUCCESS(f'\n✅ Successfully rebuilt {written} status summaries!'))
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from sms.counters import reconcile_counters
+from sms.models import DashboardCounters, User
+from sms.report_cache import ADMIN_SCOPE
+
+
+class Command(BaseCommand):
+    help = 'Recompute the dashboard counters from the source tables and fix any drift (run periodically, e.g. nightly)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Users recomputed per set of grouped queries')
+
+    def handle(self, *args, **options):
+        batch_size = max(options['batch_size'], 1)
+        self.stdout.write(self.style.WARNING('Reconciling dashboard counters...'))
+
+        fixed = reconcile_counters([ADMIN_SCOPE])
+        user_ids = list(User.objects.order_by('id').values_list('id', flat=True))
+        for start in range(0, len(user_ids), batch_size):
+            fixed += reconcile_counters([f"user:{user_id}" for user_id in user_ids[start:start + batch_size]])
+
+        # Rows of users deleted without signals (e.g. raw SQL)
+        known = {ADMIN_SCOPE} | {f"user:{user_id}" for user_id in user_ids}
+        orphans = [scope for scope in DashboardCounters.objects.values_list('scope', flat=True) if scope not in known]
+        if orphans:
+            DashboardCounters.objects.filter(scope__in=orphans).delete()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'\n✅ Successfully reconciled dashboard counters ({fixed} rows corrected, {len(orphans)} removed)!'
+        ))
@@ -0,0 +1,51 @@
+import os
+import socket
+
+from django.core.management.base import BaseCommand
+from sms.models import SyncCheckpoint
+from sms.services import ProviderHistorySync
+
+
+class Command(BaseCommand):
+    help = 'Incrementally mirror the provider delivery log into recipient logs (safe to run from cron on many nodes)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--page-size', type=int, default=500, help='Rows requested per provider page')
+        parser.add_argument('--max-pages', type=int, default=20, help='Stop after this many pages in one run')
+        parser.add_argument('--days', type=int, default=1, help='Look-back window when no watermark exists yet')
+        parser.add_argument('--lease', type=int, default=300, help='Lock lease in seconds, renewed after every page')
+        parser.add_argument('--reset', action='store_true', help='Discard the stored watermark and start over')
+
+    def handle(self, *args, **options):
+        owner = f"{socket.gethostname()}:{os.getpid()}"
+        checkpoint = SyncCheckpoint.acquire(ProviderHistorySync.CHECKPOINT_NAME, owner, options['lease'])
+        if checkpoint is None:
+            self.stdout.write(self.style.WARNING('Another node is already syncing provider history, skipping.'))
+            return
+
+        try:
+            if options['reset']:
+                checkpoint.watermark = None
+                checkpoint.offset = 0
+
+            self.stdout.write(
+                self.style.WARNING(f'Syncing provider history from {checkpoint.watermark or "scratch"} (+{checkpoint.offset})...')
+            )
+            sync = ProviderHistorySync(
+                page_size=options['page_size'],
+                max_pages=options['max_pages'],
+                initial_days=options['days'],
+                lease_seconds=options['lease'],
+            )
+            stats = sync.run(checkpoint)
+        finally:
+            checkpoint.release()
+
+        self.stdout.write(
+            f'Pages {stats["pages"]}, fetched {stats["fetched"]}, matched {stats["matched"]}, '
+            f'updated {stats["updated"]}, unmatched {stats["unmatched"]}'
+        )
+        if stats['error']:
+            self.stdout.write(self.style.ERROR(f'Provider error: {stats["error"]}'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'\n✅ Synced up to {checkpoint.watermark} (+{checkpoint.offset})'))
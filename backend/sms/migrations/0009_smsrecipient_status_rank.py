@@ -0,0 +1,41 @@
+# Generated by Django 4.2.7 on 2026-10-19 05:11
+
+from django.db import migrations, models
+from django.db.models import Case, IntegerField, Value, When
+
+
+STATUS_RANKS = {
+    "pending": 0,
+    "submitted": 1,
+    "sent": 1,
+    "failed": 2,
+    "submit_failed": 2,
+    "delivered": 3,
+}
+
+
+def backfill_status_rank(apps, schema_editor):
+    SMSRecipient = apps.get_model('sms', 'SMSRecipient')
+    SMSRecipient.objects.update(
+        status_rank=Case(
+            *[When(status=status, then=Value(rank)) for status, rank in STATUS_RANKS.items()],
+            default=Value(0),
+            output_field=IntegerField(),
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sms', '0008_add_personalized_message_field'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='smsrecipient',
+            name='status_rank',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_status_rank, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 4.2.7 on 2026-10-19 05:12
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sms', '0009_smsrecipient_status_rank'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MessageStatusSummary',
+            fields=[
+                ('message', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='status_summary', serialize=False, to='sms.smsmessage')),
+                ('pending', models.IntegerField(default=0)),
+                ('submitted', models.IntegerField(default=0)),
+                ('delivered', models.IntegerField(default=0)),
+                ('failed', models.IntegerField(default=0)),
+                ('submit_failed', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-19 05:16
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sms', '0011_synccheckpoint_smsrecipient_api_message_id_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='smsmessage',
+            name='parent',
+            field=models.ForeignKey(blank=True, help_text='Original message when this one resends its failed recipients', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='retries', to='sms.smsmessage'),
+        ),
+        migrations.AddIndex(
+            model_name='smsrecipient',
+            index=models.Index(fields=['message', 'status', 'id'], name='smsrecipient_msg_status_id'),
+        ),
+    ]
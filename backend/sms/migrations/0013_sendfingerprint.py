@@ -0,0 +1,25 @@
+# Generated by Django 4.2.7 on 2026-10-19 05:17
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sms', '0012_smsmessage_parent_smsrecipient_status_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SendFingerprint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('digest', models.CharField(max_length=64)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['digest', 'created_at'], name='sendfingerprint_digest_time'), models.Index(fields=['created_at'], name='sendfingerprint_time')],
+            },
+        ),
+    ]
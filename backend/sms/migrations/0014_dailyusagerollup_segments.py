@@ -0,0 +1,106 @@
+# Generated by Django 4.2.7 on 2026-10-19 05:22
+
+import math
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+# Frozen copy of sms.segments as of this migration, so later changes to the
+# live helpers do not change what the backfill computes
+GSM7_BASIC = set(
+    "@£$¥èéùìòÇ\nØø\rÅåΔ_ΦΓΛΩΠΨΣΘΞÆæßÉ !\"#¤%&'()*+,-./0123456789:;<=>?"
+    "¡ABCDEFGHIJKLMNOPQRSTUVWXYZÄÖÑÜ§¿abcdefghijklmnopqrstuvwxyzäöñüà"
+)
+GSM7_EXTENDED = set("^{}\\[~]|€\f")
+
+
+def is_gsm7(text):
+    return all(char in GSM7_BASIC or char in GSM7_EXTENDED for char in text or "")
+
+
+def count_segments(text):
+    text = text or ""
+    if is_gsm7(text):
+        length = len(text) + sum(1 for char in text if char in GSM7_EXTENDED)
+        single, multi = 160, 153
+    else:
+        length = len(text.encode("utf-16-le")) // 2
+        single, multi = 70, 67
+    return 1 if length <= single else math.ceil(length / multi)
+
+
+def backfill_encoding_and_segments(apps, schema_editor):
+    """Set SMSMessage.encoding and SMSRecipient.segments from the stored texts.
+
+    Rows default to GSM-7 / one segment, so only messages that differ are
+    written, grouped into one UPDATE per distinct segment count.
+    """
+    SMSMessage = apps.get_model('sms', 'SMSMessage')
+    SMSRecipient = apps.get_model('sms', 'SMSRecipient')
+
+    ucs2_ids = []
+    by_segments = {}
+    for pk, text in SMSMessage.objects.values_list('id', 'message_text').iterator(chunk_size=2000):
+        if not is_gsm7(text):
+            ucs2_ids.append(pk)
+        n = count_segments(text)
+        if n != 1:
+            by_segments.setdefault(n, []).append(pk)
+
+    for i in range(0, len(ucs2_ids), 1000):
+        SMSMessage.objects.filter(pk__in=ucs2_ids[i:i + 1000]).update(encoding='ucs2')
+    for n, ids in by_segments.items():
+        for i in range(0, len(ids), 1000):
+            SMSRecipient.objects.filter(message_id__in=ids[i:i + 1000]).update(segments=n)
+
+    # Per-contact texts can differ from the message text
+    personalized = {}
+    rows = SMSRecipient.objects.exclude(personalized_message__isnull=True).exclude(personalized_message='')
+    for pk, text in rows.values_list('id', 'personalized_message').iterator(chunk_size=2000):
+        personalized.setdefault(count_segments(text), []).append(pk)
+    for n, ids in personalized.items():
+        for i in range(0, len(ids), 1000):
+            SMSRecipient.objects.filter(pk__in=ids[i:i + 1000]).update(segments=n)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sms', '0013_sendfingerprint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='smsmessage',
+            name='encoding',
+            field=models.CharField(choices=[('gsm7', 'GSM-7'), ('ucs2', 'UCS-2 (Unicode)')], default='gsm7', max_length=8),
+        ),
+        migrations.AddField(
+            model_name='smsrecipient',
+            name='segments',
+            field=models.PositiveSmallIntegerField(default=1),
+        ),
+        migrations.CreateModel(
+            name='DailyUsageRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('sent', models.IntegerField(default=0)),
+                ('delivered', models.IntegerField(default=0)),
+                ('failed', models.IntegerField(default=0)),
+                ('segments', models.IntegerField(default=0)),
+                ('cost', models.DecimalField(decimal_places=4, default=0, max_digits=15)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='usage_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['date'], name='dailyusagerollup_date')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='dailyusagerollup',
+            constraint=models.UniqueConstraint(fields=('user', 'date'), name='dailyusagerollup_user_date'),
+        ),
+        migrations.RunPython(backfill_encoding_and_segments, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-19 05:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sms', '0014_dailyusagerollup_segments'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='smsmessage',
+            index=models.Index(fields=['user', 'created_at'], name='smsmessage_user_created'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 4.2.7 on 2026-10-19 05:25
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_sender_route(apps, schema_editor):
+    """Take sender name and route from the campaign's sender ID where one is set."""
+    SMSMessage = apps.get_model('sms', 'SMSMessage')
+    Campaign = apps.get_model('sms', 'Campaign')
+    sender = Campaign.objects.filter(pk=OuterRef('campaign_id'))
+    SMSMessage.objects.filter(campaign__sender_id__isnull=False).update(
+        sender_name=Subquery(sender.values('sender_id__name')[:1]),
+        route=Subquery(sender.values('sender_id__type')[:1]),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sms', '0015_smsmessage_user_created_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='smsmessage',
+            name='route',
+            field=models.CharField(choices=[('transactional', 'Transactional'), ('promotional', 'Promotional')], default='transactional', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='smsmessage',
+            name='sender_name',
+            field=models.CharField(blank=True, help_text='Sender ID the message was sent from', max_length=20),
+        ),
+        migrations.RunPython(backfill_sender_route, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 4.2.7 on 2026-10-19 05:32
+
+import re
+
+from django.db import migrations, models
+
+# Frozen copy of sms.categories as of this migration: keywords in priority
+# order, matched anywhere in the lowercased title and description
+CATEGORY_KEYWORDS = [
+    ('emergency', ['urgent', 'emergency', 'alert', 'important', 'immediate']),
+    ('academic', ['exam', 'test', 'result', 'homework', 'assignment', 'class', 'lecture']),
+    ('administrative', ['meeting', 'notice', 'announcement', 'circular', 'reminder']),
+    ('events', ['event', 'fest', 'competition', 'celebration', 'program', 'function']),
+]
+KEYWORD_PATTERNS = [
+    (category, re.compile('|'.join(re.escape(keyword) for keyword in keywords)))
+    for category, keywords in CATEGORY_KEYWORDS
+]
+
+
+def categorize(*texts):
+    text = ' '.join(t for t in texts if t).lower()
+    for category, pattern in KEYWORD_PATTERNS:
+        if pattern.search(text):
+            return category
+    return 'other'
+
+
+def backfill_category(apps, schema_editor):
+    """Classify existing campaigns; new and edited ones are classified on save."""
+    Campaign = apps.get_model('sms', 'Campaign')
+    batch = []
+    for campaign in Campaign.objects.only('id', 'title', 'description').iterator(chunk_size=2000):
+        campaign.category = categorize(campaign.title, campaign.description)
+        batch.append(campaign)
+        if len(batch) >= 2000:
+            Campaign.objects.bulk_update(batch, ['category'])
+            batch = []
+    if batch:
+        Campaign.objects.bulk_update(batch, ['category'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sms', '0016_smsmessage_sender_route'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='campaign',
+            name='category',
+            field=models.CharField(choices=[('academic', 'Academic'), ('administrative', 'Administrative'), ('events', 'Events'), ('emergency', 'Emergency'), ('other', 'Other')], db_index=True, default='other', help_text='Derived from title/description keywords on save', max_length=20),
+        ),
+        migrations.RunPython(backfill_category, migrations.RunPython.noop),
+    ]
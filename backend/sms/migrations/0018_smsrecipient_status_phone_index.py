@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-19 05:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sms', '0017_campaign_category'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='smsrecipient',
+            index=models.Index(fields=['status', 'phone_number'], name='smsrecipient_status_phone'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-19 05:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sms', '0018_smsrecipient_status_phone_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='campaign',
+            index=models.Index(fields=['created_at', 'id'], name='campaign_created_id'),
+        ),
+        migrations.AddIndex(
+            model_name='campaign',
+            index=models.Index(fields=['user', 'created_at', 'id'], name='campaign_user_created_id'),
+        ),
+    ]
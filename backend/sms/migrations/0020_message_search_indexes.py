@@ -0,0 +1,65 @@
+# Generated by Django 4.2.7 on 2026-10-19 05:38
+
+from django.db import migrations, models
+
+# (table, column, SQLite FTS5 table) searched by sms/search.py
+FULLTEXT_COLUMNS = [
+    ('sms_smsmessage', 'message_text', 'sms_smsmessage_fts'),
+    ('sms_smsrecipient', 'personalized_message', 'sms_smsrecipient_fts'),
+]
+
+
+def create_fulltext_indexes(apps, schema_editor):
+    """MySQL FULLTEXT indexes, or external-content FTS5 tables kept in sync by triggers on SQLite.
+
+    SQLite drops a table's triggers when a later migration rebuilds the table,
+    so such migrations must run this again (the SQLite part is idempotent).
+    """
+    vendor = schema_editor.connection.vendor
+    for table, column, fts in FULLTEXT_COLUMNS:
+        if vendor == 'mysql':
+            schema_editor.execute(f'ALTER TABLE `{table}` ADD FULLTEXT INDEX `{table}_{column}_ft` (`{column}`)')
+        elif vendor == 'sqlite':
+            schema_editor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({column}, content='{table}', content_rowid='id')"
+            )
+            schema_editor.execute(
+                f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN "
+                f"INSERT INTO {fts}(rowid, {column}) VALUES (new.id, new.{column}); END"
+            )
+            schema_editor.execute(
+                f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN "
+                f"INSERT INTO {fts}({fts}, rowid, {column}) VALUES ('delete', old.id, old.{column}); END"
+            )
+            schema_editor.execute(
+                f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {column} ON {table} BEGIN "
+                f"INSERT INTO {fts}({fts}, rowid, {column}) VALUES ('delete', old.id, old.{column}); "
+                f"INSERT INTO {fts}(rowid, {column}) VALUES (new.id, new.{column}); END"
+            )
+            schema_editor.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+
+
+def drop_fulltext_indexes(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    for table, column, fts in FULLTEXT_COLUMNS:
+        if vendor == 'mysql':
+            schema_editor.execute(f'ALTER TABLE `{table}` DROP INDEX `{table}_{column}_ft`')
+        elif vendor == 'sqlite':
+            for suffix in ('ai', 'ad', 'au'):
+                schema_editor.execute(f'DROP TRIGGER IF EXISTS {fts}_{suffix}')
+            schema_editor.execute(f'DROP TABLE IF EXISTS {fts}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sms', '0019_campaign_history_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='smsrecipient',
+            index=models.Index(fields=['phone_number', 'id'], name='smsrecipient_phone_id'),
+        ),
+        migrations.RunPython(create_fulltext_indexes, drop_fulltext_indexes),
+    ]
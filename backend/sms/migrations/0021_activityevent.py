@@ -0,0 +1,49 @@
+# Generated by Django 4.2.7 on 2026-10-19 05:40
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def backfill_sms_events(apps, schema_editor):
+    """One SMS event per existing message, stamped with the message's creation time."""
+    SMSMessage = apps.get_model('sms', 'SMSMessage')
+    ActivityEvent = apps.get_model('sms', 'ActivityEvent')
+    batch = []
+    for message_id, user_id, created_at in SMSMessage.objects.values_list('id', 'user_id', 'created_at').iterator(chunk_size=2000):
+        batch.append(ActivityEvent(
+            user_id=user_id, category='sms', action='SMS sent', message_id=message_id, created_at=created_at,
+        ))
+        if len(batch) >= 2000:
+            ActivityEvent.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        ActivityEvent.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sms', '0020_message_search_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ActivityEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('category', models.CharField(choices=[('sms', 'SMS'), ('auth', 'Authentication'), ('template', 'Template')], max_length=20)),
+                ('action', models.CharField(max_length=100)),
+                ('status', models.CharField(choices=[('success', 'Success'), ('failed', 'Failed'), ('info', 'Info')], default='info', max_length=10)),
+                ('details', models.CharField(blank=True, max_length=255)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('message', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='activity_events', to='sms.smsmessage')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='activity_events', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['created_at', 'id'], name='activityevent_created_id'), models.Index(fields=['user', 'created_at', 'id'], name='activityevent_user_created'), models.Index(fields=['category', 'created_at', 'id'], name='activityevent_cat_created')],
+            },
+        ),
+        migrations.RunPython(backfill_sms_events, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-19 05:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sms', '0021_activityevent'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='studentcontact',
+            index=models.Index(fields=['phone_number'], name='studentcontact_phone'),
+        ),
+    ]
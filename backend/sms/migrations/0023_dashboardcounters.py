@@ -0,0 +1,31 @@
+# Generated by Django 4.2.7 on 2026-10-19 05:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sms', '0022_studentcontact_phone_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DashboardCounters',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(max_length=40, unique=True)),
+                ('users', models.IntegerField(default=0)),
+                ('messages', models.IntegerField(default=0)),
+                ('templates', models.IntegerField(default=0)),
+                ('approved_templates', models.IntegerField(default=0)),
+                ('pending_templates', models.IntegerField(default=0)),
+                ('groups', models.IntegerField(default=0)),
+                ('universal_groups', models.IntegerField(default=0)),
+                ('sent', models.IntegerField(default=0)),
+                ('delivered', models.IntegerField(default=0)),
+                ('failed', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 4.2.7 on 2026-10-19 05:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sms', '0023_dashboardcounters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='campaign',
+            name='draft_token',
+            field=models.CharField(blank=True, help_text='Client-side draft id the campaign was created from on first send (makes retries idempotent)', max_length=64, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='campaign',
+            constraint=models.UniqueConstraint(fields=('user', 'draft_token'), name='campaign_user_draft_token'),
+        ),
+    ]
@@ -0,0 +1,83 @@
+# Generated by Django 4.2.7 on 2026-10-19 11:55
+
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+# Frozen copy of sms.rollups as of this migration, so later changes to the
+# live helpers do not change what the backfill computes
+FAILED_STATUSES = ('failed', 'submit_failed')
+UNBILLED_STATUSES = ('submit_failed',)
+ROUTES = ('transactional', 'promotional')
+ENCODINGS = ('gsm7', 'ucs2')
+
+
+def segment_cost():
+    """Recipient-row expression: segments x tariff of the message's route and encoding."""
+    default = Decimal(str(settings.APP_SETTINGS.get('SMS_COST_PER_SEGMENT', 0.25)))
+    configured = settings.APP_SETTINGS.get('SMS_TARIFFS') or {}
+    whens = []
+    for route in ROUTES:
+        for encoding in ENCODINGS:
+            rate = (configured.get(route) or {}).get(encoding)
+            whens.append(models.When(
+                message__route=route, message__encoding=encoding,
+                then=models.Value(Decimal(str(rate)) if rate is not None else default),
+            ))
+    rate = models.Case(
+        *whens, default=models.Value(default), output_field=models.DecimalField(max_digits=10, decimal_places=4),
+    )
+    return models.ExpressionWrapper(
+        models.F('segments') * rate, output_field=models.DecimalField(max_digits=15, decimal_places=4),
+    )
+
+
+def backfill_daily_usage(apps, schema_editor):
+    """One rollup row per (user, local day) of existing messages, from one grouped query.
+
+    Rows the live code has already booked since 0014 are left alone.
+    """
+    SMSRecipient = apps.get_model('sms', 'SMSRecipient')
+    DailyUsageRollup = apps.get_model('sms', 'DailyUsageRollup')
+
+    billed = ~models.Q(status__in=UNBILLED_STATUSES)
+    grouped = (
+        SMSRecipient.objects
+        .annotate(day=TruncDate('message__created_at', tzinfo=timezone.get_current_timezone()))
+        .values('message__user_id', 'day')
+        .annotate(
+            sent=models.Count('id'),
+            delivered=models.Count('id', filter=models.Q(status='delivered')),
+            failed=models.Count('id', filter=models.Q(status__in=FAILED_STATUSES)),
+            billed_segments=models.Sum('segments', filter=billed),
+            cost=models.Sum(segment_cost(), filter=billed),
+        )
+        .order_by()
+    )
+    rows = [
+        DailyUsageRollup(
+            user_id=row['message__user_id'],
+            date=row['day'],
+            sent=row['sent'],
+            delivered=row['delivered'],
+            failed=row['failed'],
+            segments=row['billed_segments'] or 0,
+            cost=row['cost'] or 0,
+        )
+        for row in grouped.iterator(chunk_size=2000)
+    ]
+    DailyUsageRollup.objects.bulk_create(rows, batch_size=500, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sms', '0024_campaign_draft_token'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_daily_usage, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-19 12:05
+
+from django.db import migrations
+
+
+def reset_counters(apps, schema_editor):
+    """Drop counter rows built before the usage rollup was backfilled.
+
+    Their sent/delivered/failed totals were summed from an empty rollup
+    table; missing rows are rebuilt from the source tables on first use.
+    """
+    apps.get_model('sms', 'DashboardCounters').objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sms', '0025_backfill_daily_usage_rollup'),
+    ]
+
+    operations = [
+        migrations.RunPython(reset_counters, migrations.RunPython.noop),
+    ]
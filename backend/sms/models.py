@@ -1,9 +1,13 @@
-from django.db import models
+from django.db import models, IntegrityError
 from django.db.models import Q
 from django.contrib.auth.models import AbstractUser
 from django.core.validators import RegexValidator
 from django.conf import settings
 from django.utils import timezone
+from datetime import timedelta
+
+from .segments import ENCODING_CHOICES, GSM7, count_segments, encoding_for
+from .categories import CATEGORY_CHOICES, OTHER, categorize
 
 
 # --------------------------
@@ -75,6 +79,12 @@ class SenderID(models.Model):
     def __str__(self):
         return f"{self.name} ({self.type})"
 
+    @classmethod
+    def route_for(cls, name):
+        """Route (sender type) messages from `name` are billed under; transactional if unknown."""
+        route = cls.objects.filter(name=name).values_list('type', flat=True).first() if name else None
+        return route or 'transactional'
+
 
 # --------------------------
 # TEMPLATES
@@ -177,6 +187,10 @@ class StudentContact(models.Model):
     class Meta:
         unique_together = ('class_dept', 'phone_number')
         ordering = ['name']
+        indexes = [
+            # Recipient → contact lookups (sms.contacts) match on the number alone
+            models.Index(fields=['phone_number'], name='studentcontact_phone'),
+        ]
 
     def __str__(self):
         return f"{self.name} ({self.phone_number})"
@@ -213,13 +227,38 @@ class Campaign(models.Model):
     total_failed = models.PositiveIntegerField(default=0)
 
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="draft")
+    category = models.CharField(
+        max_length=20, choices=CATEGORY_CHOICES, default=OTHER, db_index=True,
+        help_text="Derived from title/description keywords on save",
+    )
     scheduled_for = models.DateTimeField(null=True, blank=True)
+    draft_token = models.CharField(
+        max_length=64, null=True, blank=True,
+        help_text="Client-side draft id the campaign was created from on first send (makes retries idempotent)",
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'draft_token'], name='campaign_user_draft_token'),
+        ]
+        indexes = [
+            # Keyset-paginated history, newest first (all / per user)
+            models.Index(fields=['created_at', 'id'], name='campaign_created_id'),
+            models.Index(fields=['user', 'created_at', 'id'], name='campaign_user_created_id'),
+        ]
+
     def __str__(self):
         return f"{self.title} ({self.status})"
 
+    def save(self, *args, **kwargs):
+        self.category = categorize(self.title, self.description)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and {"title", "description"} & set(update_fields):
+            kwargs["update_fields"] = {*update_fields, "category"}
+        super().save(*args, **kwargs)
+
     def update_stats(self):
         """Aggregates SMS message results into campaign totals."""
         related_messages = self.messages.all()
@@ -237,9 +276,16 @@ class SMSMessage(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='sms_messages')
     campaign = models.ForeignKey(Campaign, on_delete=models.CASCADE, null=True, blank=True, related_name="messages")
     template = models.ForeignKey(Template, on_delete=models.SET_NULL, null=True, blank=True, related_name="messages")
+    parent = models.ForeignKey(
+        "self", on_delete=models.SET_NULL, null=True, blank=True, related_name="retries",
+        help_text="Original message when this one resends its failed recipients",
+    )
     title = models.CharField(max_length=255, blank=True, null=True, help_text="Template title at time of sending")
 
     message_text = models.TextField()
+    encoding = models.CharField(max_length=8, choices=ENCODING_CHOICES, default=GSM7)
+    sender_name = models.CharField(max_length=20, blank=True, help_text="Sender ID the message was sent from")
+    route = models.CharField(max_length=20, choices=SenderID.TYPE_CHOICES, default='transactional')
     recipients = models.JSONField(default=list)
     status = models.CharField(max_length=20, default='pending')
     api_response = models.JSONField(null=True, blank=True)
@@ -250,9 +296,22 @@ class SMSMessage(models.Model):
     total_recipients = models.IntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Per-user range scans: usage report counts and last activity
+            models.Index(fields=['user', 'created_at'], name='smsmessage_user_created'),
+        ]
+
     def __str__(self):
         return f"SMS to {len(self.recipients)} recipients (Campaign: {self.campaign.title if self.campaign else 'N/A'})"
 
+    def save(self, *args, **kwargs):
+        self.encoding = encoding_for(self.message_text)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'message_text' in update_fields:
+            kwargs['update_fields'] = set(update_fields) | {'encoding'}
+        super().save(*args, **kwargs)
+
     def set_recipients_list(self, recipients_list):
         self.recipients = recipients_list or []
         self.total_recipients = len(recipients_list or [])
@@ -264,27 +323,311 @@ class SMSMessage(models.Model):
 # --------------------------
 class SMSRecipient(models.Model):
     """Tracks delivery status of each recipient within a message."""
+
+    # Statuses only move forward: a write is applied only when the target
+    # rank is strictly higher than the stored one (see sms/recipient_status.py),
+    # so a late "pending" poll can never overwrite "delivered".
+    STATUS_RANKS = {
+        "pending": 0,
+        "submitted": 1,
+        "sent": 1,
+        "failed": 2,
+        "submit_failed": 2,
+        "delivered": 3,
+    }
+
     message = models.ForeignKey(SMSMessage, on_delete=models.CASCADE, related_name="recipient_logs")
     phone_number = models.CharField(max_length=15)
-    api_message_id = models.CharField(max_length=100, null=True, blank=True)
+    api_message_id = models.CharField(max_length=100, null=True, blank=True, db_index=True)
     status = models.CharField(max_length=20, default="pending")  # pending/sent/delivered/failed
+    status_rank = models.PositiveSmallIntegerField(default=0)
     submit_time = models.DateTimeField(null=True, blank=True)
     delivery_time = models.DateTimeField(null=True, blank=True)
     error_code = models.IntegerField(null=True, blank=True)
     error_description = models.TextField(null=True, blank=True)
     error_message = models.TextField(null=True, blank=True)  # For storing error messages
     personalized_message = models.TextField(null=True, blank=True)  # For storing per-contact message content
+    segments = models.PositiveSmallIntegerField(default=1)  # Billed SMS parts for this recipient's text
+
+    class Meta:
+        indexes = [
+            # Status-filtered recipient lookups per message (resend-failed, details paging)
+            models.Index(fields=['message', 'status', 'id'], name='smsrecipient_msg_status_id'),
+            # Failures grouped by number across campaigns (error report)
+            models.Index(fields=['status', 'phone_number'], name='smsrecipient_status_phone'),
+            # Phone prefix search (sms/search.py)
+            models.Index(fields=['phone_number', 'id'], name='smsrecipient_phone_id'),
+        ]
 
     def __str__(self):
         return f"{self.phone_number} ({self.status})"
+
+    @classmethod
+    def rank_for(cls, status):
+        return cls.STATUS_RANKS.get(status, 0)
+
+    def text_segments(self):
+        """Segments of the text actually sent to this recipient."""
+        return count_segments(self.personalized_message or self.message.message_text)
+
+    def save(self, *args, **kwargs):
+        # Keep the rank in step with the status for ordinary ORM saves
+        self.status_rank = self.rank_for(self.status)
+        if self._state.adding:
+            self.segments = self.text_segments()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'status' in update_fields:
+            kwargs['update_fields'] = set(update_fields) | {'status_rank'}
+        super().save(*args, **kwargs)
     
     @property
     def contact(self):
-        """Get the associated contact by phone number"""
+        """The contact for this phone number (any stored form of it).
+
+        One query per recipient unless resolved up front with
+        sms.contacts.ContactResolver.attach(); use that for lists.
+        """
+        if '_contact' not in self.__dict__:
+            from .contacts import ContactResolver
+            self._contact = ContactResolver().get(self.phone_number)
+        return self._contact
+
+
+# --------------------------
+# PER-MESSAGE STATUS SUMMARY
+# --------------------------
+class MessageStatusSummary(models.Model):
+    """Recipient counts per status for one message.
+
+    Maintained by delta from sms/recipient_status.py whenever recipients are
+    inserted or transitioned, so status counts are a single-row read instead
+    of a COUNT over recipient_logs. `manage.py rebuild_status_summaries`
+    repairs any drift.
+    """
+
+    # Recipient status -> counter column
+    STATUS_COLUMNS = {
+        "pending": "pending",
+        "submitted": "submitted",
+        "sent": "submitted",
+        "delivered": "delivered",
+        "failed": "failed",
+        "submit_failed": "submit_failed",
+    }
+
+    message = models.OneToOneField(
+        SMSMessage, on_delete=models.CASCADE, primary_key=True, related_name="status_summary"
+    )
+    pending = models.IntegerField(default=0)
+    submitted = models.IntegerField(default=0)
+    delivered = models.IntegerField(default=0)
+    failed = models.IntegerField(default=0)
+    submit_failed = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Summary for SMS {self.message_id}"
+
+    @classmethod
+    def column_for(cls, status):
+        return cls.STATUS_COLUMNS.get(status, "pending")
+
+    @property
+    def total(self):
+        return self.pending + self.submitted + self.delivered + self.failed + self.submit_failed
+
+    @property
+    def total_failed(self):
+        return self.failed + self.submit_failed
+
+    @property
+    def total_pending(self):
+        return self.pending + self.submitted
+
+
+# --------------------------
+# DUPLICATE-SEND FINGERPRINTS
+# --------------------------
+class SendFingerprint(models.Model):
+    """Hash of (normalized phone, message text) for a recently accepted send.
+
+    Looked up in bulk at send time to drop repeats inside the suppression
+    window (see sms/suppression.py); rows older than the window are pruned
+    by `manage.py prune_send_fingerprints`.
+    """
+    digest = models.CharField(max_length=64)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['digest', 'created_at'], name='sendfingerprint_digest_time'),
+            models.Index(fields=['created_at'], name='sendfingerprint_time'),
+        ]
+
+    def __str__(self):
+        return f"{self.digest[:12]}… @ {self.created_at}"
+
+
+# --------------------------
+# ACTIVITY LOG
+# --------------------------
+class ActivityEvent(models.Model):
+    """Append-only audit trail behind the admin activity feed.
+
+    SMS sends, logins and template changes each add one row; rows are never
+    updated. An SMS event links to its message so the feed shows the
+    message's current delivery status (see sms/activity.py).
+    """
+    SMS = "sms"
+    AUTH = "auth"
+    TEMPLATE = "template"
+    CATEGORY_CHOICES = [
+        (SMS, "SMS"),
+        (AUTH, "Authentication"),
+        (TEMPLATE, "Template"),
+    ]
+    STATUS_CHOICES = [
+        ("success", "Success"),
+        ("failed", "Failed"),
+        ("info", "Info"),
+    ]
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name="activity_events"
+    )
+    category = models.CharField(max_length=20, choices=CATEGORY_CHOICES)
+    action = models.CharField(max_length=100)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default="info")
+    details = models.CharField(max_length=255, blank=True)
+    message = models.ForeignKey(
+        "SMSMessage", on_delete=models.SET_NULL, null=True, blank=True, related_name="activity_events"
+    )
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            # Keyset-paginated feed, newest first (all / per user / per category)
+            models.Index(fields=['created_at', 'id'], name='activityevent_created_id'),
+            models.Index(fields=['user', 'created_at', 'id'], name='activityevent_user_created'),
+            models.Index(fields=['category', 'created_at', 'id'], name='activityevent_cat_created'),
+        ]
+
+    def __str__(self):
+        return f"{self.category}: {self.action} @ {self.created_at}"
+
+
+# --------------------------
+# SYNC CHECKPOINTS
+# --------------------------
+class SyncCheckpoint(models.Model):
+    """High-water mark and lease lock for an incremental background job.
+
+    The lease is taken with a conditional UPDATE, so a job scheduled from
+    cron on several nodes runs on exactly one of them at a time, and a
+    crashed holder's lease simply expires.
+    """
+    name = models.CharField(max_length=100, unique=True)
+    watermark = models.DateTimeField(null=True, blank=True)
+    offset = models.PositiveIntegerField(default=0)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    locked_by = models.CharField(max_length=255, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} @ {self.watermark or '-'} (+{self.offset})"
+
+    @classmethod
+    def acquire(cls, name, owner, lease_seconds=300):
+        """Take the lease for `name`; returns the checkpoint, or None if another holder has it."""
+        now = timezone.now()
         try:
-            return StudentContact.objects.filter(phone_number=self.phone_number).first()
-        except Exception:
+            cls.objects.get_or_create(name=name)
+        except IntegrityError:
+            pass  # created concurrently by another node
+        taken = cls.objects.filter(name=name).filter(
+            Q(locked_until__isnull=True) | Q(locked_until__lt=now) | Q(locked_by=owner)
+        ).update(locked_until=now + timedelta(seconds=lease_seconds), locked_by=owner)
+        if not taken:
             return None
+        return cls.objects.get(name=name)
+
+    def renew(self, lease_seconds=300):
+        """Extend our lease from now; False if it expired and another holder took it."""
+        locked_until = timezone.now() + timedelta(seconds=lease_seconds)
+        renewed = SyncCheckpoint.objects.filter(pk=self.pk, locked_by=self.locked_by).update(locked_until=locked_until)
+        if renewed:
+            self.locked_until = locked_until
+        return bool(renewed)
+
+    def release(self):
+        """Persist progress and drop the lease if we still hold it."""
+        SyncCheckpoint.objects.filter(pk=self.pk, locked_by=self.locked_by).update(
+            watermark=self.watermark,
+            offset=self.offset,
+            locked_until=None,
+            locked_by='',
+            updated_at=timezone.now(),
+        )
+
+
+# --------------------------
+# DAILY USAGE ROLLUP
+# --------------------------
+class DailyUsageRollup(models.Model):
+    """SMS usage of one user on one local day (the day the message was created).
+
+    `sent` counts recipients (individual SMS), `failed` includes submit
+    failures. `segments` and `cost` cover billed rows only: the provider
+    never accepted submit failures, so they are not charged. Maintained by delta alongside MessageStatusSummary (see
+    sms/rollups.py); `manage.py rebuild_rollups` recomputes it.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='usage_rollups')
+    date = models.DateField()
+    sent = models.IntegerField(default=0)
+    delivered = models.IntegerField(default=0)
+    failed = models.IntegerField(default=0)
+    segments = models.IntegerField(default=0)
+    cost = models.DecimalField(max_digits=15, decimal_places=4, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'date'], name='dailyusagerollup_user_date'),
+        ]
+        indexes = [
+            models.Index(fields=['date'], name='dailyusagerollup_date'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} @ {self.date}: {self.sent} sent"
+
+
+# --------------------------
+# DASHBOARD COUNTERS
+# --------------------------
+class DashboardCounters(models.Model):
+    """Running totals behind the dashboards, one row per scope.
+
+    `scope` is "all" (system-wide) or "user:<id>" (that user's own messages,
+    templates and groups), the same scopes as the report cache. Maintained
+    by delta from signals and the usage rollup (see sms/counters.py);
+    `manage.py reconcile_counters` recomputes them.
+    """
+    scope = models.CharField(max_length=40, unique=True)
+    users = models.IntegerField(default=0)
+    messages = models.IntegerField(default=0)
+    templates = models.IntegerField(default=0)
+    approved_templates = models.IntegerField(default=0)
+    pending_templates = models.IntegerField(default=0)
+    groups = models.IntegerField(default=0)
+    universal_groups = models.IntegerField(default=0)
+    sent = models.IntegerField(default=0)
+    delivered = models.IntegerField(default=0)
+    failed = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.scope}: {self.messages} messages, {self.sent} sent"
 
 
 # --------------------------
@@ -0,0 +1,57 @@
+from datetime import datetime
+
+from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse
+from django.utils import timezone
+from sms.models import ActivityEvent
+from sms.pagination import InvalidCursor, page_size_param
+from sms.services import AdminAnalyticsService
+
+# =========================================================================
+# ACTIVITY FEED API
+# =========================================================================
+
+@login_required
+def activity_feed_api(request):
+    """Admin activity feed, newest first.
+
+    Query params:
+        ?cursor=<next_cursor from the previous page>&limit=<page size, max 100>
+        ?user=<user id>
+        ?status=success|failed|info
+        ?category=sms|auth|template
+        ?start=YYYY-MM-DD&end=YYYY-MM-DD - local days, inclusive
+    """
+    if request.user.role != 'admin':
+        return JsonResponse({"error": "Admin access required"}, status=403)
+
+    filters = {}
+    try:
+        if request.GET.get('user'):
+            filters['user_id'] = int(request.GET['user'])
+        for name, param in (('start_day', 'start'), ('end_day', 'end')):
+            if request.GET.get(param):
+                filters[name] = datetime.strptime(request.GET[param], '%Y-%m-%d').date()
+    except ValueError:
+        return JsonResponse({"error": "Invalid user or date filter"}, status=400)
+
+    status = request.GET.get('status')
+    if status:
+        filters['status'] = status
+    category = request.GET.get('category')
+    if category:
+        if category not in dict(ActivityEvent.CATEGORY_CHOICES):
+            return JsonResponse({"error": "Invalid category"}, status=400)
+        filters['category'] = category
+
+    service = AdminAnalyticsService(user=request.user)
+    try:
+        entries, next_cursor = service.get_activity_logs(
+            cursor=request.GET.get('cursor'), length=page_size_param(request, default=25), **filters
+        )
+    except InvalidCursor as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    for entry in entries:
+        entry['timestamp'] = timezone.localtime(entry['timestamp']).strftime("%d %b %Y, %H:%M")
+    return JsonResponse({"results": entries, "next_cursor": next_cursor})
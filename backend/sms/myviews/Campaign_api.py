@@ -1,8 +1,26 @@
 from django.views.decorators.csrf import csrf_exempt
 from django.contrib.auth.decorators import login_required
+from django.db.models import Exists, OuterRef
 from django.http import JsonResponse
+from django.utils import timezone
+from datetime import datetime
 import json
-from sms.models import Campaign
+import logging
+from sms.analytics import local_day_bounds
+from sms.models import Campaign, SenderID, SMSMessage, SMSRecipient, SMSUsageStats
+from sms.pagination import InvalidCursor, keyset_page, page_size_param
+from sms.services import MySMSMantraService
+from sms.api_error_code_dict import is_permanent_error
+from sms.contacts import contact_resolver
+from sms.exports import RECIPIENT_LOG_COLUMNS, export_response, recipient_log_rows
+from .send_sms_api import deduct_credits
+
+logger = logging.getLogger(__name__)
+
+FAILED_RECIPIENT_STATUSES = ["failed", "submit_failed"]
+
+# Campaign.update_stats() totals returned by get_campaigns(?counts=true)
+CAMPAIGN_COUNT_FIELDS = ['total_recipients', 'total_sent', 'total_delivered', 'total_failed']
 
 # =========================================================================
 # CAMPAIGNS API
@@ -10,10 +28,16 @@ from sms.models import Campaign
 
 @login_required
 def get_campaigns(request):
-    """Return campaigns based on user role and context.
+    """Return campaigns based on user role and context, newest first.
     
     Query params:
         ?own=true - Force return only user's own campaigns (used by send.html)
+        ?cursor=<next_cursor from the previous page>&limit=<page size, max 100>
+        ?status=<campaign status>
+        ?start=YYYY-MM-DD&end=YYYY-MM-DD - local creation days, inclusive
+        ?owner=<user id> - admins only; one teacher's campaigns
+        ?q=<title prefix>
+        ?counts=true - include the campaign's recipient and delivery totals
     
     Default behavior:
         - Admin: sees all campaigns (from all teachers) for history/reports
@@ -24,23 +48,57 @@ def get_campaigns(request):
     
     if own_only or user.role != 'admin':
         # Teachers always see own, or admin explicitly requested own campaigns only
-        campaigns = Campaign.objects.filter(user=user).order_by('-created_at')
+        campaigns = Campaign.objects.filter(user=user)
     else:
         # Admin sees all campaigns system-wide (for history/reports)
-        campaigns = Campaign.objects.all().order_by('-created_at')
-    
-    data = [
-        {
-            "id": c.id,
-            "title": c.title or f"Untitled Campaign {c.id}",
-            "status": c.status or "draft",
-            "created_at": c.created_at.strftime("%Y-%m-%d %H:%M"),
-            "user": c.user.username if c.user else "Unknown",
-            "user_email": c.user.email if c.user else ""
+        campaigns = Campaign.objects.all()
+        if request.GET.get('owner'):
+            try:
+                campaigns = campaigns.filter(user_id=int(request.GET['owner']))
+            except ValueError:
+                return JsonResponse({"error": "Invalid owner"}, status=400)
+
+    if request.GET.get('status'):
+        campaigns = campaigns.filter(status=request.GET['status'])
+    if request.GET.get('q'):
+        campaigns = campaigns.filter(title__istartswith=request.GET['q'].strip())
+    try:
+        days = [
+            datetime.strptime(request.GET[param], '%Y-%m-%d').date() if request.GET.get(param) else None
+            for param in ('start', 'end')
+        ]
+    except ValueError:
+        return JsonResponse({"error": "Dates must be YYYY-MM-DD"}, status=400)
+    if any(days):
+        start_dt, end_dt = local_day_bounds(days[0] or days[1], days[1] or days[0])
+        campaigns = campaigns.filter(created_at__range=[start_dt, end_dt])
+
+    with_counts = request.GET.get('counts', '').lower() == 'true'
+    fields = ['id', 'title', 'status', 'created_at', 'user__username', 'user__email']
+    if with_counts:
+        fields += CAMPAIGN_COUNT_FIELDS
+
+    try:
+        rows, next_cursor = keyset_page(
+            campaigns.values(*fields), cursor=request.GET.get('cursor'), limit=page_size_param(request)
+        )
+    except InvalidCursor as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    data = []
+    for c in rows:
+        entry = {
+            "id": c['id'],
+            "title": c['title'] or f"Untitled Campaign {c['id']}",
+            "status": c['status'] or "draft",
+            "created_at": timezone.localtime(c['created_at']).strftime("%Y-%m-%d %H:%M"),
+            "user": c['user__username'] or "Unknown",
+            "user_email": c['user__email'] or "",
         }
-        for c in campaigns
-    ]
-    return JsonResponse(data, safe=False)
+        if with_counts:
+            entry.update({field: c[field] for field in CAMPAIGN_COUNT_FIELDS})
+        data.append(entry)
+    return JsonResponse({"results": data, "next_cursor": next_cursor})
 
 @csrf_exempt
 @login_required
@@ -72,3 +130,173 @@ def create_campaign(request):
             return JsonResponse({"error": str(e)}, status=500)
 
     return JsonResponse({"error": "POST only"}, status=405)
+
+
+@csrf_exempt
+@login_required
+def resend_failed(request, campaign_id):
+    """Resend a campaign's failed recipients as a child SMSMessage.
+
+    Only numbers whose latest outcome in the campaign is failed/submit_failed
+    are picked, permanent provider errors (invalid number, DND, ...) are
+    skipped, and each number gets the text it originally failed with. The
+    retry goes out under the parent message's sender ID unless the body
+    names another ("sender_id").
+    """
+    if request.method != 'POST':
+        return JsonResponse({"error": "POST only"}, status=405)
+
+    try:
+        campaign = Campaign.objects.get(id=campaign_id)
+    except Campaign.DoesNotExist:
+        return JsonResponse({"error": "Campaign not found"}, status=404)
+
+    if request.user.role != 'admin' and campaign.user_id != request.user.id:
+        return JsonResponse({"error": "Permission denied"}, status=403)
+
+    try:
+        data = json.loads(request.body or b"{}")
+
+        # Numbers that were later delivered (or are still in flight) in this campaign
+        recovered = SMSRecipient.objects.filter(
+            message__campaign=campaign,
+            phone_number=OuterRef('phone_number'),
+        ).exclude(status__in=FAILED_RECIPIENT_STATUSES)
+
+        failed_rows = (
+            SMSRecipient.objects
+            .filter(message__campaign=campaign, status__in=FAILED_RECIPIENT_STATUSES)
+            .filter(~Exists(recovered))
+            .order_by('-id')
+            .values_list('phone_number', 'error_code', 'personalized_message',
+                         'message_id', 'message__message_text')
+        )
+
+        # phone -> text; latest failure per number wins
+        texts = {}
+        skipped_permanent = 0
+        skipped_no_text = 0
+        seen = set()
+        parent_id = None
+        for phone, error_code, personalized, message_id, message_text in failed_rows.iterator():
+            if phone in seen:
+                continue
+            seen.add(phone)
+            if not phone or phone == "UNKNOWN":
+                continue
+            if is_permanent_error(error_code):
+                skipped_permanent += 1
+                continue
+            text = personalized or (None if message_text.endswith(" (personalized)") else message_text)
+            if not text:
+                skipped_no_text += 1
+                continue
+            texts[phone] = (text, personalized is not None)
+            parent_id = max(parent_id or 0, message_id)
+
+        if not texts:
+            return JsonResponse({
+                "success": True,
+                "campaign_id": campaign.id,
+                "resent": 0,
+                "skipped_permanent": skipped_permanent,
+                "skipped_no_text": skipped_no_text,
+            })
+
+        try:
+            usage_stats = SMSUsageStats.objects.get(user=request.user)
+            if usage_stats.remaining_credits < len(texts):
+                return JsonResponse({
+                    "error": f"Insufficient credits. Required: {len(texts)}, Available: {int(usage_stats.remaining_credits)}"
+                }, status=400)
+        except SMSUsageStats.DoesNotExist:
+            return JsonResponse({"error": "No SMS credits allocated to your account. Please contact admin."}, status=400)
+
+        # Group numbers sharing the same text so each text is one batched call
+        batches = {}
+        personalized = False
+        for phone, (text, is_personalized) in texts.items():
+            batches.setdefault(text, []).append(phone)
+            personalized = personalized or is_personalized
+
+        parent = SMSMessage.objects.only('id', 'title', 'template_id', 'sender_name').get(id=parent_id)
+        # Same sender as the original keeps DLT template matching and the billed route
+        sender_id = data.get("sender_id") or parent.sender_name or None
+        first_text = next(iter(batches))
+        sms_message = SMSMessage.objects.create(
+            user=request.user,
+            campaign=campaign,
+            template_id=parent.template_id,
+            parent=parent,
+            title=f"Retry: {parent.title or campaign.title}",
+            message_text=first_text if len(batches) == 1 else first_text + " (personalized)",
+            sender_name=sender_id or "",
+            route=SenderID.route_for(sender_id),
+            recipients=list(texts.keys()),
+            total_recipients=len(texts),
+            status='pending'
+        )
+
+        logger.info(f"🔁 Resending {len(texts)} failed recipients of campaign {campaign.id} as SMS {sms_message.id}")
+
+        service = MySMSMantraService(user=request.user)
+        result = service.send_batches(sms_message, list(batches.items()), sender_id, personalized=personalized)
+
+        deduct_credits(request.user, result["submitted"])
+
+        campaign.status = "active"
+        campaign.save(update_fields=["status", "updated_at"])
+
+        return JsonResponse({
+            "success": result["success"],
+            "campaign_id": campaign.id,
+            "message_id": sms_message.id,
+            "parent_message_id": parent.id,
+            "resent": len(texts),
+            "submitted": result["submitted"],
+            "rejected": result["rejected"],
+            "skipped_permanent": skipped_permanent,
+            "skipped_no_text": skipped_no_text,
+        })
+
+    except Exception as e:
+        logger.exception("Error resending failed recipients")
+        return JsonResponse({"error": str(e)}, status=500)
+
+
+@login_required
+def export_campaign_logs(request, campaign_id):
+    """Stream a campaign's per-recipient delivery log as CSV (default) or XLSX.
+
+    Query params:
+        ?format=csv|xlsx
+        ?status=<recipient status> - only rows in this status
+    """
+    if request.method != 'GET':
+        return JsonResponse({"error": "GET only"}, status=405)
+
+    try:
+        campaign = Campaign.objects.get(id=campaign_id)
+    except Campaign.DoesNotExist:
+        return JsonResponse({"error": "Campaign not found"}, status=404)
+
+    if request.user.role != 'admin' and campaign.user_id != request.user.id:
+        return JsonResponse({"error": "Permission denied"}, status=403)
+
+    rows = SMSRecipient.objects.filter(message__campaign=campaign)
+    if request.GET.get('status'):
+        rows = rows.filter(status=request.GET['status'])
+    header, rows = recipient_log_rows(
+        rows.order_by('message_id', 'id'), RECIPIENT_LOG_COLUMNS, contact_resolver(request)
+    )
+
+    try:
+        return export_response(
+            f"campaign_{campaign.id}_delivery_log",
+            header,
+            rows,
+            file_format=request.GET.get('format', 'csv'),
+            sheet_title="Delivery log",
+        )
+    except ImportError:
+        return JsonResponse({"error": "openpyxl library not installed. Run: pip install openpyxl"}, status=500)
@@ -0,0 +1,245 @@
+from django.contrib.auth.decorators import login_required
+from django.db.models import Count
+from django.http import JsonResponse
+from django.utils import timezone
+from sms.contacts import contact_resolver
+from sms.models import Campaign, MessageStatusSummary, SMSMessage, SMSRecipient
+from sms.pagination import InvalidCursor, keyset_page, page_size_param
+from sms.recipient_status import get_status_summary
+from sms.search import is_phone_query, search_phone, search_text
+
+# =========================================================================
+# MESSAGE HISTORY API
+# =========================================================================
+# Campaign summaries page by (created_at, id); a campaign's messages and a
+# message's recipient logs are fetched only when the row is expanded.
+
+
+def _local(dt, fmt):
+    return timezone.localtime(dt).strftime(fmt) if dt else None
+
+
+def _can_view(user, owner_id):
+    return user.role == 'admin' or owner_id == user.id
+
+
+@login_required
+def history_campaigns(request):
+    """Campaign summaries, newest first.
+
+    Query params:
+        ?cursor=<next_cursor from the previous page>
+        ?limit=<page size, max 100>
+    """
+    user = request.user
+    campaigns = Campaign.objects.all() if user.role == 'admin' else Campaign.objects.filter(user=user)
+    campaigns = campaigns.values(
+        'id', 'title', 'status', 'category', 'total_recipients', 'total_sent',
+        'total_delivered', 'total_failed', 'created_at', 'user__username',
+    ).annotate(message_count=Count('messages'))
+
+    try:
+        rows, next_cursor = keyset_page(campaigns, cursor=request.GET.get('cursor'), limit=page_size_param(request))
+    except InvalidCursor as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    return JsonResponse({
+        "results": [
+            {
+                "id": c['id'],
+                "title": c['title'] or f"Untitled Campaign {c['id']}",
+                "status": c['status'],
+                "category": c['category'],
+                "total_recipients": c['total_recipients'],
+                "total_sent": c['total_sent'],
+                "total_delivered": c['total_delivered'],
+                "total_failed": c['total_failed'],
+                "message_count": c['message_count'],
+                "user": c['user__username'],
+                "created_at": _local(c['created_at'], "%d-%m-%Y %H:%M"),
+            }
+            for c in rows
+        ],
+        "next_cursor": next_cursor,
+    })
+
+
+@login_required
+def campaign_messages(request, campaign_id):
+    """A campaign's messages, newest first (same ?cursor= / ?limit= as history_campaigns)."""
+    try:
+        campaign = Campaign.objects.only('id', 'user_id').get(id=campaign_id)
+    except Campaign.DoesNotExist:
+        return JsonResponse({"error": "Campaign not found"}, status=404)
+
+    if not _can_view(request.user, campaign.user_id):
+        return JsonResponse({"error": "Permission denied"}, status=403)
+
+    messages_qs = SMSMessage.objects.filter(campaign=campaign).values(
+        'id', 'title', 'message_text', 'status', 'sender_name', 'total_recipients',
+        'successful_deliveries', 'failed_deliveries', 'sent_at', 'created_at',
+    )
+    try:
+        rows, next_cursor = keyset_page(messages_qs, cursor=request.GET.get('cursor'), limit=page_size_param(request))
+    except InvalidCursor as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    return JsonResponse({
+        "results": [
+            {
+                "id": m['id'],
+                "title": m['title'],
+                "message_text": m['message_text'],
+                "status": m['status'],
+                "sender_name": m['sender_name'],
+                "total_recipients": m['total_recipients'],
+                "delivered": m['successful_deliveries'],
+                "failed": m['failed_deliveries'],
+                "sent_at": _local(m['sent_at'] or m['created_at'], "%d %b %Y, %H:%M"),
+            }
+            for m in rows
+        ],
+        "next_cursor": next_cursor,
+    })
+
+
+# ?sort= -> (keyset fields, descending); all are served by the (message, status, id) index
+RECIPIENT_SORTS = {
+    'id': (('id',), False),
+    '-id': (('id',), True),
+    'status': (('status', 'id'), False),
+    '-status': (('status', 'id'), True),
+}
+
+
+@login_required
+def message_recipients(request, message_id):
+    """A message's recipient logs, in send order by default.
+
+    Query params:
+        ?cursor=<next_cursor from the previous page>&limit=<page size, max 100>
+        ?status=<status>[,<status>...] - only recipients in these statuses
+        ?sort=id|-id|status|-status
+        ?compact=true - only id, name, phone_number, status, error_code and text
+
+    Every page carries the message's status counts from its status summary.
+    """
+    try:
+        message = SMSMessage.objects.only('id', 'user_id').get(id=message_id)
+    except SMSMessage.DoesNotExist:
+        return JsonResponse({"error": "Message not found"}, status=404)
+
+    if not _can_view(request.user, message.user_id):
+        return JsonResponse({"error": "Permission denied"}, status=403)
+
+    sort = request.GET.get('sort', 'id')
+    if sort not in RECIPIENT_SORTS:
+        return JsonResponse({"error": f"sort must be one of {', '.join(RECIPIENT_SORTS)}"}, status=400)
+    fields, descending = RECIPIENT_SORTS[sort]
+    compact = request.GET.get('compact', '').lower() == 'true'
+
+    recipients = SMSRecipient.objects.filter(message=message)
+    statuses = [s for s in request.GET.get('status', '').split(',') if s]
+    unknown = [s for s in statuses if s not in MessageStatusSummary.STATUS_COLUMNS]
+    if unknown:
+        return JsonResponse({"error": f"Unknown status: {', '.join(unknown)}"}, status=400)
+    if statuses:
+        recipients = recipients.filter(status__in=statuses)
+    if compact:
+        recipients = recipients.values('id', 'phone_number', 'status', 'error_code', 'personalized_message')
+    else:
+        recipients = recipients.values(
+            'id', 'phone_number', 'api_message_id', 'status', 'submit_time',
+            'delivery_time', 'error_code', 'error_description',
+        )
+    try:
+        rows, next_cursor = keyset_page(
+            recipients, fields=fields, cursor=request.GET.get('cursor'),
+            limit=page_size_param(request, default=50), descending=descending,
+        )
+    except InvalidCursor as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    # Contact names for the whole page in one query
+    names = contact_resolver(request).names({r['phone_number'] for r in rows})
+
+    if compact:
+        results = [
+            {
+                "id": r['id'],
+                "name": names.get(r['phone_number']),
+                "phone_number": r['phone_number'],
+                "status": r['status'],
+                "error_code": r['error_code'],
+                "text": r['personalized_message'],
+            }
+            for r in rows
+        ]
+    else:
+        results = [
+            {
+                "id": r['id'],
+                "name": names.get(r['phone_number']),
+                "phone_number": r['phone_number'],
+                "api_message_id": r['api_message_id'],
+                "status": r['status'],
+                "submit_time": _local(r['submit_time'], "%d %b %H:%M"),
+                "delivery_time": _local(r['delivery_time'], "%d %b %H:%M"),
+                "error_code": r['error_code'],
+                "error_description": r['error_description'],
+            }
+            for r in rows
+        ]
+
+    summary = get_status_summary(message.id)
+    return JsonResponse({
+        "results": results,
+        "next_cursor": next_cursor,
+        "counts": {
+            "total": summary.total,
+            "pending": summary.pending,
+            "submitted": summary.submitted,
+            "delivered": summary.delivered,
+            "failed": summary.failed,
+            "submit_failed": summary.submit_failed,
+        },
+    })
+
+
+@login_required
+def search_history(request):
+    """Search sent messages by text or by recipient phone number.
+
+    Query params:
+        ?q=<words or phone digits> - digits search numbers by prefix, anything
+                                    else is a ranked full-text search
+        ?page=<n>&limit=<page size, max 50>
+    """
+    query = (request.GET.get('q') or '').strip()
+    if len(query) < 2:
+        return JsonResponse({"error": "Search query must be at least 2 characters"}, status=400)
+
+    try:
+        page = int(request.GET.get('page', 1))
+    except ValueError:
+        page = 1
+    limit = page_size_param(request)
+
+    if is_phone_query(query):
+        mode = 'phone'
+        results, has_more = search_phone(request.user, query, page=page, page_size=limit)
+    else:
+        mode = 'text'
+        results, has_more = search_text(request.user, query, page=page, page_size=limit)
+
+    names = contact_resolver(request).names({r['phone_number'] for r in results if r['phone_number']})
+    for result in results:
+        result['name'] = names.get(result['phone_number'])
+
+    return JsonResponse({
+        "query": query,
+        "mode": mode,
+        "page": page,
+        "results": results,
+        "has_more": has_more,
+    })
@@ -4,8 +4,14 @@ from django.contrib.auth.decorators import login_required
 from django.utils import timezone
 import json
 import logging
-from ..models import Campaign, SMSRecipient, SMSMessage, SMSUsageStats, Template
+from ..models import Campaign, SenderID, SMSMessage, SMSUsageStats, Template
 from ..services import MySMSMantraService
+from ..recipient_status import new_recipient, create_recipients, get_status_summary
+from ..api_error_code_dict import normalize_error_code
+from ..suppression import split_duplicates, record_sends
+from ..rollups import cost_per_segment
+from ..report_cache import cached_report
+from ..stats import send_page_stats
 logger = logging.getLogger(__name__)
 # =========================================================================
 # SMS SENDING API
@@ -36,11 +42,36 @@ def send_sms_api(request):
         if per_contact_messages:
             if not recipients_with_messages:
                 return JsonResponse({"error": "No recipients with messages provided"}, status=400)
-            total_recipients_count = len(recipients_with_messages)
         else:
             if not recipients:
                 return JsonResponse({"error": "No recipients provided"}, status=400)
-            total_recipients_count = len(recipients)
+
+        # Drop repeats of the same text to the same number inside the suppression window
+        suppressed_numbers = []
+        if not data.get("allow_duplicates"):
+            if per_contact_messages:
+                pairs = [
+                    ((r.get("phone") or "").strip(), (r.get("message") or "").strip())
+                    for r in recipients_with_messages
+                ]
+                allowed, suppressed = split_duplicates(pairs)
+                recipients_with_messages = [{"phone": phone, "message": text} for phone, text in allowed]
+            else:
+                allowed, suppressed = split_duplicates((phone, message) for phone in recipients)
+                recipients = [phone for phone, _ in allowed]
+            suppressed_numbers = [phone for phone, _ in suppressed]
+
+            if suppressed_numbers:
+                logger.info(f"🔁 Suppressed {len(suppressed_numbers)} duplicate sends")
+            if not allowed:
+                return JsonResponse({
+                    "success": False,
+                    "error": "All recipients already received this message recently",
+                    "suppressed": len(suppressed_numbers),
+                    "suppressed_numbers": suppressed_numbers,
+                }, status=409)
+
+        total_recipients_count = len(recipients_with_messages) if per_contact_messages else len(recipients)
 
         # Check credits BEFORE sending (Issue #4 fix)
         try:
@@ -52,7 +83,9 @@ def send_sms_api(request):
         except SMSUsageStats.DoesNotExist:
             return JsonResponse({"error": "No SMS credits allocated to your account. Please contact admin."}, status=400)
 
-        # Find or create campaign
+        # Find or create campaign. Campaigns named on the send page are only
+        # drafts in the browser until here; their token makes a retried
+        # submit reuse the campaign created by the first one.
         campaign = None
         if campaign_id and str(campaign_id).isdigit():
             try:
@@ -61,11 +94,14 @@ def send_sms_api(request):
                 pass
 
         if not campaign:
-            campaign = Campaign.objects.create(
-                user=request.user,
-                title=f"Campaign {timezone.now().strftime('%d-%b %H:%M')}",
-                status="active"
-            )
+            title = (data.get("campaign_title") or "").strip()[:255] or f"Campaign {timezone.now().strftime('%d-%b %H:%M')}"
+            draft_token = (data.get("campaign_draft_token") or "").strip()[:64]
+            if draft_token:
+                campaign, _ = Campaign.objects.get_or_create(
+                    user=request.user, draft_token=draft_token, defaults={"title": title, "status": "active"}
+                )
+            else:
+                campaign = Campaign.objects.create(user=request.user, title=title, status="active")
 
         # Get template if provided
         template = None
@@ -86,7 +122,7 @@ def send_sms_api(request):
         if per_contact_messages:
             return send_per_contact_messages(
                 request, campaign, template, template_title,
-                recipients_with_messages, sender_id
+                recipients_with_messages, sender_id, suppressed_numbers
             )
 
         # Standard mode - same message to all recipients
@@ -97,6 +133,8 @@ def send_sms_api(request):
             template=template,
             title=template_title,
             message_text=message,
+            sender_name=sender_id,
+            route=SenderID.route_for(sender_id),
             recipients=recipients,
             total_recipients=len(recipients),
             status='pending'
@@ -124,9 +162,10 @@ def send_sms_api(request):
         # with proper api_message_id for each recipient
         sms_message.refresh_from_db()
         
-        # Get counts from the created recipient logs
-        submitted_count = sms_message.recipient_logs.filter(status="pending").count()
-        submit_failed_count = sms_message.recipient_logs.filter(status="submit_failed").count()
+        # Get counts from the message's status summary
+        summary = get_status_summary(sms_message.id)
+        submitted_count = summary.pending
+        submit_failed_count = summary.submit_failed
 
         # Update Campaign to 'active' - not completed until we check status
         campaign.total_recipients = sms_message.total_recipients
@@ -137,17 +176,10 @@ def send_sms_api(request):
         logger.info(f"📤 SMS campaign '{campaign.title}' submitted → Accepted={submitted_count}, Rejected={submit_failed_count}")
 
         # Deduct credits after successful send (Issue #3 fix)
-        try:
-            usage_stats, _ = SMSUsageStats.objects.get_or_create(
-                user=request.user,
-                defaults={'remaining_credits': 0, 'total_sent': 0, 'total_delivered': 0, 'total_failed': 0}
-            )
-            usage_stats.remaining_credits -= submitted_count
-            usage_stats.total_sent += submitted_count
-            usage_stats.save()
-            logger.info(f"💰 Credits deducted: {submitted_count}, Remaining: {usage_stats.remaining_credits}")
-        except Exception as e:
-            logger.warning(f"Failed to update usage stats: {e}")
+        deduct_credits(request.user, submitted_count)
+
+        accepted = sms_message.recipient_logs.filter(status="pending").values_list("phone_number", flat=True)
+        record_sends((phone, message) for phone in accepted)
 
         return JsonResponse({
             "success": True,
@@ -156,6 +188,8 @@ def send_sms_api(request):
             "submitted": submitted_count,
             "rejected": submit_failed_count,
             "recipients": sms_message.total_recipients,
+            "suppressed": len(suppressed_numbers),
+            "suppressed_numbers": suppressed_numbers,
             "redirect_to": "/history/",
         })
 
@@ -164,7 +198,23 @@ def send_sms_api(request):
         return JsonResponse({"error": str(e)}, status=500)
 
 
-def send_per_contact_messages(request, campaign, template, template_title, recipients_with_messages, sender_id):
+def deduct_credits(user, submitted_count):
+    """Charge `submitted_count` credits to the user's usage stats after a send."""
+    try:
+        usage_stats, _ = SMSUsageStats.objects.get_or_create(
+            user=user,
+            defaults={'remaining_credits': 0, 'total_sent': 0, 'total_delivered': 0, 'total_failed': 0}
+        )
+        usage_stats.remaining_credits -= submitted_count
+        usage_stats.total_sent += submitted_count
+        usage_stats.save()
+        logger.info(f"💰 Credits deducted: {submitted_count}, Remaining: {usage_stats.remaining_credits}")
+    except Exception as e:
+        logger.warning(f"Failed to update usage stats: {e}")
+
+
+def send_per_contact_messages(request, campaign, template, template_title, recipients_with_messages, sender_id,
+                              suppressed_numbers=None):
     """
     Send SMS with per-contact personalized messages.
     Each recipient gets a unique message based on their Excel data.
@@ -187,6 +237,8 @@ def send_per_contact_messages(request, campaign, template, template_title, recip
         template=template,
         title=template_title or "Personalized Messages",
         message_text=first_message + " (personalized)",
+        sender_name=sender_id,
+        route=SenderID.route_for(sender_id),
         recipients=all_phones,
         total_recipients=total_count,
         status='pending'
@@ -194,6 +246,10 @@ def send_per_contact_messages(request, campaign, template, template_title, recip
     
     logger.info(f"Sending {total_count} personalized SMS under campaign {campaign.title}")
     
+    # Recipient rows are collected and bulk-inserted once the batch is done
+    recipient_rows = []
+    accepted = []
+
     # Send each message individually
     for recipient in recipients_with_messages:
         phone = recipient.get("phone", "").strip()
@@ -201,12 +257,12 @@ def send_per_contact_messages(request, campaign, template, template_title, recip
         
         if not phone or not message:
             rejected_count += 1
-            SMSRecipient.objects.create(
+            recipient_rows.append(new_recipient(
                 message=sms_message,
                 phone_number=phone or "UNKNOWN",
                 status="submit_failed",
                 error_message="Missing phone or message"
-            )
+            ))
             continue
         
         try:
@@ -242,52 +298,59 @@ def send_per_contact_messages(request, campaign, template, template_title, recip
                     msg_error_code = entry.get("MessageErrorCode")
                     
                     if msg_error_code == 0:
-                        SMSRecipient.objects.create(
+                        recipient_rows.append(new_recipient(
                             message=sms_message,
                             phone_number=phone,
                             api_message_id=api_msg_id,
                             status="pending",
                             personalized_message=message
-                        )
+                        ))
+                        accepted.append((phone, message))
                         submitted_count += 1
                     else:
-                        SMSRecipient.objects.create(
+                        recipient_rows.append(new_recipient(
                             message=sms_message,
                             phone_number=phone,
                             status="submit_failed",
                             error_message=entry.get("MessageErrorDescription", "Rejected by provider"),
-                            error_code=str(msg_error_code)
-                        )
+                            error_code=normalize_error_code(msg_error_code),
+                            personalized_message=message
+                        ))
                         rejected_count += 1
                 else:
                     # Fallback - assume success if ErrorCode is 0
-                    SMSRecipient.objects.create(
+                    recipient_rows.append(new_recipient(
                         message=sms_message,
                         phone_number=phone,
                         status="pending",
                         personalized_message=message
-                    )
+                    ))
+                    accepted.append((phone, message))
                     submitted_count += 1
             else:
-                SMSRecipient.objects.create(
+                recipient_rows.append(new_recipient(
                     message=sms_message,
                     phone_number=phone,
                     status="submit_failed",
                     error_message=data.get("ErrorDescription", "API Error"),
-                    error_code=str(error_code)
-                )
+                    error_code=normalize_error_code(error_code),
+                    personalized_message=message
+                ))
                 rejected_count += 1
                 
         except Exception as e:
             logger.exception(f"Failed to send SMS to {phone}")
-            SMSRecipient.objects.create(
+            recipient_rows.append(new_recipient(
                 message=sms_message,
                 phone_number=phone,
                 status="submit_failed",
-                error_message=str(e)
-            )
+                error_message=str(e),
+                personalized_message=message
+            ))
             rejected_count += 1
     
+    create_recipients(recipient_rows)
+
     # Update SMS message status
     sms_message.successful_deliveries = submitted_count
     sms_message.failed_deliveries = rejected_count
@@ -303,17 +366,8 @@ def send_per_contact_messages(request, campaign, template, template_title, recip
     logger.info(f"📤 Personalized SMS campaign '{campaign.title}' → Accepted={submitted_count}, Rejected={rejected_count}")
     
     # Deduct credits
-    try:
-        usage_stats, _ = SMSUsageStats.objects.get_or_create(
-            user=request.user,
-            defaults={'remaining_credits': 0, 'total_sent': 0, 'total_delivered': 0, 'total_failed': 0}
-        )
-        usage_stats.remaining_credits -= submitted_count
-        usage_stats.total_sent += submitted_count
-        usage_stats.save()
-        logger.info(f"💰 Credits deducted: {submitted_count}, Remaining: {usage_stats.remaining_credits}")
-    except Exception as e:
-        logger.warning(f"Failed to update usage stats: {e}")
+    deduct_credits(request.user, submitted_count)
+    record_sends(accepted)
     
     return JsonResponse({
         "success": True,
@@ -322,6 +376,8 @@ def send_per_contact_messages(request, campaign, template, template_title, recip
         "submitted": submitted_count,
         "rejected": rejected_count,
         "recipients": total_count,
+        "suppressed": len(suppressed_numbers or []),
+        "suppressed_numbers": suppressed_numbers or [],
         "personalized": True,
         "redirect_to": "/history/",
     })
@@ -372,6 +428,11 @@ def refresh_sms_status(request, message_id):
         return JsonResponse({"error": str(e)}, status=500)
 
 
+# The send page polls these; a send (or credit change) by the user bumps
+# their report cache version, so the TTL only bounds other staleness
+SEND_STATS_TTL = 60
+
+
 @login_required
 def get_send_page_stats(request):
     """Get statistics for send SMS page (user-specific for teachers)"""
@@ -379,67 +440,24 @@ def get_send_page_stats(request):
         return JsonResponse({"error": "GET only"}, status=405)
     
     try:
-        from django.db.models import Sum, Count, Q
-        from datetime import date
-        
         user = request.user
-        today = timezone.now().date()
-        
-        # Filter campaigns by user role (same approach as message history)
-        if user.role == 'admin':
-            # Admin sees all campaigns
-            campaigns_query = Campaign.objects.all()
-        else:
-            # Teachers only see their own campaigns
-            campaigns_query = Campaign.objects.filter(user=user)
-        
-        # Get messages sent today by this user (use timezone-aware date range)
-        from datetime import datetime, timedelta
-        
-        # Create timezone-aware start and end of today
-        today_start = timezone.make_aware(datetime.combine(today, datetime.min.time()))
-        today_end = timezone.make_aware(datetime.combine(today, datetime.max.time()))
-        
-        if user.role == 'admin':
-            # Admin sees all messages sent today
-            today_messages = SMSMessage.objects.filter(
-                sent_at__gte=today_start,
-                sent_at__lte=today_end
-            )
-        else:
-            # Teachers see only their own messages sent today
-            today_messages = SMSMessage.objects.filter(
-                user=user,
-                sent_at__gte=today_start,
-                sent_at__lte=today_end
+
+        def build():
+            # SMS sent today and the overall delivery rate come from the daily
+            # usage rollup in one aggregate (teachers see only their own rows)
+            stats = send_page_stats(user, timezone.localdate())
+            remaining_credits = (
+                SMSUsageStats.objects.filter(user=user).values_list('remaining_credits', flat=True).first() or 0
             )
-        
-        # Count total recipients from today's messages (actual SMS sent)
-        successful = today_messages.aggregate(total=Sum('successful_deliveries'))['total'] or 0
-        failed = today_messages.aggregate(total=Sum('failed_deliveries'))['total'] or 0
-        today_count = successful + failed
-        
-        # Get user's SMS usage stats
-        try:
-            usage_stats = SMSUsageStats.objects.get(user=user)
-            remaining_credits = usage_stats.remaining_credits
-        except SMSUsageStats.DoesNotExist:
-            remaining_credits = 0
-        
-        # Calculate delivery rate from all campaigns (same as message history)
-        all_campaigns = campaigns_query.all()
-        
-        total_sent = sum(camp.total_sent or 0 for camp in all_campaigns)
-        total_delivered = sum(camp.total_delivered or 0 for camp in all_campaigns)
-        
-        delivery_rate = round((total_delivered / total_sent * 100), 1) if total_sent > 0 else 0
-        
-        return JsonResponse({
-            "today_count": today_count,
-            "remaining_credits": remaining_credits,
-            "delivery_rate": delivery_rate,
-            "cost_per_sms": 0.15  # Fixed cost
-        })
+            return {
+                "today_count": stats['today_count'],
+                "remaining_credits": remaining_credits,
+                "delivery_rate": stats['delivery_rate'],
+                "cost_per_sms": float(cost_per_segment())
+            }
+
+        # Admins share the system-wide scope but not their credits, hence the user id
+        return JsonResponse(cached_report(user, 'send_page_stats', {'user': user.id}, build, ttl=SEND_STATS_TTL))
     
     except Exception as e:
         logger.exception("Error getting send page stats")
@@ -4,7 +4,8 @@ from django.http import JsonResponse
 from django.db.models import Q
 from django.views.decorators.http import require_http_methods
 import json
-from sms.models import Template
+from sms.activity import record_event
+from sms.models import ActivityEvent, Template
 from sms.serializers import TemplateSerializer
 
 # =========================================================================
@@ -69,6 +70,8 @@ def create_template(request):
             user=user
         )
         
+        record_event(ActivityEvent.TEMPLATE, "Template created", user=user, details=template.title)
+        
         serializer = TemplateSerializer(template)
         return JsonResponse({
             "message": "Template created successfully",
@@ -136,6 +139,7 @@ def update_template(request, template_id):
                 return JsonResponse({"error": "Invalid category"}, status=400)
             template.category = category
         
+        previous_status = template.status
         if 'status' in data:
             status = data['status']
             if status not in ['approved', 'pending', 'rejected']:
@@ -153,6 +157,14 @@ def update_template(request, template_id):
         
         template.save()
         
+        if template.status != previous_status:
+            record_event(
+                ActivityEvent.TEMPLATE, f"Template {template.status}", user=user,
+                status="failed" if template.status == 'rejected' else "success", details=template.title,
+            )
+        else:
+            record_event(ActivityEvent.TEMPLATE, "Template updated", user=user, details=template.title)
+        
         serializer = TemplateSerializer(template)
         return JsonResponse({
             "message": "Template updated successfully",
@@ -181,6 +193,7 @@ def delete_template(request, template_id):
         template = Template.objects.get(id=template_id)
         template_title = template.title
         template.delete()
+        record_event(ActivityEvent.TEMPLATE, "Template deleted", user=user, details=template_title)
         
         return JsonResponse({
             "message": f"Template '{template_title}' deleted successfully"
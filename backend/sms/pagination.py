@@ -0,0 +1,96 @@
+"""Keyset (cursor) pagination.
+
+Pages are read with a WHERE on the sort key of the last row already sent,
+e.g. ``(created_at, id) < (last_created_at, last_id)``, instead of
+OFFSET. Each page costs the same no matter how deep the client scrolls, and
+rows inserted meanwhile do not shift later pages. The cursor handed to the
+client is an opaque URL-safe token holding that last key.
+"""
+
+import base64
+import json
+from datetime import datetime
+
+from django.db.models import Q
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+class InvalidCursor(ValueError):
+    """Raised when a client sends a cursor that was not issued by encode_cursor()."""
+
+
+def encode_cursor(values):
+    """Opaque token for the sort key `values` (datetimes, ints and strings)."""
+    raw = json.dumps([v.isoformat() if isinstance(v, datetime) else v for v in values])
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def _cursor_value(field, value):
+    if field.endswith("_at"):
+        return datetime.fromisoformat(value)
+    if field == "id" or field.endswith("_id"):
+        return int(value)
+    if not isinstance(value, str):
+        raise ValueError
+    return value
+
+
+def decode_cursor(token, fields):
+    """Sort key values from a token.
+
+    Fields named ``*_at`` are parsed back to datetimes, ``id`` / ``*_id`` to
+    ints and anything else is kept as a string.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        values = json.loads(raw)
+        if not isinstance(values, list) or len(values) != len(fields):
+            raise ValueError
+        return [_cursor_value(field, value) for field, value in zip(fields, values)]
+    except (ValueError, TypeError, UnicodeDecodeError):
+        raise InvalidCursor("Invalid cursor")
+
+
+def _after(fields, values, descending):
+    """Q for rows strictly after `values` in (fields) order."""
+    lookup = "lt" if descending else "gt"
+    condition = Q()
+    for i, field in enumerate(fields):
+        step = Q(**{f"{field}__{lookup}": values[i]})
+        for prior, value in zip(fields[:i], values[:i]):
+            step &= Q(**{prior: value})
+        condition |= step
+    return condition
+
+
+def page_size_param(request, default=DEFAULT_PAGE_SIZE):
+    try:
+        size = int(request.GET.get("limit", default))
+    except (TypeError, ValueError):
+        size = default
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+
+def keyset_page(queryset, fields=("created_at", "id"), cursor=None, limit=DEFAULT_PAGE_SIZE, descending=True):
+    """One page of `queryset` ordered by `fields`, starting after `cursor`.
+
+    `fields` must end with a unique column (the pk) so the order is total.
+    Returns (rows, next_cursor); next_cursor is None on the last page.
+    Raises InvalidCursor for a malformed cursor.
+    """
+    fields = list(fields)
+    if cursor:
+        queryset = queryset.filter(_after(fields, decode_cursor(cursor, fields), descending))
+    ordering = [f"-{f}" if descending else f for f in fields]
+    rows = list(queryset.order_by(*ordering)[:limit + 1])
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor([
+            last[f] if isinstance(last, dict) else getattr(last, f) for f in fields
+        ])
+    return rows, next_cursor
@@ -0,0 +1,236 @@
+"""Recipient delivery-status state machine.
+
+Every writer of ``SMSRecipient.status`` (send, status refresh, provider sync)
+goes through this module instead of load/mutate/``save()``. Statuses are
+ranked (``SMSRecipient.STATUS_RANKS``) and a transition is a conditional
+UPDATE that only touches rows whose current rank is strictly lower than the
+target rank, so concurrent pollers and webhooks never need row locks and a
+late "pending" can never overwrite "delivered".
+
+Each insert and transition also applies its exact deltas to the message's
+``MessageStatusSummary`` row and to the owner's ``DailyUsageRollup`` row
+(sms/rollups.py), so status counts and usage reports never require a COUNT
+over recipients.
+"""
+
+import logging
+from collections import Counter, defaultdict
+
+from django.db import IntegrityError, connection
+from django.db.models import Case, Count, Value, When, F
+
+from .models import SMSRecipient, MessageStatusSummary
+from .rollups import UNBILLED_STATUSES, apply_rollup_deltas, billed_segments, rebuild_rollup_for_message
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on ids per UPDATE so the IN (...) list and CASE expressions stay
+# well inside database parameter limits.
+TRANSITION_CHUNK_SIZE = 500
+
+
+def new_recipient(**fields):
+    """Build an unsaved SMSRecipient with its rank and segment count set.
+
+    ``bulk_create`` bypasses ``save()``, so rows created in bulk must be built
+    through this helper.
+    """
+    recipient = SMSRecipient(**fields)
+    recipient.status_rank = SMSRecipient.rank_for(recipient.status)
+    if 'segments' not in fields:
+        recipient.segments = recipient.text_segments()
+    return recipient
+
+
+def create_recipients(recipients):
+    """Insert recipient rows built with ``new_recipient`` in one bulk INSERT."""
+    recipients = list(recipients)
+    if recipients:
+        SMSRecipient.objects.bulk_create(recipients, batch_size=TRANSITION_CHUNK_SIZE)
+
+        deltas = defaultdict(Counter)
+        segments = Counter()
+        messages = {}
+        for recipient in recipients:
+            deltas[recipient.message_id][recipient.status] += 1
+            segments[recipient.message_id] += billed_segments(recipient)
+            messages[recipient.message_id] = recipient.message
+        for message_id, message_deltas in deltas.items():
+            apply_summary_deltas(message_id, message_deltas)
+            apply_rollup_deltas(message_id, message_deltas, segments[message_id], messages[message_id])
+    return recipients
+
+
+# ----------------------------------------------------------------------
+# Status summary
+# ----------------------------------------------------------------------
+def upsert_target(unique_fields):
+    """``bulk_create(update_conflicts=True)`` kwargs for the current backend.
+
+    MySQL's ON DUPLICATE KEY UPDATE takes no conflict target, while SQLite
+    and PostgreSQL require one.
+    """
+    if connection.features.supports_update_conflicts_with_target:
+        return {'unique_fields': unique_fields}
+    return {}
+
+
+def rebuild_summaries(message_ids=None):
+    """Recompute MessageStatusSummary rows with one grouped COUNT query.
+
+    ``message_ids=None`` rebuilds every message that has recipients. Returns
+    the number of summary rows written.
+    """
+    recipients = SMSRecipient.objects.all()
+    if message_ids is not None:
+        message_ids = list(message_ids)
+        recipients = recipients.filter(message_id__in=message_ids)
+
+    counters = defaultdict(Counter)
+    # Messages asked for explicitly get a (possibly all-zero) row as well
+    for message_id in message_ids or []:
+        counters.setdefault(message_id, Counter())
+    grouped = recipients.order_by().values_list('message_id', 'status').annotate(n=Count('id'))
+    for message_id, status, n in grouped.iterator():
+        counters[message_id][MessageStatusSummary.column_for(status)] += n
+
+    columns = sorted(set(MessageStatusSummary.STATUS_COLUMNS.values()))
+    rows = [
+        MessageStatusSummary(message_id=message_id, **{c: counts.get(c, 0) for c in columns})
+        for message_id, counts in counters.items()
+    ]
+    MessageStatusSummary.objects.bulk_create(
+        rows,
+        batch_size=TRANSITION_CHUNK_SIZE,
+        update_conflicts=True,
+        update_fields=columns + ['updated_at'],
+        **upsert_target(['message']),
+    )
+    return len(rows)
+
+
+def apply_summary_deltas(message_id, deltas):
+    """Add ``{status: +/-n}`` to a message's summary in one UPDATE.
+
+    If the message has no summary row yet it is built from the recipient
+    table, which already includes the change being recorded.
+    """
+    columns = Counter()
+    for status, n in deltas.items():
+        columns[MessageStatusSummary.column_for(status)] += n
+    updates = {c: F(c) + n for c, n in columns.items() if n}
+    if not updates:
+        return
+
+    if not MessageStatusSummary.objects.filter(message_id=message_id).update(**updates):
+        try:
+            rebuild_summaries([message_id])
+        except IntegrityError:
+            # Another writer created the row in the meantime
+            MessageStatusSummary.objects.filter(message_id=message_id).update(**updates)
+
+
+def get_status_summary(message_id):
+    """Return the MessageStatusSummary for a message, building it if missing."""
+    try:
+        return MessageStatusSummary.objects.get(message_id=message_id)
+    except MessageStatusSummary.DoesNotExist:
+        rebuild_summaries([message_id])
+        return MessageStatusSummary.objects.get(message_id=message_id)
+
+
+def _field_value(name, values, row_count):
+    """Return an UPDATE expression for ``name`` given {pk: value}.
+
+    A value shared by every row in the chunk becomes a plain literal;
+    otherwise a CASE on the primary key is built and rows that did not supply
+    the field keep their current value.
+    """
+    field = SMSRecipient._meta.get_field(name)
+    distinct = set(values.values())
+    if len(values) == row_count and len(distinct) == 1:
+        return Value(distinct.pop(), output_field=field)
+    return Case(
+        *[When(pk=pk, then=Value(value, output_field=field)) for pk, value in values.items()],
+        default=F(name),
+        output_field=field,
+    )
+
+
+def transition_recipients(message_id, transitions):
+    """Move recipients of one message forward to new statuses.
+
+    ``transitions`` maps a target status to ``{recipient_id: {field: value}}``,
+    where the inner dict holds any extra columns to write alongside the status
+    (delivery_time, error_code, ...). Rows already at an equal or higher rank
+    are left alone.
+
+    Candidate rows are read once, then one ``UPDATE ... WHERE id IN (...)
+    AND status = <source>`` is issued per source status present (typically
+    just one). Pinning the source status makes the UPDATE a compare-and-set,
+    so the summary deltas are exact even with concurrent writers; rows that
+    another writer moved in between are re-read and retried while they are
+    still below the target rank.
+
+    Returns ``{target_status: rows_updated}``.
+    """
+    counts = {}
+    deltas = Counter()
+    for status, rows in transitions.items():
+        if status not in SMSRecipient.STATUS_RANKS:
+            raise ValueError(f"Unknown recipient status: {status}")
+        rank = SMSRecipient.STATUS_RANKS[status]
+        counts[status] = 0
+
+        ids = list(rows.keys())
+        for i in range(0, len(ids), TRANSITION_CHUNK_SIZE):
+            chunk = {pk: rows[pk] or {} for pk in ids[i:i + TRANSITION_CHUNK_SIZE]}
+
+            per_field = {}
+            for pk, fields in chunk.items():
+                for name, value in fields.items():
+                    per_field.setdefault(name, {})[pk] = value
+
+            updates = {"status": status, "status_rank": rank}
+            for name, values in per_field.items():
+                updates[name] = _field_value(name, values, len(chunk))
+
+            pending_ids = list(chunk.keys())
+            # Ranks are finite, so a row can only be overtaken a bounded number of times
+            for _ in range(len(set(SMSRecipient.STATUS_RANKS.values())) + 1):
+                by_source = defaultdict(list)
+                candidates = SMSRecipient.objects.filter(
+                    message_id=message_id,
+                    pk__in=pending_ids,
+                    status_rank__lt=rank,
+                ).values_list('id', 'status')
+                for pk, source in candidates:
+                    by_source[source].append(pk)
+                if not by_source:
+                    break
+
+                missed = []
+                for source, source_ids in by_source.items():
+                    n = SMSRecipient.objects.filter(
+                        pk__in=source_ids,
+                        status=source,
+                        status_rank__lt=rank,
+                    ).update(**updates)
+                    counts[status] += n
+                    deltas[source] -= n
+                    deltas[status] += n
+                    if n < len(source_ids):
+                        missed.extend(source_ids)
+                if not missed:
+                    break
+                pending_ids = missed
+
+    apply_summary_deltas(message_id, deltas)
+    if any(deltas.get(status) for status in UNBILLED_STATUSES):
+        # Billing of the moved rows changed and their segments are not known
+        # here; recount the message's rollup day (rare: rejected resubmissions)
+        rebuild_rollup_for_message(message_id)
+    else:
+        apply_rollup_deltas(message_id, deltas)
+    logger.debug(f"Recipient transitions for message {message_id}: {counts}")
+    return counts
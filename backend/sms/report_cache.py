@@ -0,0 +1,103 @@
+"""Versioned cache for report results.
+
+Entries are keyed by (scope, report name, parameters, local date) plus the
+scope's current data version. Scopes are ``all`` (what admins see) and
+``user:<id>`` (one teacher's data). Whenever a message or a recipient status
+of a user changes, that user's scope and ``all`` get a new version, so every
+cached report over that data is bypassed at once.
+
+Versions live in the cache itself, so a bump only reaches the processes that
+share it. On a shared backend (database cache, Redis; see ``CACHES`` in
+settings) nothing stale is served and the TTL only bounds how long old
+versions occupy the cache. On the default per-process local-memory cache,
+changes made by other processes (workers, management commands such as
+``sync_provider_history`` or ``rebuild_rollups``) are not seen, so entries
+are kept for at most ``LOCAL_CACHE_TTL`` there.
+"""
+
+import hashlib
+import json
+import logging
+import time
+
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+REPORT_CACHE_TTL = 6 * 60 * 60
+# Cap for per-process caches, which never see other processes' version bumps
+LOCAL_CACHE_TTL = 60
+ADMIN_SCOPE = "all"
+
+
+def scope_for(user):
+    if user.role == "admin":
+        return ADMIN_SCOPE
+    return f"user:{user.id}"
+
+
+def _version_key(scope):
+    return f"report_version:{scope}"
+
+
+def data_version(scope):
+    """Current data version of a scope, starting it if the counter is missing.
+
+    A fresh counter starts from the clock rather than 1, so entries written
+    under an evicted counter can never be mistaken for current ones.
+    """
+    key = _version_key(scope)
+    try:
+        version = cache.get(key)
+        if version is None:
+            cache.add(key, int(time.time() * 1000), None)
+            version = cache.get(key)
+        return version
+    except Exception:
+        return None
+
+
+def bump_data_version(user_id):
+    """Invalidate every cached report over `user_id`'s data (and the admin-wide ones)."""
+    for scope in (ADMIN_SCOPE, f"user:{user_id}"):
+        key = _version_key(scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            # Counter not started (or evicted); nothing can be cached under it yet
+            pass
+        except Exception:
+            logger.warning(f"⚠️ Could not bump report cache version for {scope}")
+
+
+def cached_report(user, name, params, build, ttl=REPORT_CACHE_TTL):
+    """Return build() for `user`'s scope, reusing a cached result while the data is unchanged.
+
+    `params` must be JSON-serialisable; the local date is always part of the
+    key so rolling ranges ("last 7 days") roll over at midnight.
+    """
+    scope = scope_for(user)
+    version = data_version(scope)
+    if version is None:
+        return build()
+
+    digest = hashlib.md5(
+        json.dumps([params, str(timezone.localdate())], sort_keys=True, default=str).encode("utf-8")
+    ).hexdigest()
+    key = f"report:{scope}:{version}:{name}:{digest}"
+
+    try:
+        result = cache.get(key)
+    except Exception:
+        result = None
+    if result is None:
+        result = build()
+        if isinstance(caches["default"], LocMemCache):
+            ttl = min(ttl, LOCAL_CACHE_TTL)
+        try:
+            cache.set(key, result, ttl)
+        except Exception:
+            pass
+    return result
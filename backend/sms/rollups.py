@@ -0,0 +1,229 @@
+"""Daily per-user usage rollup.
+
+``DailyUsageRollup`` holds one row per (user, local day of the message) with
+SMS counts, billed segments and cost. Rows are kept current by delta from the
+same places that maintain ``MessageStatusSummary`` (recipient inserts and
+status transitions), so reports and dashboards read a few hundred rollup
+rows instead of scanning the message and recipient tables. Every booking
+also bumps the owner's report cache version (sms/report_cache.py).
+``manage.py rebuild_rollups`` recomputes them from scratch.
+"""
+
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import IntegrityError
+from django.db.models import Case, Count, DecimalField, ExpressionWrapper, F, Q, Sum, Value, When
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .counters import apply_counter_deltas
+from .models import DailyUsageRollup, SenderID, SMSMessage, SMSRecipient
+from .report_cache import bump_data_version
+from .segments import ENCODING_CHOICES
+
+logger = logging.getLogger(__name__)
+
+FAILED_STATUSES = ("failed", "submit_failed")
+# Rejected at submission: the provider never accepted them and no credits are
+# deducted, so they carry no billed segments or cost
+UNBILLED_STATUSES = ("submit_failed",)
+BILLED = ~Q(status__in=UNBILLED_STATUSES)
+
+
+def billed_segments(recipient):
+    """Segments `recipient` is charged for (none for submit failures)."""
+    return 0 if recipient.status in UNBILLED_STATUSES else recipient.segments
+
+
+def cost_per_segment():
+    """Default rate per billed segment."""
+    return Decimal(str(settings.APP_SETTINGS.get("SMS_COST_PER_SEGMENT", 0.25)))
+
+
+def tariff_table():
+    """{(route, encoding): rate per segment}; combinations not in SMS_TARIFFS use the default rate."""
+    default = cost_per_segment()
+    configured = settings.APP_SETTINGS.get("SMS_TARIFFS") or {}
+    table = {}
+    for route, _ in SenderID.TYPE_CHOICES:
+        for encoding, _ in ENCODING_CHOICES:
+            rate = (configured.get(route) or {}).get(encoding)
+            table[(route, encoding)] = Decimal(str(rate)) if rate is not None else default
+    return table
+
+
+def segment_rate(route, encoding):
+    return tariff_table().get((route, encoding), cost_per_segment())
+
+
+def segment_cost(prefix="message__"):
+    """Recipient-row expression: segments x tariff of the message's route and encoding."""
+    rate = Case(
+        *[
+            When(**{f"{prefix}route": route, f"{prefix}encoding": encoding}, then=Value(value))
+            for (route, encoding), value in tariff_table().items()
+        ],
+        default=Value(cost_per_segment()),
+        output_field=DecimalField(max_digits=10, decimal_places=4),
+    )
+    return ExpressionWrapper(F("segments") * rate, output_field=DecimalField(max_digits=15, decimal_places=4))
+
+
+def _booking_message(message_id, message=None):
+    if message is None or message.created_at is None:
+        message = SMSMessage.objects.only("user_id", "created_at", "route", "encoding").get(pk=message_id)
+    return message
+
+
+def _rollup_key(message):
+    """(user_id, local date) the message's usage is booked under."""
+    return message.user_id, timezone.localtime(message.created_at).date()
+
+
+def apply_rollup_deltas(message_id, status_deltas, segments=0, message=None):
+    """Book ``{status: +/-n}`` recipient changes of one message into its rollup row.
+
+    Inserted rows add to ``sent`` (transitions net to zero); ``delivered`` and
+    ``failed`` follow the status moves. `segments` are the billed segments of
+    inserted rows (see ``billed_segments``). Missing rows are rebuilt from the
+    recipient table, which already includes the change being recorded.
+    """
+    sent = sum(status_deltas.values())
+    delivered = status_deltas.get("delivered", 0)
+    failed = sum(status_deltas.get(status, 0) for status in FAILED_STATUSES)
+
+    updates = {}
+    for column, n in (("sent", sent), ("delivered", delivered), ("failed", failed), ("segments", segments)):
+        if n:
+            updates[column] = F(column) + n
+    if not updates:
+        return
+
+    message = _booking_message(message_id, message)
+    if segments:
+        updates["cost"] = F("cost") + segments * segment_rate(message.route, message.encoding)
+    user_id, day = _rollup_key(message)
+    if DailyUsageRollup.objects.filter(user_id=user_id, date=day).update(**updates):
+        apply_counter_deltas(user_id, sent=sent, delivered=delivered, failed=failed)
+    else:
+        try:
+            # Also books the rebuilt row's difference into the dashboard counters
+            rebuild_rollups(day, day, user_ids=[user_id])
+        except IntegrityError:
+            # Another writer created the row in the meantime
+            DailyUsageRollup.objects.filter(user_id=user_id, date=day).update(**updates)
+            apply_counter_deltas(user_id, sent=sent, delivered=delivered, failed=failed)
+    bump_data_version(user_id)
+
+
+def rebuild_rollup_for_message(message_id, message=None):
+    """Recompute the rollup row a single message is booked under."""
+    user_id, day = _rollup_key(_booking_message(message_id, message))
+    rebuild_rollups(day, day, user_ids=[user_id])
+    bump_data_version(user_id)
+
+
+def rebuild_rollups(start_day, end_day, user_ids=None):
+    """Recompute rollup rows for local days start_day..end_day with one grouped query.
+
+    Rows in the range that no longer have any recipients are removed, and
+    the difference to the old rows is booked into the dashboard counters.
+    Returns the number of rows written.
+    """
+    # recipient_status books its deltas through this module
+    from .recipient_status import upsert_target
+
+    tz = timezone.get_current_timezone()
+    start_dt = timezone.make_aware(datetime.combine(start_day, datetime.min.time()))
+    end_dt = timezone.make_aware(datetime.combine(end_day + timedelta(days=1), datetime.min.time()))
+
+    recipients = SMSRecipient.objects.filter(
+        message__created_at__gte=start_dt,
+        message__created_at__lt=end_dt,
+    )
+    existing = DailyUsageRollup.objects.filter(date__range=[start_day, end_day])
+    if user_ids is not None:
+        recipients = recipients.filter(message__user_id__in=user_ids)
+        existing = existing.filter(user_id__in=user_ids)
+
+    grouped = (
+        recipients.annotate(day=TruncDate("message__created_at", tzinfo=tz))
+        .values("message__user_id", "day")
+        .annotate(
+            sent=Count("id"),
+            delivered=Count("id", filter=Q(status="delivered")),
+            failed=Count("id", filter=Q(status__in=FAILED_STATUSES)),
+            billed_segments=Sum("segments", filter=BILLED),
+            cost=Sum(segment_cost(), filter=BILLED),
+        )
+        .order_by()
+    )
+
+    before = {
+        row["user_id"]: row
+        for row in existing.order_by().values("user_id").annotate(
+            sent_total=Sum("sent"), delivered_total=Sum("delivered"), failed_total=Sum("failed"),
+        )
+    }
+
+    rows = [
+        DailyUsageRollup(
+            user_id=row["message__user_id"],
+            date=row["day"],
+            sent=row["sent"],
+            delivered=row["delivered"],
+            failed=row["failed"],
+            segments=row["billed_segments"] or 0,
+            cost=row["cost"] or 0,
+        )
+        for row in grouped
+    ]
+    DailyUsageRollup.objects.bulk_create(
+        rows,
+        batch_size=500,
+        update_conflicts=True,
+        update_fields=["sent", "delivered", "failed", "segments", "cost", "updated_at"],
+        **upsert_target(["user", "date"]),
+    )
+
+    keep = {(row.user_id, row.date) for row in rows}
+    stale = [pk for pk, user_id, day in existing.values_list("id", "user_id", "date") if (user_id, day) not in keep]
+    if stale:
+        DailyUsageRollup.objects.filter(pk__in=stale).delete()
+
+    after = defaultdict(lambda: {"sent": 0, "delivered": 0, "failed": 0})
+    for row in rows:
+        for column in ("sent", "delivered", "failed"):
+            after[row.user_id][column] += getattr(row, column)
+    for user_id in set(before) | set(after):
+        old = before.get(user_id) or {}
+        apply_counter_deltas(user_id, **{
+            column: after[user_id][column] - (old.get(f"{column}_total") or 0)
+            for column in ("sent", "delivered", "failed")
+        })
+
+    logger.debug(f"Rebuilt {len(rows)} usage rollups for {start_day}..{end_day}")
+    return len(rows)
+
+
+def scoped_rollups(user):
+    """DailyUsageRollup queryset visible to `user` (admins see everything)."""
+    if user.role == "admin":
+        return DailyUsageRollup.objects.all()
+    return DailyUsageRollup.objects.filter(user=user)
+
+
+def rollup_totals(rollups_qs):
+    """Summed sent/delivered/failed/segments/cost over a rollup queryset."""
+    totals = rollups_qs.aggregate(
+        sent=Sum("sent"),
+        delivered=Sum("delivered"),
+        failed=Sum("failed"),
+        segments=Sum("segments"),
+        cost=Sum("cost"),
+    )
+    return {key: value or 0 for key, value in totals.items()}
@@ -0,0 +1,187 @@
+"""Message history search.
+
+Text search covers ``SMSMessage.message_text`` and
+``SMSRecipient.personalized_message`` through the database's full-text index:
+MySQL FULLTEXT (natural language mode, ranked by MATCH ... AGAINST) in
+production and SQLite FTS5 (ranked by bm25) for local runs; both indexes are
+created by migration 0020. Other backends fall back to an unranked
+``icontains`` scan.
+
+Phone search is a prefix lookup turned into a range on the
+(phone_number, id) index, tried with and without the 91 country code since
+recipients are stored either way.
+"""
+
+import re
+
+from django.db import connection
+from django.db.models import Q, Value
+from django.db.models.expressions import RawSQL
+from django.utils import timezone
+
+from .analytics import scoped_messages, scoped_recipients
+
+MAX_PAGE_SIZE = 50
+# Ranked results are paged by offset; deeper pages cost more, so cap them
+MAX_SEARCH_RESULTS = 1000
+
+_WORDS = re.compile(r"\w+", re.UNICODE)
+_PHONE_QUERY = re.compile(r"^\+?[\d\s-]{4,}$")
+
+MESSAGE_FTS_TABLE = "sms_smsmessage_fts"
+RECIPIENT_FTS_TABLE = "sms_smsrecipient_fts"
+
+
+def is_phone_query(query):
+    return bool(_PHONE_QUERY.match(query.strip()))
+
+
+def phone_prefixes(query):
+    """Stored-number prefixes a typed phone number can match."""
+    digits = re.sub(r"\D", "", query).lstrip("0")
+    if not digits:
+        return []
+    prefixes = [digits, "91" + digits]
+    if digits.startswith("91") and len(digits) > 2:
+        prefixes.append(digits[2:])
+    return prefixes
+
+
+def _prefix_range(prefix):
+    """Q matching phone numbers that start with `prefix`, as an index range."""
+    upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+    return Q(phone_number__gte=prefix, phone_number__lt=upper)
+
+
+def _ranked(queryset, column, fts_table, query):
+    """`queryset` narrowed to full-text matches of `query` in `column`, annotated with `score` (higher is better)."""
+    vendor = connection.vendor
+    table = queryset.model._meta.db_table
+    if vendor == "mysql":
+        match = f"MATCH (`{table}`.`{column}`) AGAINST (%s IN NATURAL LANGUAGE MODE)"
+        return queryset.annotate(score=RawSQL(match, [query])).filter(score__gt=0)
+
+    if vendor == "sqlite":
+        # Quoted terms OR-ed together, like MySQL's natural language mode
+        terms = _WORDS.findall(query)
+        if not terms:
+            return queryset.none().annotate(score=Value(0.0))
+        fts_query = " OR ".join('"%s"' % term for term in terms)
+        return queryset.filter(
+            id__in=RawSQL(f"SELECT rowid FROM {fts_table} WHERE {fts_table} MATCH %s", [fts_query])
+        ).annotate(score=RawSQL(
+            f"SELECT -bm25({fts_table}) FROM {fts_table} WHERE {fts_table} MATCH %s AND rowid = {table}.id",
+            [fts_query],
+        ))
+
+    return queryset.filter(**{f"{column}__icontains": query}).annotate(score=Value(1.0))
+
+
+def search_text(user, query, page=1, page_size=20):
+    """Messages and personalized recipient texts matching `query`, best first.
+
+    Returns (rows, has_more).
+    """
+    page_size = max(1, min(page_size, MAX_PAGE_SIZE))
+    page = max(1, min(page, MAX_SEARCH_RESULTS // page_size))
+    offset = (page - 1) * page_size
+    # Enough of each ranked list to fill this page after merging
+    depth = offset + page_size + 1
+
+    messages = _ranked(scoped_messages(user), "message_text", MESSAGE_FTS_TABLE, query).values(
+        "score", "id", "campaign_id", "campaign__title", "title", "message_text", "created_at",
+    ).order_by("-score", "-id")[:depth]
+
+    recipients = _ranked(
+        scoped_recipients(user).filter(personalized_message__isnull=False),
+        "personalized_message", RECIPIENT_FTS_TABLE, query,
+    ).values(
+        "score", "id", "phone_number", "status", "personalized_message",
+        "message_id", "message__campaign_id", "message__campaign__title",
+        "message__title", "message__created_at",
+    ).order_by("-score", "-id")[:depth]
+
+    hits = [
+        {
+            "type": "message",
+            "score": m["score"],
+            "message_id": m["id"],
+            "recipient_id": None,
+            "phone_number": None,
+            "status": None,
+            "campaign_id": m["campaign_id"],
+            "campaign": m["campaign__title"],
+            "title": m["title"],
+            "text": m["message_text"],
+            "created_at": m["created_at"],
+        }
+        for m in messages
+    ] + [
+        {
+            "type": "recipient",
+            "score": r["score"],
+            "message_id": r["message_id"],
+            "recipient_id": r["id"],
+            "phone_number": r["phone_number"],
+            "status": r["status"],
+            "campaign_id": r["message__campaign_id"],
+            "campaign": r["message__campaign__title"],
+            "title": r["message__title"],
+            "text": r["personalized_message"],
+            "created_at": r["message__created_at"],
+        }
+        for r in recipients
+    ]
+    hits.sort(key=lambda h: (h["score"], h["created_at"]), reverse=True)
+    return _finish(hits[offset:offset + page_size]), len(hits) > offset + page_size
+
+
+def search_phone(user, query, page=1, page_size=20):
+    """Recipient rows whose number starts with the typed digits, newest first.
+
+    Returns (rows, has_more).
+    """
+    page_size = max(1, min(page_size, MAX_PAGE_SIZE))
+    page = max(1, min(page, MAX_SEARCH_RESULTS // page_size))
+    offset = (page - 1) * page_size
+
+    prefixes = phone_prefixes(query)
+    if not prefixes:
+        return [], False
+    condition = Q()
+    for prefix in prefixes:
+        condition |= _prefix_range(prefix)
+
+    rows = list(
+        scoped_recipients(user).filter(condition)
+        .values(
+            "id", "phone_number", "status", "personalized_message", "message_id", "message__message_text",
+            "message__campaign_id", "message__campaign__title", "message__title", "message__created_at",
+        )
+        .order_by("-id")[offset:offset + page_size + 1]
+    )
+    hits = [
+        {
+            "type": "recipient",
+            "score": None,
+            "message_id": r["message_id"],
+            "recipient_id": r["id"],
+            "phone_number": r["phone_number"],
+            "status": r["status"],
+            "campaign_id": r["message__campaign_id"],
+            "campaign": r["message__campaign__title"],
+            "title": r["message__title"],
+            "text": r["personalized_message"] or r["message__message_text"],
+            "created_at": r["message__created_at"],
+        }
+        for r in rows[:page_size]
+    ]
+    return _finish(hits), len(rows) > page_size
+
+
+def _finish(hits):
+    for hit in hits:
+        hit["created_at"] = timezone.localtime(hit["created_at"]).strftime("%d %b %Y, %H:%M")
+        if hit["score"] is not None:
+            hit["score"] = round(float(hit["score"]), 4)
+    return hits
@@ -0,0 +1,55 @@
+"""SMS encoding detection and segment counting.
+
+Text that fits the GSM 03.38 alphabet is sent as GSM-7 (160 characters in a
+single SMS, 153 per part once concatenated); anything else is sent as UCS-2
+(70 / 67). Characters from the GSM extension table take two septets.
+"""
+
+import math
+
+GSM7 = "gsm7"
+UCS2 = "ucs2"
+
+ENCODING_CHOICES = [
+    (GSM7, "GSM-7"),
+    (UCS2, "UCS-2 (Unicode)"),
+]
+
+GSM7_BASIC = set(
+    "@£$¥èéùìòÇ\nØø\rÅåΔ_ΦΓΛΩΠΨΣΘΞÆæßÉ !\"#¤%&'()*+,-./0123456789:;<=>?"
+    "¡ABCDEFGHIJKLMNOPQRSTUVWXYZÄÖÑÜ§¿abcdefghijklmnopqrstuvwxyzäöñüà"
+)
+GSM7_EXTENDED = set("^{}\\[~]|€\f")
+
+# encoding -> (single-part limit, per-part limit when concatenated)
+SEGMENT_LIMITS = {
+    GSM7: (160, 153),
+    UCS2: (70, 67),
+}
+
+
+def encoding_for(text):
+    """GSM7 if every character is in the GSM 03.38 alphabet, else UCS2."""
+    for char in text or "":
+        if char not in GSM7_BASIC and char not in GSM7_EXTENDED:
+            return UCS2
+    return GSM7
+
+
+def message_length(text, encoding=None):
+    """Length in encoding units: septets for GSM-7, UTF-16 code units for UCS-2."""
+    text = text or ""
+    encoding = encoding or encoding_for(text)
+    if encoding == GSM7:
+        return len(text) + sum(1 for char in text if char in GSM7_EXTENDED)
+    return len(text.encode("utf-16-le")) // 2
+
+
+def count_segments(text, encoding=None):
+    """Number of SMS parts the provider bills for `text` (at least one)."""
+    encoding = encoding or encoding_for(text)
+    length = message_length(text, encoding)
+    single, multi = SEGMENT_LIMITS[encoding]
+    if length <= single:
+        return 1
+    return math.ceil(length / multi)
@@ -1,7 +1,10 @@
 import httpx
+from datetime import datetime, timedelta
 from django.conf import settings
 from django.utils import timezone
-from .models import SMSMessage, Template, Group, SMSRecipient
+from django.utils.dateparse import parse_datetime
+from .models import SMSMessage, SMSRecipient, SenderID
+from .recipient_status import new_recipient, create_recipients, transition_recipients, get_status_summary
 import logging
 
 logger = logging.getLogger(__name__)
@@ -16,6 +19,11 @@ class MySMSMantraService:
     SEND_SMS_PATH = "/api/v2/SendSMS"
     HISTORY_PATH = "/api/v2/messageStatus"
 
+    # Provider status text -> final delivery outcome
+    DELIVERED_STATUS_CODES = {"DELIVRD", "DELIVERED", "SUCCESS"}
+    IN_FLIGHT_STATUS_CODES = {"SUBMITTED", "SENT", "PENDING", "ACCEPTED"}
+    FAILED_STATUS_CODES = {"UNDELIV", "FAILED", "REJECTD", "REJECTED", "EXPIRED", "ERROR"}
+
     def __init__(self, user=None):
         self.user = user
         self.base_url = settings.MYSMSMANTRA_CONFIG["API_URL"].rstrip("/")
@@ -40,6 +48,25 @@ class MySMSMantraService:
     # ------------------------------------------------------------------
     def send_sms_sync(self, sms_message_id, message_text, recipients_list, sender_id=None):
         sms_message = SMSMessage.objects.get(id=sms_message_id)
+
+        try:
+            logger.info(f"Sending SMS → {len(recipients_list)} recipients")
+            data = self.submit_batch(message_text, recipients_list, sender_id)
+        except Exception as e:
+            logger.exception("SMS send failed")
+            self.update_sms_message_error(sms_message_id, str(e))
+            return {"success": False, "error": str(e)}
+
+        self.update_sms_message(sms_message, data, recipients_list)
+
+        return {
+            "success": self.is_successful_response(data),
+            "api_response": data,
+            "message_id": sms_message.id,
+        }
+
+    def submit_batch(self, message_text, recipients_list, sender_id=None):
+        """Make one SendSMS call for a list of numbers; returns the parsed API response."""
         creds = self.get_user_credentials()
 
         params = {
@@ -52,31 +79,63 @@ class MySMSMantraService:
 
         url = f"{self.base_url}{self.SEND_SMS_PATH}"
 
-        try:
-            logger.info(f"Sending SMS → {len(recipients_list)} recipients")
+        with httpx.Client(timeout=30) as client:
+            resp = client.get(url, params=params)
+            resp.raise_for_status()
 
-            with httpx.Client(timeout=30) as client:
-                resp = client.get(url, params=params)
-                resp.raise_for_status()
+            try:
+                return resp.json()
+            except Exception:
+                return {
+                    "ErrorCode": -1,
+                    "ErrorDescription": resp.text,
+                }
+
+    # ------------------------------------------------------------------
+    # 📦 Batched send (one message, many texts/recipients)
+    # ------------------------------------------------------------------
+    def send_batches(self, sms_message, batches, sender_id=None, personalized=False):
+        """Send `batches` of (message_text, recipients_list) under one SMSMessage.
 
+        Each text group is split into provider calls of at most
+        APP_SETTINGS['MAX_BATCH_SIZE'] numbers, and all recipient rows are
+        recorded against `sms_message`. With `personalized=True` the text
+        sent to each number is stored on its recipient row.
+        """
+        batch_size = max(int(settings.APP_SETTINGS.get("MAX_BATCH_SIZE", 100)), 1)
+        submitted_count = 0
+        rejected_count = 0
+        api_responses = []
+
+        for message_text, recipients_list in batches:
+            for i in range(0, len(recipients_list), batch_size):
+                chunk = recipients_list[i:i + batch_size]
                 try:
-                    data = resp.json()
-                except Exception:
-                    data = {
-                        "ErrorCode": -1,
-                        "ErrorDescription": resp.text,
-                    }
+                    data = self.submit_batch(message_text, chunk, sender_id)
+                except Exception as e:
+                    logger.exception("SMS batch send failed")
+                    data = {"ErrorCode": -1, "ErrorDescription": str(e)}
 
-        except Exception as e:
-            logger.exception("SMS send failed")
-            self.update_sms_message_error(sms_message_id, str(e))
-            return {"success": False, "error": str(e)}
+                submitted, rejected = self.record_submission(
+                    sms_message, data, chunk, message_text if personalized else None
+                )
+                submitted_count += submitted
+                rejected_count += rejected
+                api_responses.append(data)
 
-        self.update_sms_message(sms_message, data, recipients_list)
+        sms_message.api_response = api_responses
+        sms_message.sent_at = timezone.now()
+        sms_message.successful_deliveries = 0  # Will be updated on status refresh
+        sms_message.failed_deliveries = rejected_count
+        sms_message.status = "submitted" if submitted_count > 0 else "failed"
+        sms_message.save()
+
+        logger.info(f"📤 SMS {sms_message.id} (batched): Submitted={submitted_count}, Rejected={rejected_count}")
 
         return {
-            "success": self.is_successful_response(data),
-            "api_response": data,
+            "success": submitted_count > 0,
+            "submitted": submitted_count,
+            "rejected": rejected_count,
             "message_id": sms_message.id,
         }
 
@@ -123,8 +182,29 @@ class MySMSMantraService:
         sms_message.api_response = api_response
         sms_message.sent_at = timezone.now()
 
+        submitted_count, rejected_count = self.record_submission(sms_message, api_response, recipients_list)
+
+        # Update message totals - don't mark as delivered yet, just submitted
+        sms_message.successful_deliveries = 0  # Will be updated on status refresh
+        sms_message.failed_deliveries = rejected_count
+        sms_message.status = "submitted" if submitted_count > 0 else "failed"
+        sms_message.save()
+        
+        logger.info(f"📤 SMS {sms_message.id}: Submitted={submitted_count}, Rejected={rejected_count}")
+
+    def record_submission(self, sms_message, api_response, recipients_list, personalized_message=None):
+        """Record recipient logs for one SendSMS response; returns (submitted, rejected).
+
+        New recipient rows are bulk-inserted; rows that already exist for this
+        message are moved forward through the status state machine so a
+        resubmission never downgrades a recorded delivery.
+        """
         submitted_count = 0
         rejected_count = 0
+        now = timezone.now()
+
+        # phone -> (status, extra fields)
+        outcomes = {}
 
         error_code = api_response.get("ErrorCode")
 
@@ -143,61 +223,58 @@ class MySMSMantraService:
                     
                     if msg_error_code == 0:
                         # Message accepted by API
-                        SMSRecipient.objects.update_or_create(
-                            message=sms_message,
-                            phone_number=phone,
-                            defaults={
-                                "status": "pending",
-                                "api_message_id": api_msg_id,
-                                "submit_time": timezone.now(),
-                                "error_code": msg_error_code,
-                                "error_description": None,
-                            },
-                        )
+                        outcomes[phone] = ("pending", {
+                            "api_message_id": api_msg_id,
+                            "submit_time": now,
+                            "error_code": msg_error_code,
+                            "error_description": None,
+                        })
                         submitted_count += 1
                     else:
                         # Message rejected by API for this recipient
-                        SMSRecipient.objects.update_or_create(
-                            message=sms_message,
-                            phone_number=phone,
-                            defaults={
-                                "status": "submit_failed",
-                                "api_message_id": api_msg_id,
-                                "submit_time": None,
-                                "error_code": msg_error_code,
-                                "error_description": msg_error_desc,
-                            },
-                        )
+                        outcomes[phone] = ("submit_failed", {
+                            "api_message_id": api_msg_id,
+                            "submit_time": None,
+                            "error_code": msg_error_code,
+                            "error_description": msg_error_desc,
+                        })
                         rejected_count += 1
             else:
                 # Fallback: API didn't return per-recipient data
                 for phone in recipients_list:
-                    SMSRecipient.objects.update_or_create(
-                        message=sms_message,
-                        phone_number=phone,
-                        defaults={"status": "pending", "submit_time": timezone.now()},
-                    )
+                    outcomes[phone] = ("pending", {"submit_time": now})
                 submitted_count = len(recipients_list)
         else:
             # Entire API request failed
             for phone in recipients_list:
-                SMSRecipient.objects.update_or_create(
+                outcomes[phone] = ("submit_failed", {
+                    "error_description": api_response.get("ErrorDescription"),
+                })
+            rejected_count = len(recipients_list)
+
+        existing = dict(
+            sms_message.recipient_logs.filter(phone_number__in=list(outcomes.keys()))
+            .values_list("phone_number", "id")
+        )
+        transitions = {}
+        new_rows = []
+        for phone, (status, fields) in outcomes.items():
+            if phone in existing:
+                transitions.setdefault(status, {})[existing[phone]] = fields
+            else:
+                new_rows.append(new_recipient(
                     message=sms_message,
                     phone_number=phone,
-                    defaults={
-                        "status": "submit_failed",
-                        "error_description": api_response.get("ErrorDescription"),
-                    },
-                )
-            rejected_count = len(recipients_list)
+                    status=status,
+                    personalized_message=personalized_message,
+                    **fields
+                ))
 
-        # Update message totals - don't mark as delivered yet, just submitted
-        sms_message.successful_deliveries = 0  # Will be updated on status refresh
-        sms_message.failed_deliveries = rejected_count
-        sms_message.status = "submitted" if submitted_count > 0 else "failed"
-        sms_message.save()
-        
-        logger.info(f"📤 SMS {sms_message.id}: Submitted={submitted_count}, Rejected={rejected_count}")
+        create_recipients(new_rows)
+        if transitions:
+            transition_recipients(sms_message.id, transitions)
+
+        return submitted_count, rejected_count
 
     # ------------------------------------------------------------------
     # 🔄 Get individual message status by MessageId
@@ -260,22 +337,20 @@ class MySMSMantraService:
             sms_message = SMSMessage.objects.get(id=sms_message_id)
             recipients = list(sms_message.recipient_logs.filter(
                 api_message_id__isnull=False,
-                status__in=['pending', 'sent', 'submitted', 'failed']  # Only check non-final statuses
-            ).exclude(api_message_id=''))
+                status_rank__lt=SMSRecipient.rank_for("delivered"),  # Only check non-final statuses
+            ).exclude(api_message_id='').only("id", "phone_number", "api_message_id", "status"))
 
             if not recipients:
                 return {"success": False, "error": "No recipients with message IDs found"}
 
-            # Status codes mapping
-            delivered_codes = {"DELIVRD", "DELIVERED", "SUCCESS"}
-            submitted_codes = {"SUBMITTED", "SENT", "PENDING", "ACCEPTED"}
-            failed_codes = {"UNDELIV", "FAILED", "REJECTD", "REJECTED", "EXPIRED", "ERROR"}
-
             updated = 0
-            delivered_count = 0
-            failed_count = 0
-            pending_count = 0
             errors = []
+            # target status -> {recipient_id: fields}; applied in one conditional UPDATE per status
+            transitions = {}
+            # Non-status columns (error codes and descriptions) for rows whose
+            # status does not move: {recipient: fields}, written only while the
+            # row is still in the status it was read in
+            error_code_updates = {}
 
             logger.info(f"🔄 Refreshing status for {len(recipients)} recipients (Message ID: {sms_message_id})")
 
@@ -297,75 +372,44 @@ class MySMSMantraService:
                         except (ValueError, TypeError):
                             api_error_code = None
                     
-                    if status_text in delivered_codes:
-                        recipient.status = "delivered"
-                        recipient.delivery_time = timezone.now()
-                        recipient.error_code = 0
-                        recipient.error_description = None
-                        delivered_count += 1
-                    elif status_text in failed_codes:
-                        recipient.status = "failed"
-                        recipient.error_code = api_error_code if api_error_code is not None else 0
-                        recipient.error_description = status_text
-                        failed_count += 1
-                    elif status_text in submitted_codes:
-                        recipient.status = "pending"
-                        recipient.error_code = 0
-                        pending_count += 1
+                    # Provider's delivery time, so latency reports do not measure our polling
+                    new_status, fields = self.classify_delivery(
+                        status_text, api_error_code, parse_provider_datetime(result.get("DoneDate"))
+                    )
+                    if new_status:
+                        transitions.setdefault(new_status, {})[recipient.id] = fields
+                        if new_status == recipient.status:
+                            # failed -> failed is not a forward move; still record the new code
+                            error_code_updates[recipient] = fields
                     else:
-                        # Unknown status, keep as pending
-                        recipient.status = "pending"
-                        recipient.error_code = api_error_code if api_error_code is not None else 0
-                        recipient.error_description = f"Status: {status_text}"
-                        pending_count += 1
-                    
-                    recipient.save()
+                        # SUBMITTED/SENT/PENDING/ACCEPTED or unknown: still pending,
+                        # which never moves a recipient backwards
+                        new_status = "pending"
+                        if status_text not in self.IN_FLIGHT_STATUS_CODES:
+                            fields = {"error_description": f"Status: {status_text}"}
+                            if api_error_code is not None:
+                                fields["error_code"] = api_error_code
+                            error_code_updates[recipient] = fields
+
                     updated += 1
-                    logger.debug(f"  📱 {recipient.phone_number}: {status_text} → {recipient.status} [Code: {recipient.error_code}]")
+                    logger.debug(f"  📱 {recipient.phone_number}: {status_text} → {new_status}")
                 else:
                     # API call failed for this recipient
                     error_msg = result.get("error", "Unknown error")
                     error_code = result.get("error_code")
                     if error_code is not None:
-                        recipient.error_code = error_code
-                        recipient.save()
+                        error_code_updates[recipient] = {"error_code": error_code}
                         errors.append(f"{recipient.phone_number}: [Code {error_code}] {error_msg}")
                     else:
                         errors.append(f"{recipient.phone_number}: {error_msg}")
                     logger.warning(f"  ⚠️ {recipient.phone_number}: API error - {error_msg}")
 
-            # Update SMSMessage totals
-            total_delivered = sms_message.recipient_logs.filter(status="delivered").count()
-            total_failed = sms_message.recipient_logs.filter(status__in=["failed", "submit_failed"]).count()
-            total_pending = sms_message.recipient_logs.filter(status="pending").count()
-
-            sms_message.successful_deliveries = total_delivered
-            sms_message.failed_deliveries = total_failed
+            transition_recipients(sms_message.id, transitions)
 
-            # Update status based on results
-            if total_pending == 0:
-                # All statuses resolved
-                if total_failed == 0:
-                    sms_message.status = "sent"
-                elif total_delivered == 0:
-                    sms_message.status = "failed"
-                else:
-                    sms_message.status = "partial"
-            else:
-                sms_message.status = "submitted"  # Still waiting for some
+            for recipient, fields in error_code_updates.items():
+                SMSRecipient.objects.filter(id=recipient.id, status=recipient.status).update(**fields)
 
-            sms_message.save()
-
-            # Update Campaign stats
-            if sms_message.campaign:
-                campaign = sms_message.campaign
-                campaign.total_delivered = total_delivered
-                campaign.total_failed = total_failed
-                
-                if total_pending == 0:
-                    campaign.status = "completed" if total_failed == 0 else "partial"
-                
-                campaign.save()
+            total_delivered, total_failed, total_pending = self.apply_status_summary(sms_message)
 
             logger.info(f"✅ Status refresh complete: Delivered={total_delivered}, Failed={total_failed}, Pending={total_pending}")
 
@@ -385,6 +429,69 @@ class MySMSMantraService:
             logger.exception("Status refresh failed")
             return {"success": False, "error": str(e)}
 
+    # ------------------------------------------------------------------
+    # 🏷 Map provider status text to a final recipient status
+    # ------------------------------------------------------------------
+    def classify_delivery(self, status_text, error_code=None, done_at=None):
+        """Return (status, fields) for a final provider status, or (None, None) if still in flight."""
+        status_text = (status_text or "").upper()
+        if status_text in self.DELIVERED_STATUS_CODES:
+            return "delivered", {
+                "delivery_time": done_at or timezone.now(),
+                "error_code": 0,
+                "error_description": None,
+            }
+        if status_text in self.FAILED_STATUS_CODES:
+            # No code stays NULL: 0 is the provider's "success" code
+            return "failed", {
+                "error_code": error_code,
+                "error_description": status_text,
+            }
+        return None, None
+
+    # ------------------------------------------------------------------
+    # 📊 Roll recipient status counts up to message and campaign
+    # ------------------------------------------------------------------
+    def apply_status_summary(self, sms_message):
+        """Copy the message's status summary onto SMSMessage and its Campaign.
+
+        Returns (delivered, failed, pending).
+        """
+        summary = get_status_summary(sms_message.id)
+        total_delivered = summary.delivered
+        total_failed = summary.total_failed
+        total_pending = summary.total_pending
+
+        sms_message.successful_deliveries = total_delivered
+        sms_message.failed_deliveries = total_failed
+
+        # Update status based on results
+        if total_pending == 0:
+            # All statuses resolved
+            if total_failed == 0:
+                sms_message.status = "sent"
+            elif total_delivered == 0:
+                sms_message.status = "failed"
+            else:
+                sms_message.status = "partial"
+        else:
+            sms_message.status = "submitted"  # Still waiting for some
+
+        sms_message.save()
+
+        # Update Campaign stats
+        if sms_message.campaign:
+            campaign = sms_message.campaign
+            campaign.total_delivered = total_delivered
+            campaign.total_failed = total_failed
+            
+            if total_pending == 0:
+                campaign.status = "completed" if total_failed == 0 else "partial"
+            
+            campaign.save()
+
+        return total_delivered, total_failed, total_pending
+
     # ------------------------------------------------------------------
     # ✅ Success evaluation
     # ------------------------------------------------------------------
@@ -409,6 +516,176 @@ class MySMSMantraService:
             logger.error(f"SMS {sms_message_id} not found")
 
 
+# -------------------------------------------------------------------
+# Incremental provider history sync
+# -------------------------------------------------------------------
+PROVIDER_DATETIME_FORMATS = (
+    "%Y-%m-%d %H:%M:%S",
+    "%Y-%m-%d %H:%M",
+    "%d-%m-%Y %H:%M:%S",
+    "%d/%m/%Y %H:%M:%S",
+    "%d-%m-%Y %H:%M",
+    "%d/%m/%Y %H:%M",
+)
+
+
+def parse_provider_datetime(value):
+    """Parse a provider timestamp into an aware datetime (naive values are in TIME_ZONE)."""
+    if not value:
+        return None
+    text = str(value).strip()
+    parsed = parse_datetime(text)
+    if parsed is None:
+        for fmt in PROVIDER_DATETIME_FORMATS:
+            try:
+                parsed = datetime.strptime(text, fmt)
+                break
+            except ValueError:
+                continue
+    if parsed is None:
+        return None
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+class ProviderHistorySync:
+    """Mirror the provider's delivery log into SMSRecipient rows incrementally.
+
+    The provider lists messages for a date window, oldest first, paged with
+    start/length. The checkpoint stores the submit time of the last row of
+    the leading run of *final* (delivered/failed) rows, plus how many rows
+    of that day were consumed. Each run resumes from there, so finished
+    rows are never fetched again while rows still in flight are re-read
+    until their delivery report arrives.
+
+    The lease is renewed after every page, so a long run keeps it for as
+    long as it makes progress; if another node took it over in between,
+    the run stops and its progress is not saved.
+    """
+
+    CHECKPOINT_NAME = "provider_history"
+
+    def __init__(self, service=None, page_size=500, max_pages=20, initial_days=1, lease_seconds=300):
+        self.service = service or MySMSMantraService()
+        self.page_size = page_size
+        self.max_pages = max_pages
+        self.initial_days = initial_days
+        self.lease_seconds = lease_seconds
+
+    def run(self, checkpoint):
+        """Fetch pages after `checkpoint`, apply them, and advance it in place."""
+        stats = {"pages": 0, "fetched": 0, "matched": 0, "updated": 0, "unmatched": 0, "error": None}
+
+        if checkpoint.watermark is None:
+            start_day = timezone.localdate() - timedelta(days=self.initial_days)
+            checkpoint.watermark = timezone.make_aware(datetime.combine(start_day, datetime.min.time()))
+            checkpoint.offset = 0
+
+        window_start = timezone.localdate(checkpoint.watermark)
+        day = window_start
+        day_offset = checkpoint.offset
+        watermark = checkpoint.watermark
+        prefix_open = True
+        start = checkpoint.offset
+
+        for _ in range(self.max_pages):
+            result = self.service.get_sms_history(
+                start=start,
+                length=self.page_size,
+                fromdate=window_start.strftime("%Y-%m-%d"),
+                enddate=timezone.localdate().strftime("%Y-%m-%d"),
+            )
+            if not result.get("success"):
+                stats["error"] = result.get("error")
+                break
+
+            history = result.get("history") or {}
+            if str(history.get("ErrorCode", "0")) != "0":
+                stats["error"] = history.get("ErrorDescription", "Unknown error")
+                break
+
+            rows = history.get("Data") or []
+            stats["pages"] += 1
+            stats["fetched"] += len(rows)
+
+            outcomes = self.apply_rows(rows, stats)
+
+            # Advance the watermark across the leading run of final rows only
+            for row, final in zip(rows, outcomes):
+                if not prefix_open:
+                    break
+                if not final:
+                    prefix_open = False
+                    break
+                submitted_at = parse_provider_datetime(row.get("SubmitDate"))
+                if submitted_at and timezone.localdate(submitted_at) > day:
+                    day = timezone.localdate(submitted_at)
+                    day_offset = 0
+                if submitted_at:
+                    watermark = max(watermark, submitted_at)
+                day_offset += 1
+
+            start += len(rows)
+            if len(rows) < self.page_size:
+                break
+            if not checkpoint.renew(self.lease_seconds):
+                stats["error"] = "Lease lost to another node"
+                break
+
+        checkpoint.watermark = watermark
+        checkpoint.offset = day_offset
+        return stats
+
+    def apply_rows(self, rows, stats):
+        """Upsert one page of history rows; returns a per-row list of `is final` flags."""
+        parsed = []
+        for row in rows:
+            error_code = row.get("ErrorCode")
+            try:
+                error_code = int(error_code) if error_code is not None else None
+            except (TypeError, ValueError):
+                error_code = None
+            status, fields = self.service.classify_delivery(
+                row.get("Status"),
+                error_code,
+                parse_provider_datetime(row.get("DoneDate")),
+            )
+            parsed.append((row.get("MessageId"), status, fields))
+
+        api_ids = [api_id for api_id, status, _ in parsed if api_id and status]
+        local = {}
+        if api_ids:
+            local = {
+                api_id: (pk, message_id)
+                for api_id, pk, message_id in SMSRecipient.objects.filter(
+                    api_message_id__in=api_ids
+                ).values_list("api_message_id", "id", "message_id")
+            }
+
+        # message_id -> {status: {recipient_id: fields}}
+        per_message = {}
+        for api_id, status, fields in parsed:
+            if not status or not api_id:
+                continue
+            if api_id not in local:
+                stats["unmatched"] += 1
+                continue
+            pk, message_id = local[api_id]
+            per_message.setdefault(message_id, {}).setdefault(status, {})[pk] = fields
+            stats["matched"] += 1
+
+        for message_id, transitions in per_message.items():
+            counts = transition_recipients(message_id, transitions)
+            stats["updated"] += sum(counts.values())
+
+        if per_message:
+            for sms_message in SMSMessage.objects.filter(id__in=per_message.keys()).select_related("campaign"):
+                self.service.apply_status_summary(sms_message)
+
+        return [status is not None for _, status, _ in parsed]
+
+
 # -------------------------------------------------------------------
 # Public Utility Function
 # -------------------------------------------------------------------
@@ -418,6 +695,8 @@ def send_sms_message(user, message_text, recipients_list, sender_id=None, templa
         sms_message = SMSMessage.objects.create(
             user=user,
             message_text=message_text,
+            sender_name=sender_id or "",
+            route=SenderID.route_for(sender_id),
             status="pending",
         )
         sms_message.set_recipients_list(recipients_list)
@@ -447,82 +726,38 @@ class AdminAnalyticsService:
     def get_admin_totals(self):
         """Return aggregate counts across the system.
 
+        Read from the incrementally maintained dashboard counters
+        (sms/counters.py), so this is a single-row query.
+
         Returns a dict with keys: total_users, total_sms, total_templates, total_groups
         """
+        from .counters import system_counters
         try:
-            from django.contrib.auth import get_user_model
-            UserModel = get_user_model()
-            total_users = UserModel.objects.count()
-        except Exception:
-            total_users = 0
-
-        try:
-            total_sms = SMSMessage.objects.count()
-        except Exception:
-            total_sms = 0
-
-        try:
-            total_templates = Template.objects.count()
-        except Exception:
-            total_templates = 0
-
-        try:
-            total_groups = Group.objects.count()
+            counters = system_counters()
         except Exception:
-            total_groups = 0
+            logger.exception("Could not read dashboard counters")
+            counters = {}
 
         return {
-            'total_users': total_users,
-            'total_sms': total_sms,
-            'total_templates': total_templates,
-            'total_groups': total_groups,
+            'total_users': counters.get('users', 0),
+            'total_sms': counters.get('messages', 0),
+            'total_templates': counters.get('templates', 0),
+            'total_groups': counters.get('groups', 0),
         }
 
-    def get_activity_logs(self, start=0, length=50):
-        """Return a paginated list of recent activity log entries.
+    def get_activity_logs(self, cursor=None, length=25, **filters):
+        """Return one page of the activity feed (SMS, auth and template events).
 
-        Currently this builds a lightweight activity list from `SMSMessage` entries.
-        You can later extend to include auth events, API requests, etc.
+        Pages are keyset-paginated on the append-only ActivityEvent log; pass
+        the returned cursor back for the next page. `filters` are the optional
+        user_id / status / category / start_day / end_day of
+        sms.activity.activity_feed.
 
-        Returns: list of dicts: {id, timestamp, level, category, action, user, details}
+        Returns: (list of dicts {id, timestamp, status, category, action, user,
+        details, message_id, message_text}, next_cursor)
         """
-        logs = []
-        try:
-            msgs = SMSMessage.objects.select_related('user').order_by('-created_at')[start:start+length]
-            for m in msgs:
-                sent = getattr(m, 'successful_deliveries', 0) or 0
-                failed = getattr(m, 'failed_deliveries', 0) or 0
-                total = getattr(m, 'total_recipients', None)
-                status = 'success' if m.status == 'sent' else 'failed' if m.status == 'failed' else 'info'
-
-                # Build recipients list for expanded view
-                recipients = []
-                try:
-                    recs = SMSRecipient.objects.filter(message_id=m.id).values('phone_number', 'status', 'error_description')
-                    for r in recs:
-                        recipients.append({
-                            'phone_number': r.get('phone_number'),
-                            'status': r.get('status'),
-                            'error_description': r.get('error_description')
-                        })
-                except Exception:
-                    recipients = []
-
-                logs.append({
-                    'id': m.id,
-                    'timestamp': (m.sent_at or m.created_at) if (m.sent_at or m.created_at) else None,
-                    'status': status,
-                    'category': 'sms',
-                    'action': 'SMS sent' if m.status == 'sent' else 'SMS failed',
-                    'user': getattr(m.user, 'email', getattr(m.user, 'username', 'system')) if m.user else 'system',
-                    'details': f"Recipients: {total or '-'}, Sent: {sent}, Failed: {failed}",
-                    'message_text': getattr(m, 'message_text', ''),
-                    'recipients': recipients,
-                })
-        except Exception as e:
-            logger.exception("Error building activity logs: %s", e)
-
-        return logs
+        from .activity import activity_feed
+        return activity_feed(cursor=cursor, limit=length, **filters)
 
     # Future helpers: get_monthly_aggregates(), get_user_activity(user_id), export_csv(), etc.
 
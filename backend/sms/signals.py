@@ -1,11 +1,37 @@
-from django.db.models.signals import post_save, post_delete
+from django.contrib.auth.signals import user_logged_in, user_logged_out, user_login_failed
+from django.conf import settings
+from django.db.models.signals import post_save, post_delete, pre_save
 from django.dispatch import receiver
-from .models import SMSMessage, SMSRecipient
+from .activity import record_event
+from .counters import apply_counter_deltas, book_change, group_counts, template_counts
+from .models import (
+    ActivityEvent, Campaign, DashboardCounters, Group, SMSMessage, SMSRecipient, SMSUsageStats, Template,
+)
+from .recipient_status import apply_summary_deltas, rebuild_summaries, get_status_summary
+from .rollups import apply_rollup_deltas, billed_segments, rebuild_rollup_for_message
+from .report_cache import bump_data_version
+
+
+@receiver(post_save, sender=Campaign)
+@receiver(post_delete, sender=Campaign)
+def invalidate_reports_on_campaign_change(sender, instance, **kwargs):
+    """Campaign totals and categories feed cached reports"""
+    bump_data_version(instance.user_id)
+
+
+@receiver(post_save, sender=SMSUsageStats)
+def invalidate_reports_on_credit_change(sender, instance, **kwargs):
+    """Remaining credits are part of the cached send page stats"""
+    bump_data_version(instance.user_id)
 
 
 @receiver(post_save, sender=SMSMessage)
-def update_campaign_on_message_save(sender, instance, **kwargs):
+def update_campaign_on_message_save(sender, instance, created, **kwargs):
     """Update campaign statistics when an SMS message is saved"""
+    bump_data_version(instance.user_id)
+    if created:
+        apply_counter_deltas(instance.user_id, messages=1)
+        record_event(ActivityEvent.SMS, "SMS sent", user=instance.user, message=instance)
     if instance.campaign:
         instance.campaign.update_stats()
 
@@ -13,20 +39,103 @@ def update_campaign_on_message_save(sender, instance, **kwargs):
 @receiver(post_delete, sender=SMSMessage)
 def update_campaign_on_message_delete(sender, instance, **kwargs):
     """Update campaign statistics when an SMS message is deleted"""
+    bump_data_version(instance.user_id)
+    apply_counter_deltas(instance.user_id, messages=-1)
+    # Its recipients are gone too: recount the rollup day they were booked
+    # under, which also takes them out of the dashboard counters
+    rebuild_rollup_for_message(instance.id, instance)
     if instance.campaign:
         instance.campaign.update_stats()
 
 
 @receiver(post_save, sender=SMSRecipient)
-def update_campaign_on_recipient_save(sender, instance, **kwargs):
-    """Update campaign statistics when recipient status changes"""
+def update_campaign_on_recipient_save(sender, instance, created, **kwargs):
+    """Keep the status summary, usage rollup and campaign statistics in step with single-row saves.
+
+    Bulk inserts and transitions (sms/recipient_status.py) maintain the
+    summary and rollup themselves and do not fire this signal.
+    """
+    if created:
+        apply_summary_deltas(instance.message_id, {instance.status: 1})
+        apply_rollup_deltas(instance.message_id, {instance.status: 1}, billed_segments(instance), instance.message)
+    else:
+        # The previous status is unknown here, so recount this message only
+        rebuild_summaries([instance.message_id])
+        rebuild_rollup_for_message(instance.message_id, instance.message)
+
     if instance.message and instance.message.campaign:
         # Update the parent message's delivery counts first
         message = instance.message
-        recipients = message.recipient_logs.all()
-        message.successful_deliveries = recipients.filter(status='delivered').count()
-        message.failed_deliveries = recipients.filter(status='failed').count()
+        summary = get_status_summary(message.id)
+        message.successful_deliveries = summary.delivered
+        message.failed_deliveries = summary.failed
         message.save(update_fields=['successful_deliveries', 'failed_deliveries'])
         
         # Then update the campaign stats
         message.campaign.update_stats()
+
+
+# Dashboard counters: templates and groups book the difference between their
+# contribution before and after each save (status, owner or scope may change)
+COUNTED_MODELS = {
+    Template: (lambda t: t.user_id, template_counts),
+    Group: (lambda g: g.teacher_id, group_counts),
+}
+
+
+@receiver(pre_save, sender=Template)
+@receiver(pre_save, sender=Group)
+def remember_counted_state(sender, instance, **kwargs):
+    owner, counts = COUNTED_MODELS[sender]
+    previous = sender.objects.filter(pk=instance.pk).first() if instance.pk else None
+    instance._counted_before = (owner(previous), counts(previous)) if previous else (None, None)
+
+
+@receiver(post_save, sender=Template)
+@receiver(post_save, sender=Group)
+def count_saved(sender, instance, **kwargs):
+    owner, counts = COUNTED_MODELS[sender]
+    owner_before, counts_before = getattr(instance, '_counted_before', (None, None))
+    book_change(owner_before, counts_before, owner(instance), counts(instance))
+
+
+@receiver(post_delete, sender=Template)
+@receiver(post_delete, sender=Group)
+def count_deleted(sender, instance, **kwargs):
+    owner, counts = COUNTED_MODELS[sender]
+    book_change(owner(instance), counts(instance), None, None)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def count_created_user(sender, instance, created, **kwargs):
+    if created:
+        apply_counter_deltas(None, users=1)
+
+
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def count_deleted_user(sender, instance, **kwargs):
+    # Their rollup rows were cascade-deleted, possibly before their messages,
+    # so take their usage out of the system row from their own counter row
+    own = DashboardCounters.objects.filter(scope=f"user:{instance.pk}")
+    usage = own.values("sent", "delivered", "failed").first() or {}
+    apply_counter_deltas(None, users=-1, **{field: -n for field, n in usage.items()})
+    own.delete()
+
+
+@receiver(user_logged_in)
+def log_login(sender, request, user, **kwargs):
+    record_event(ActivityEvent.AUTH, "Logged in", user=user, status="success")
+
+
+@receiver(user_logged_out)
+def log_logout(sender, request, user, **kwargs):
+    if user is not None:
+        record_event(ActivityEvent.AUTH, "Logged out", user=user)
+
+
+@receiver(user_login_failed)
+def log_login_failed(sender, credentials, request=None, **kwargs):
+    record_event(
+        ActivityEvent.AUTH, "Login failed", status="failed",
+        details=f"Login attempt for {credentials.get('username') or credentials.get('email') or 'unknown'}",
+    )
@@ -0,0 +1,68 @@
+"""Page statistics from a single aggregate query.
+
+Pages used to build their tiles from several ``count()`` and
+``aggregate()`` calls over the same table. ``page_stats`` takes named
+``Count(filter=...)`` / ``Sum(filter=...)`` expressions (see ``count_if``
+and ``sum_if``) and evaluates all of them in one ``aggregate()``; the
+functions below are the counter sets of the pages that share them.
+"""
+
+from django.contrib.auth import get_user_model
+from django.db.models import Count, Q, Sum
+
+from .analytics import scoped_messages
+from .rollups import scoped_rollups
+
+
+def count_if(**filters):
+    """Rows matching `filters` (all rows without filters)."""
+    return Count("pk", filter=Q(**filters) if filters else None)
+
+
+def sum_if(field, **filters):
+    """Sum of `field` over rows matching `filters`."""
+    return Sum(field, filter=Q(**filters) if filters else None)
+
+
+def page_stats(queryset, **counters):
+    """Evaluate every named counter over `queryset` in one aggregate(); missing sums are 0."""
+    return {name: value or 0 for name, value in queryset.aggregate(**counters).items()}
+
+
+def percentage(part, whole):
+    return round(part / whole * 100, 1) if whole > 0 else 0
+
+
+def user_stats():
+    """User management tiles."""
+    return page_stats(
+        get_user_model().objects.all(),
+        total=count_if(),
+        active=count_if(is_active=True),
+        admins=count_if(role="admin"),
+        teachers=count_if(role="teacher"),
+    )
+
+
+def delivery_stats(user):
+    """Delivered / failed message totals in `user`'s scope (message history tiles)."""
+    stats = page_stats(
+        scoped_messages(user),
+        total_delivered=sum_if("successful_deliveries"),
+        total_failed=sum_if("failed_deliveries"),
+    )
+    stats["total_sent"] = stats["total_delivered"] + stats["total_failed"]
+    stats["success_rate"] = percentage(stats["total_delivered"], stats["total_sent"])
+    return stats
+
+
+def send_page_stats(user, today):
+    """SMS sent today and overall delivery totals from the usage rollup (send page tiles)."""
+    stats = page_stats(
+        scoped_rollups(user),
+        today_count=sum_if("sent", date=today),
+        total_sent=sum_if("sent"),
+        total_delivered=sum_if("delivered"),
+    )
+    stats["delivery_rate"] = percentage(stats["total_delivered"], stats["total_sent"])
+    return stats
@@ -0,0 +1,100 @@
+"""Duplicate-send suppression.
+
+A send is identified by sha256(normalized phone, message text). Before a
+batch goes to the provider its fingerprints are checked against the recent
+window with one indexed ``digest IN (...)`` lookup; repeats are dropped and
+reported back to the caller. Accepted sends are recorded with one bulk
+INSERT afterwards.
+"""
+
+import hashlib
+import re
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import SendFingerprint
+
+# Digests per lookup query; a 10k-recipient batch stays a single query
+LOOKUP_CHUNK_SIZE = 10000
+
+_NON_DIGITS = re.compile(r"\D")
+
+
+def suppression_window():
+    """Configured suppression window as a timedelta, or None when disabled."""
+    minutes = settings.APP_SETTINGS.get("DUPLICATE_SUPPRESSION_MINUTES", 0)
+    return timedelta(minutes=minutes) if minutes and minutes > 0 else None
+
+
+def normalize_phone(phone):
+    """Digits only, keeping the 10-digit subscriber number (drops +91 / 0 prefixes)."""
+    digits = _NON_DIGITS.sub("", str(phone or ""))
+    return digits[-10:] if len(digits) > 10 else digits
+
+
+def fingerprint(phone, message_text):
+    key = f"{normalize_phone(phone)}\x00{(message_text or '').strip()}"
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+def split_duplicates(pairs, window=None):
+    """Split (phone, message_text) pairs into (allowed, suppressed).
+
+    Pairs repeated within the batch itself are suppressed as well, so each
+    number receives a given text once. Pairs without a usable number are
+    always allowed through, so the send rejects them as missing a phone.
+    """
+    window = window if window is not None else suppression_window()
+    pairs = list(pairs)
+    if window is None or not pairs:
+        return pairs, []
+
+    digests = [fingerprint(phone, text) if normalize_phone(phone) else None for phone, text in pairs]
+    unique = list(dict.fromkeys(digest for digest in digests if digest))
+    since = timezone.now() - window
+
+    recent = set()
+    for i in range(0, len(unique), LOOKUP_CHUNK_SIZE):
+        recent.update(
+            SendFingerprint.objects.filter(
+                digest__in=unique[i:i + LOOKUP_CHUNK_SIZE],
+                created_at__gte=since,
+            ).values_list("digest", flat=True)
+        )
+
+    allowed, suppressed = [], []
+    for pair, digest in zip(pairs, digests):
+        if digest is None:
+            allowed.append(pair)
+        elif digest in recent:
+            suppressed.append(pair)
+        else:
+            allowed.append(pair)
+            recent.add(digest)
+    return allowed, suppressed
+
+
+def record_sends(pairs):
+    """Remember accepted (phone, message_text) pairs for the suppression window."""
+    if suppression_window() is None:
+        return
+    now = timezone.now()
+    SendFingerprint.objects.bulk_create(
+        [
+            SendFingerprint(digest=fingerprint(phone, text), created_at=now)
+            for phone, text in pairs if normalize_phone(phone)
+        ],
+        batch_size=1000,
+    )
+
+
+def prune_fingerprints(window=None):
+    """Delete fingerprints older than the window; returns the number removed."""
+    window = window if window is not None else suppression_window()
+    if window is None:
+        deleted, _ = SendFingerprint.objects.all().delete()
+    else:
+        deleted, _ = SendFingerprint.objects.filter(created_at__lt=timezone.now() - window).delete()
+    return deleted
@@ -1,3 +1,1155 @@
-from django.test import TestCase
+import csv
+import io
+import json
+from datetime import datetime, timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from .models import (
+    User, ActivityEvent, Campaign, DashboardCounters, Group, SMSMessage, SMSRecipient, MessageStatusSummary,
+    DailyUsageRollup, SendFingerprint, SenderID, SMSUsageStats, StudentContact, SyncCheckpoint, Template,
+)
+from .activity import activity_feed
+from .analytics import (
+    bucketed_delivery_counts, cached_monthly_stats, error_breakdown, financial_report, latency_report,
+    local_day_bounds, top_failing_numbers, usage_report,
+)
+from .contacts import ContactResolver
+from .counters import dashboard_counters, reconcile_counters
+from .categories import (
+    ACADEMIC, ADMINISTRATIVE, EMERGENCY, EVENTS, OTHER, categorize, category_breakdown, user_category_breakdown,
+)
+from .report_cache import LOCAL_CACHE_TTL, cached_report
+from .rollups import rebuild_rollups
+from .stats import delivery_stats, user_stats
+from .suppression import record_sends, split_duplicates
+from .segments import GSM7, UCS2, count_segments, encoding_for
+from .services import MySMSMantraService
+from .recipient_status import (
+    new_recipient, create_recipients, transition_recipients, get_status_summary, rebuild_summaries,
+)
+
+
+class RecipientStatusTransitionTests(TestCase):
+    """Status writes are monotonic and batched per target status."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='teacher', email='teacher@example.com', password='pass12345', role='teacher'
+        )
+        self.message = SMSMessage.objects.create(user=self.user, message_text='Hello', status='submitted')
+        self.pending = SMSRecipient.objects.create(message=self.message, phone_number='919800000001')
+        self.delivered = SMSRecipient.objects.create(
+            message=self.message, phone_number='919800000002', status='delivered'
+        )
+
+    def test_late_pending_does_not_overwrite_delivered(self):
+        counts = transition_recipients(self.message.id, {
+            'pending': {self.delivered.id: {}},
+        })
+        self.assertEqual(counts, {'pending': 0})
+        self.delivered.refresh_from_db()
+        self.assertEqual(self.delivered.status, 'delivered')
+
+    def test_forward_transition_writes_fields(self):
+        now = timezone.now()
+        # candidate read, one UPDATE per source status, one summary UPDATE,
+        # rollup key read, one rollup UPDATE and one dashboard counter UPDATE
+        with self.assertNumQueries(6):
+            counts = transition_recipients(self.message.id, {
+                'delivered': {
+                    self.pending.id: {'delivery_time': now, 'error_code': 0},
+                    self.delivered.id: {'delivery_time': now, 'error_code': 0},
+                },
+            })
+        self.assertEqual(counts, {'delivered': 1})
+        self.pending.refresh_from_db()
+        self.assertEqual(self.pending.status, 'delivered')
+        self.assertEqual(self.pending.status_rank, SMSRecipient.rank_for('delivered'))
+        self.assertEqual(self.pending.delivery_time, now)
+
+    def test_bulk_created_rows_are_ranked(self):
+        create_recipients([
+            new_recipient(message=self.message, phone_number='919800000004', status='submit_failed'),
+        ])
+        row = SMSRecipient.objects.get(phone_number='919800000004')
+        self.assertEqual(row.status_rank, SMSRecipient.rank_for('submit_failed'))
+
+    def test_per_row_fields(self):
+        other = SMSRecipient.objects.create(message=self.message, phone_number='919800000003')
+        transition_recipients(self.message.id, {
+            'failed': {
+                self.pending.id: {'error_code': 1084},
+                other.id: {'error_code': 1092},
+            },
+        })
+        self.pending.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual((self.pending.status, self.pending.error_code), ('failed', 1084))
+        self.assertEqual((other.status, other.error_code), ('failed', 1092))
+
+    def test_summary_tracks_inserts_and_transitions(self):
+        create_recipients([
+            new_recipient(message=self.message, phone_number='919800000005', status='submit_failed'),
+        ])
+        transition_recipients(self.message.id, {'delivered': {self.pending.id: {}}})
+
+        summary = get_status_summary(self.message.id)
+        self.assertEqual(
+            (summary.pending, summary.delivered, summary.submit_failed, summary.total),
+            (0, 2, 1, 3),
+        )
+
+    def test_rebuild_repairs_drift(self):
+        MessageStatusSummary.objects.filter(message=self.message).update(pending=42)
+        rebuild_summaries()
+        summary = get_status_summary(self.message.id)
+        self.assertEqual((summary.pending, summary.delivered), (1, 1))
+
+
+@mock.patch('sms.services.MySMSMantraService.get_sms_history')
+class ProviderHistorySyncTests(TestCase):
+    """The history sync resumes from its watermark and runs on one node at a time."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='syncer', email='syncer@example.com', password='pass12345', role='teacher'
+        )
+        self.message = SMSMessage.objects.create(user=self.user, message_text='Hi', status='submitted')
+        for i in range(2):
+            SMSRecipient.objects.create(
+                message=self.message, phone_number=f'91980000030{i}', api_message_id=f'api-{i}', status='pending'
+            )
+        self.day = timezone.localdate().strftime('%Y-%m-%d')
+
+    def _row(self, api_id, status, minute):
+        return {
+            'MessageId': api_id, 'Status': status, 'ErrorCode': '0',
+            'SubmitDate': f'{self.day} 00:{minute:02d}:00', 'DoneDate': f'{self.day} 00:{minute:02d}:30',
+        }
+
+    def _page(self, *rows):
+        return {'success': True, 'history': {'ErrorCode': 0, 'Data': list(rows)}}
+
+    def _sync(self, *args):
+        out = io.StringIO()
+        call_command('sync_provider_history', *args, stdout=out)
+        return out.getvalue()
+
+    def test_watermark_stops_at_first_row_in_flight(self, history):
+        history.return_value = self._page(
+            self._row('api-0', 'DELIVRD', 1),
+            self._row('elsewhere', 'UNDELIV', 2),  # final but not ours: counted, still advances
+            self._row('api-1', 'SUBMITTED', 3),
+        )
+        output = self._sync()
+        self.assertIn('matched 1, updated 1, unmatched 1', output)
+
+        checkpoint = SyncCheckpoint.objects.get(name='provider_history')
+        self.assertEqual(timezone.localtime(checkpoint.watermark).strftime('%H:%M'), '00:02')
+        self.assertEqual((checkpoint.offset, checkpoint.locked_by), (2, ''))
+        delivered = SMSRecipient.objects.get(api_message_id='api-0')
+        self.assertEqual(delivered.status, 'delivered')
+        self.assertEqual(timezone.localtime(delivered.delivery_time).strftime('%H:%M:%S'), '00:01:30')
+
+        # The next run starts after the consumed rows
+        history.reset_mock()
+        history.return_value = self._page()
+        self._sync()
+        self.assertEqual(history.call_args.kwargs['start'], 2)
+
+    def test_held_lease_blocks_second_run(self, history):
+        SyncCheckpoint.objects.create(
+            name='provider_history', locked_by='other-node', locked_until=timezone.now() + timedelta(minutes=5)
+        )
+        self.assertIn('already syncing', self._sync())
+        history.assert_not_called()
+
+    def test_run_stops_when_lease_is_taken_over(self, history):
+        def page(start, **kwargs):
+            if start == 1:  # our lease expired mid-run and another node took it
+                SyncCheckpoint.objects.update(locked_by='other-node')
+            return self._page(self._row(f'api-{start}', 'DELIVRD', start + 1))
+
+        history.side_effect = page
+        output = self._sync('--page-size', '1', '--max-pages', '5')
+        self.assertIn('Lease lost', output)
+        self.assertEqual(history.call_count, 2)
+        # Progress belongs to the new holder; ours is not written over it
+        self.assertIsNone(SyncCheckpoint.objects.get(name='provider_history').watermark)
+
+
+@mock.patch(
+    'sms.myviews.Campaign_api.MySMSMantraService.send_batches',
+    return_value={'success': True, 'submitted': 1, 'rejected': 0},
+)
+class ResendFailedTests(TestCase):
+    """Retries go to recoverable failures only, as a child of the failed message."""
+
+    def setUp(self):
+        self.teacher = User.objects.create_user(
+            username='resender', email='resender@example.com', password='pass12345', role='teacher'
+        )
+        SenderID.objects.create(user=self.teacher, name='SCHOOL', type='promotional')
+        self.usage = SMSUsageStats.objects.create(user=self.teacher, remaining_credits=10)
+        self.campaign = Campaign.objects.create(user=self.teacher, title='Fees')
+        self.parent = SMSMessage.objects.create(
+            user=self.teacher, campaign=self.campaign, message_text='Fees due', sender_name='SCHOOL'
+        )
+        SMSRecipient.objects.create(message=self.parent, phone_number='919800000501', status='failed', error_code=33)
+        SMSRecipient.objects.create(message=self.parent, phone_number='919800000502', status='failed', error_code=13)
+        SMSRecipient.objects.create(message=self.parent, phone_number='919800000503', status='failed', error_code=33)
+        # The third number got through on a later message of the campaign
+        later = SMSMessage.objects.create(user=self.teacher, campaign=self.campaign, message_text='Fees due')
+        SMSRecipient.objects.create(message=later, phone_number='919800000503', status='delivered')
+        self.url = f'/api/campaigns/{self.campaign.id}/resend-failed/'
+        self.client.force_login(self.teacher)
+
+    def test_resends_recoverable_failures_under_parent_sender(self, send):
+        response = self.client.post(self.url, '{}', content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual((data['resent'], data['skipped_permanent'], data['parent_message_id']), (1, 1, self.parent.id))
+
+        sms_message, batches, sender_id = send.call_args.args
+        self.assertEqual((batches, sender_id), ([('Fees due', ['919800000501'])], 'SCHOOL'))
+        self.assertEqual(sms_message.parent_id, self.parent.id)
+        self.assertEqual((sms_message.sender_name, sms_message.route), ('SCHOOL', 'promotional'))
+        self.assertEqual(list(self.parent.retries.values_list('id', flat=True)), [data['message_id']])
+
+        self.usage.refresh_from_db()
+        self.assertEqual(self.usage.remaining_credits, 9)
+
+    def test_insufficient_credits(self, send):
+        SMSUsageStats.objects.filter(pk=self.usage.pk).update(remaining_credits=0)
+        response = self.client.post(self.url, '{}', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        send.assert_not_called()
+        self.assertFalse(self.parent.retries.exists())
+
+
+@override_settings(APP_SETTINGS=dict(settings.APP_SETTINGS, DUPLICATE_SUPPRESSION_MINUTES=30))
+class DuplicateSuppressionTests(TestCase):
+    """Repeats of a text to a number inside the window are dropped before sending."""
+
+    def setUp(self):
+        self.teacher = User.objects.create_user(
+            username='repeater', email='repeater@example.com', password='pass12345', role='teacher'
+        )
+        SMSUsageStats.objects.create(user=self.teacher, remaining_credits=10)
+        record_sends([('919800000601', 'Hi')])
+        self.client.force_login(self.teacher)
+
+    def _send(self, **payload):
+        return self.client.post('/api/sms/send/', json.dumps(payload), content_type='application/json')
+
+    def test_one_lookup_for_batch_and_in_batch_repeats(self):
+        pairs = [('+91 98000 00601', 'Hi'), ('9800000602', 'Hi'), ('919800000602', 'Hi'), ('9800000602', 'Bye')]
+        with self.assertNumQueries(1):
+            allowed, suppressed = split_duplicates(pairs)
+        self.assertEqual(allowed, [('9800000602', 'Hi'), ('9800000602', 'Bye')])
+        self.assertEqual(suppressed, [('+91 98000 00601', 'Hi'), ('919800000602', 'Hi')])
+
+    def test_expired_fingerprints_do_not_suppress(self):
+        SendFingerprint.objects.update(created_at=timezone.now() - timedelta(minutes=31))
+        self.assertEqual(split_duplicates([('919800000601', 'Hi')]), ([('919800000601', 'Hi')], []))
+
+    def test_missing_phones_are_rejected_not_suppressed(self):
+        response = self._send(per_contact_messages=True, recipients_with_messages=[
+            {'phone': '', 'message': 'Hi'}, {'phone': ' ', 'message': 'Hi'},
+        ])
+        data = response.json()
+        self.assertEqual((response.status_code, data['rejected'], data['suppressed']), (200, 2, 0))
+        self.assertEqual(
+            list(SMSRecipient.objects.values_list('error_message', flat=True)), ['Missing phone or message'] * 2
+        )
+
+    @mock.patch('sms.myviews.send_sms_api.MySMSMantraService.send_sms_sync', return_value={'success': True})
+    def test_all_suppressed_and_allow_duplicates(self, send):
+        response = self._send(recipients=['919800000601'], message='Hi')
+        self.assertEqual((response.status_code, response.json()['suppressed']), (409, 1))
+        send.assert_not_called()
+
+        response = self._send(recipients=['919800000601'], message='Hi', allow_duplicates=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(send.call_args.kwargs['recipients_list'], ['919800000601'])
+
+
+class DeliveryTrendTests(TestCase):
+    """Report trends come from one grouped query bucketed by local day."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='reporter', email='reporter@example.com', password='pass12345', role='teacher'
+        )
+
+    def _message(self, created_at, *statuses):
+        message = SMSMessage.objects.create(user=self.user, message_text='Hi', status='submitted')
+        SMSMessage.objects.filter(pk=message.pk).update(created_at=created_at)
+        for i, status in enumerate(statuses):
+            SMSRecipient.objects.create(message=message, phone_number=f'91980000{message.pk:02d}{i:02d}', status=status)
+
+    def test_local_day_buckets_are_densified(self):
+        day = timezone.localdate() - timedelta(days=3)
+        # 00:30 IST is still the previous day in UTC
+        early = timezone.make_aware(datetime.combine(day, datetime.min.time()) + timedelta(minutes=30))
+        self._message(early, 'delivered')
+        self._message(early + timedelta(hours=2), 'failed')
+
+        start_dt, end_dt = local_day_bounds(day - timedelta(days=1), day + timedelta(days=1))
+        with self.assertNumQueries(1):
+            trends = bucketed_delivery_counts(SMSMessage.objects.all(), start_dt, end_dt)
+
+        self.assertEqual([d['date'] for d in trends], [
+            (day + timedelta(days=i)).strftime('%Y-%m-%d') for i in (-1, 0, 1)
+        ])
+        self.assertEqual(
+            [(d['sent'], d['delivered'], d['failed']) for d in trends],
+            [(0, 0, 0), (2, 1, 1), (0, 0, 0)],
+        )
+
+
+class SegmentCountTests(TestCase):
+
+    def test_gsm7_limits(self):
+        self.assertEqual(encoding_for('Exam on Monday'), GSM7)
+        self.assertEqual(count_segments('a' * 160), 1)
+        self.assertEqual(count_segments('a' * 161), 2)
+        # extension characters take two septets
+        self.assertEqual(count_segments('{' * 80), 1)
+        self.assertEqual(count_segments('{' * 81), 2)
+
+    def test_ucs2_limits(self):
+        text = 'परीक्षा' * 10
+        self.assertEqual(encoding_for(text), UCS2)
+        self.assertEqual(count_segments('अ' * 70), 1)
+        self.assertEqual(count_segments('अ' * 71), 2)
+        self.assertEqual(count_segments('अ' * 135), 3)
+
+
+class DailyUsageRollupTests(TestCase):
+    """The rollup follows inserts and transitions and matches a full rebuild."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='roller', email='roller@example.com', password='pass12345', role='teacher'
+        )
+        self.message = SMSMessage.objects.create(user=self.user, message_text='a' * 200, status='submitted')
+
+    def _rollup(self):
+        row = DailyUsageRollup.objects.get(user=self.user, date=timezone.localdate())
+        return row.sent, row.delivered, row.failed, row.segments
+
+    def test_inserts_and_transitions_are_booked(self):
+        create_recipients([
+            new_recipient(message=self.message, phone_number='919800000011', status='pending'),
+            new_recipient(message=self.message, phone_number='919800000012', status='submit_failed'),
+        ])
+        # The submit failure is counted but not billed
+        self.assertEqual(self._rollup(), (2, 0, 1, 2))
+
+        pending = SMSRecipient.objects.get(phone_number='919800000011')
+        transition_recipients(self.message.id, {'delivered': {pending.id: {}}})
+        self.assertEqual(self._rollup(), (2, 1, 1, 2))
+
+        row = DailyUsageRollup.objects.get(user=self.user)
+        self.assertEqual(float(row.cost), 2 * 0.25)
+
+    def test_rejected_resubmission_is_unbilled(self):
+        create_recipients([new_recipient(message=self.message, phone_number='919800000014', status='pending')])
+        pending = SMSRecipient.objects.get(phone_number='919800000014')
+        transition_recipients(self.message.id, {'submit_failed': {pending.id: {}}})
+        self.assertEqual(self._rollup(), (1, 0, 1, 0))
+        self.assertEqual(float(DailyUsageRollup.objects.get(user=self.user).cost), 0)
+
+    def test_rebuild_matches_incremental(self):
+        SMSRecipient.objects.create(message=self.message, phone_number='919800000013', status='delivered')
+        expected = self._rollup()
+        DailyUsageRollup.objects.update(sent=99)
+        today = timezone.localdate()
+        rebuild_rollups(today, today)
+        self.assertEqual(self._rollup(), expected)
+
+
+class UsageReportTests(TestCase):
+    """The usage report is a fixed number of queries however many users exist."""
+
+    def setUp(self):
+        self.users = [
+            User.objects.create_user(
+                username=f'user{i}', email=f'user{i}@example.com', password='pass12345', role='teacher'
+            )
+            for i in range(4)
+        ]
+        for i, u in enumerate(self.users):
+            for _ in range(i):
+                SMSMessage.objects.create(user=u, message_text='Hi')
+
+    def test_sorted_paged_in_two_queries(self):
+        now = timezone.now()
+        with self.assertNumQueries(2):
+            rows, stats, pagination = usage_report(
+                User.objects.all(), now - timedelta(days=1), now, sort='-messages_sent', page=1, page_size=3
+            )
+        self.assertEqual([r['messages_sent'] for r in rows], [3, 2, 1])
+        self.assertEqual(stats, {'total_users': 4, 'active_users': 3, 'total_sent': 6})
+        self.assertEqual((pagination['pages'], pagination['total']), (2, 4))
+
+        rows, _, _ = usage_report(User.objects.all(), now - timedelta(days=1), now, page=2, page_size=3)
+        self.assertEqual([(r['user'], r['status']) for r in rows], [('user0@example.com', 'Inactive')])
+
+
+class FinancialReportTests(TestCase):
+    """Costs are priced per segment by route and encoding in one grouped query."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='payer', email='payer@example.com', password='pass12345', role='teacher'
+        )
+        promo = SMSMessage.objects.create(user=self.user, message_text='a' * 200, route='promotional')
+        unicode_msg = SMSMessage.objects.create(user=self.user, message_text='नमस्ते')
+        SMSRecipient.objects.create(message=promo, phone_number='919800000021')  # 2 segments
+        SMSRecipient.objects.create(message=unicode_msg, phone_number='919800000022')  # 1 segment
+        # Rejected at submission: counted, not priced
+        SMSRecipient.objects.create(message=promo, phone_number='919800000023', status='submit_failed')
+
+    def test_tariff_by_route_and_encoding(self):
+        app_settings = dict(settings.APP_SETTINGS, SMS_TARIFFS={
+            'promotional': {'gsm7': 0.40},
+            'transactional': {'ucs2': 0.30},
+        })
+        now = timezone.now()
+        with override_settings(APP_SETTINGS=app_settings), self.assertNumQueries(1):
+            monthly, by_user, by_campaign, totals = financial_report(
+                SMSRecipient.objects.all(), now - timedelta(days=1), now
+            )
+        self.assertEqual(totals, {'total_sent': 3, 'total_segments': 3, 'total_cost': 1.1})
+        self.assertEqual(monthly[0]['month'], timezone.localdate().strftime('%Y-%m'))
+        self.assertEqual(by_user, [{'user': 'payer@example.com', 'messages_sent': 3, 'segments': 3, 'cost': 1.1}])
+        self.assertEqual(by_campaign[0]['campaign'], 'No campaign')
+
+
+class MonthlyStatsCacheTests(TestCase):
+    """The dashboard chart is one grouped query, cached until a message lands."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='charter', email='charter@example.com', password='pass12345', role='teacher'
+        )
+        old = SMSMessage.objects.create(user=self.user, message_text='Old', status='failed')
+        SMSMessage.objects.filter(pk=old.pk).update(created_at=timezone.now() - timedelta(days=800))
+        SMSMessage.objects.create(user=self.user, message_text='Hi', status='failed', sent_at=timezone.now())
+
+    def test_cached_until_new_message(self):
+        month = timezone.localdate().strftime('%Y-%m')
+        with self.assertNumQueries(1):
+            stats = cached_monthly_stats(self.user)
+        self.assertEqual(stats, {'months': [month], 'sent': [1], 'failed': [1]})
+        with self.assertNumQueries(0):
+            cached_monthly_stats(self.user)
+
+        SMSMessage.objects.create(user=self.user, message_text='Again', status='sent')
+        self.assertEqual(cached_monthly_stats(self.user)['sent'], [2])
+
+
+class ReportCacheTests(TestCase):
+    """Cached reports are reused until the scope's data version moves."""
+
+    def setUp(self):
+        self.teacher = User.objects.create_user(
+            username='cached', email='cached@example.com', password='pass12345', role='teacher'
+        )
+        self.other = User.objects.create_user(
+            username='other', email='other@example.com', password='pass12345', role='teacher'
+        )
+        self.admin = User.objects.create_user(
+            username='boss', email='boss@example.com', password='pass12345', role='admin'
+        )
+        self.message = SMSMessage.objects.create(user=self.teacher, message_text='Hi')
+        self.recipient = SMSRecipient.objects.create(message=self.message, phone_number='919800000031')
+        self.builds = []
+
+    def _report(self, user):
+        return cached_report(user, 'test', {'range': 'week'}, lambda: self.builds.append(user.id) or len(self.builds))
+
+    def test_status_change_invalidates_owner_and_admin_only(self):
+        self.assertEqual([self._report(u) for u in (self.teacher, self.other, self.admin)], [1, 2, 3])
+        self.assertEqual([self._report(u) for u in (self.teacher, self.other, self.admin)], [1, 2, 3])
+
+        transition_recipients(self.message.id, {'delivered': {self.recipient.id: {}}})
+        self.assertEqual([self._report(u) for u in (self.teacher, self.other, self.admin)], [4, 2, 5])
+
+    @mock.patch('sms.report_cache.cache')
+    def test_local_memory_cache_keeps_entries_briefly(self, report_cache):
+        report_cache.get.side_effect = [7, None]
+        self._report(self.teacher)
+        self.assertEqual(report_cache.set.call_args.args[2], LOCAL_CACHE_TTL)
+
+
+class ExportTests(TestCase):
+    """Exports stream rows from the database as CSV."""
+
+    def setUp(self):
+        self.teacher = User.objects.create_user(
+            username='exporter', email='exporter@example.com', password='pass12345', role='teacher'
+        )
+        self.other = User.objects.create_user(
+            username='outsider', email='outsider@example.com', password='pass12345', role='teacher'
+        )
+        self.campaign = Campaign.objects.create(user=self.teacher, title='Exam')
+        message = SMSMessage.objects.create(user=self.teacher, campaign=self.campaign, message_text='Hi')
+        SMSRecipient.objects.create(message=message, phone_number='919800000041', status='delivered')
+        SMSRecipient.objects.create(message=message, phone_number='919800000042', status='failed', error_code=102)
+
+    def _csv(self, response):
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode())))
+
+    def test_campaign_log_csv(self):
+        self.client.force_login(self.teacher)
+        rows = self._csv(self.client.get(f'/api/campaigns/{self.campaign.id}/export/', {'status': 'failed'}))
+        self.assertEqual(rows[0][:5], ['Message ID', 'Sent On', 'Phone', 'Name', 'Status'])
+        self.assertEqual([(r[2], r[4], r[5]) for r in rows[1:]], [('919800000042', 'failed', '102')])
+
+    def test_campaign_log_requires_owner(self):
+        self.client.force_login(self.other)
+        response = self.client.get(f'/api/campaigns/{self.campaign.id}/export/')
+        self.assertEqual(response.status_code, 403)
+
+    def test_delivery_log_report_is_scoped(self):
+        self.client.force_login(self.other)
+        rows = self._csv(self.client.get('/api/reports/export/', {'type': 'delivery_log', 'range': 'week'}))
+        self.assertEqual(len(rows), 1)
+
+        self.client.force_login(self.teacher)
+        rows = self._csv(self.client.get('/api/reports/export/', {'type': 'delivery_log', 'range': 'week'}))
+        self.assertEqual(sorted(r[2] for r in rows[1:]), ['919800000041', '919800000042'])
+
+
+class CampaignCategoryTests(TestCase):
+    """Campaign categories are stored on save and grouped in SQL."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='categorized', email='categorized@example.com', password='pass12345', role='teacher'
+        )
+
+    def test_priority_and_substring_matching(self):
+        self.assertEqual(categorize('Urgent: exam postponed'), EMERGENCY)
+        self.assertEqual(categorize('Parent meeting', 'About the class test'), ACADEMIC)
+        self.assertEqual(categorize('Annual Fest'), EVENTS)
+        self.assertEqual(categorize('Eventest'), ACADEMIC)
+        self.assertEqual(categorize('Hello', None), OTHER)
+
+    def test_category_follows_title_edits(self):
+        campaign = Campaign.objects.create(user=self.user, title='Sports Fest')
+        self.assertEqual(campaign.category, EVENTS)
+        campaign.title = 'Staff meeting'
+        campaign.save(update_fields=['title'])
+        campaign.refresh_from_db()
+        self.assertEqual(campaign.category, ADMINISTRATIVE)
+
+    def test_breakdown_is_one_query(self):
+        Campaign.objects.create(user=self.user, title='Exam timetable', total_sent=30)
+        Campaign.objects.create(user=self.user, title='Unit test', total_sent=10)
+        Campaign.objects.create(user=self.user, title='Emergency closure', total_sent=10)
+        with self.assertNumQueries(1):
+            breakdown = category_breakdown(Campaign.objects.filter(user=self.user))
+        self.assertEqual(
+            [(c['name'], c['count'], c['percentage']) for c in breakdown],
+            [('Academic', 40, 80.0), ('Administrative', 0, 0.0), ('Events', 0, 0.0), ('Emergency', 10, 20.0)],
+        )
+
+    def test_user_breakdown_covers_own_campaigns_in_any_status(self):
+        other = User.objects.create_user(
+            username='uncategorized', email='uncategorized@example.com', password='pass12345', role='teacher'
+        )
+        admin = User.objects.create_user(
+            username='categories-admin', email='categories-admin@example.com', password='pass12345', role='admin'
+        )
+        Campaign.objects.create(user=self.user, title='Exam timetable', status='completed', total_sent=30)
+        Campaign.objects.create(user=self.user, title='Sports Fest', status='sending', total_sent=10)
+        Campaign.objects.create(user=other, title='Staff meeting', status='completed', total_sent=60)
+
+        def counts(user):
+            return {c['name']: c['count'] for c in user_category_breakdown(user)}
+
+        self.assertEqual(counts(self.user), {'Academic': 30, 'Administrative': 0, 'Events': 10, 'Emergency': 0})
+        self.assertEqual(counts(admin), {'Academic': 30, 'Administrative': 60, 'Events': 10, 'Emergency': 0})
+
+
+class LatencyReportTests(TestCase):
+    """Latency percentiles come from delivered rows' provider timestamps."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='latency', email='latency@example.com', password='pass12345', role='teacher'
+        )
+        self.message = SMSMessage.objects.create(user=self.user, message_text='Hi', sender_name='BOMBYS')
+        submitted = timezone.now() - timedelta(hours=1)
+        for i, seconds in enumerate([10, 20, 30, 40, 600]):
+            SMSRecipient.objects.create(
+                message=self.message, phone_number=f'9198000001{i:02d}', status='delivered',
+                submit_time=submitted, delivery_time=submitted + timedelta(seconds=seconds),
+            )
+        # Not delivered / no timestamps: ignored
+        SMSRecipient.objects.create(message=self.message, phone_number='919800000199', status='failed',
+                                    submit_time=submitted)
+
+    def test_percentiles_and_within_share(self):
+        now = timezone.now()
+        by_day, by_sender, by_campaign, overall = latency_report(
+            SMSRecipient.objects.all(), now - timedelta(days=1), now, within_minutes=5
+        )
+        self.assertEqual(overall['delivered'], 5)
+        self.assertEqual(overall['p50'], 30.0)
+        self.assertEqual(overall['within_pct'], 80.0)
+        self.assertEqual([s['sender'] for s in by_sender], ['BOMBYS'])
+        self.assertEqual(by_campaign[0]['campaign'], 'No campaign')
+        self.assertEqual(sum(d['delivered'] for d in by_day), 5)
+
+    @mock.patch('sms.services.MySMSMantraService.get_individual_message_status')
+    def test_status_refresh_stores_provider_delivery_time(self, status):
+        pending = SMSRecipient.objects.create(
+            message=self.message, phone_number='919800000198', api_message_id='api-198', status='pending',
+        )
+        status.return_value = {
+            'success': True, 'Status': 'DELIVRD', 'ErrorCode': '0', 'DoneDate': '2026-01-05 09:15:30',
+        }
+        self.assertTrue(MySMSMantraService().refresh_message_status(self.message.id)['success'])
+        pending.refresh_from_db()
+        self.assertEqual(pending.status, 'delivered')
+        self.assertEqual(
+            timezone.localtime(pending.delivery_time),
+            timezone.make_aware(datetime(2026, 1, 5, 9, 15, 30)),
+        )
+
+
+class ErrorReportTests(TestCase):
+    """Failures are grouped by error code and by number across campaigns."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='errors', email='errors@example.com', password='pass12345', role='teacher'
+        )
+        for title in ('First', 'Second'):
+            campaign = Campaign.objects.create(user=self.user, title=title)
+            message = SMSMessage.objects.create(user=self.user, campaign=campaign, message_text='Hi', sender_name='BOMBYS')
+            SMSRecipient.objects.create(message=message, phone_number='919800000201', status='failed', error_code=13)
+            SMSRecipient.objects.create(message=message, phone_number='919800000202', status='failed', error_code=33)
+            SMSRecipient.objects.create(message=message, phone_number='919800000203', status='delivered')
+
+    def test_breakdown_by_code(self):
+        now = timezone.now()
+        with self.assertNumQueries(1):
+            by_code, by_sender, by_day, totals = error_breakdown(SMSRecipient.objects.all(), now - timedelta(days=1), now)
+        self.assertEqual(
+            sorted((e['error_code'], e['kind'], e['failed']) for e in by_code),
+            [(13, 'permanent', 2), (33, 'transient', 2)],
+        )
+        self.assertEqual(by_sender, [{'sender': 'BOMBYS', 'failed': 4, 'permanent': 2}])
+        self.assertEqual(totals, {'total_failed': 4, 'permanent': 2, 'transient': 2})
+
+    def test_failures_without_code(self):
+        message = SMSMessage.objects.create(user=self.user, message_text='Hi')
+        _, fields = MySMSMantraService().classify_delivery('UNDELIV')
+        SMSRecipient.objects.create(message=message, phone_number='919800000204', status='failed', **fields)
+        # Stored as 0 (the provider's success code) by older refreshes
+        SMSRecipient.objects.create(message=message, phone_number='919800000205', status='failed', error_code=0)
+
+        now = timezone.now()
+        by_code, _, _, _ = error_breakdown(SMSRecipient.objects.all(), now - timedelta(days=1), now)
+        missing = [e for e in by_code if e['error_code'] is None]
+        self.assertEqual(
+            [(e['description'], e['kind'], e['failed']) for e in missing], [('No error code', 'unknown', 2)]
+        )
+
+    @mock.patch('sms.services.MySMSMantraService.get_individual_message_status')
+    def test_status_refresh_keeps_codes_without_status_change(self, status):
+        message = SMSMessage.objects.create(user=self.user, message_text='Hi')
+        failed = SMSRecipient.objects.create(
+            message=message, phone_number='919800000206', api_message_id='api-206', status='failed', error_code=13,
+        )
+        unknown = SMSRecipient.objects.create(
+            message=message, phone_number='919800000207', api_message_id='api-207', status='sent',
+        )
+        status.side_effect = lambda api_id: {
+            'api-206': {'success': True, 'Status': 'UNDELIV', 'ErrorCode': '33'},
+            'api-207': {'success': True, 'Status': 'DND', 'ErrorCode': '17'},
+        }[api_id]
+        self.assertTrue(MySMSMantraService().refresh_message_status(message.id)['success'])
+
+        failed.refresh_from_db()
+        unknown.refresh_from_db()
+        self.assertEqual((failed.status, failed.error_code), ('failed', 33))
+        self.assertEqual(
+            (unknown.status, unknown.error_code, unknown.error_description), ('sent', 17, 'Status: DND')
+        )
+
+    def test_top_failing_numbers(self):
+        now = timezone.now()
+        rows = top_failing_numbers(SMSRecipient.objects.all(), now - timedelta(days=1), now)
+        self.assertEqual(
+            [(r['phone_number'], r['failed'], r['campaigns'], r['drop_suggested']) for r in rows],
+            [('919800000201', 2, 2, True), ('919800000202', 2, 2, False)],
+        )
+
+
+class HistoryApiTests(TestCase):
+    """History is paged by (created_at, id) cursors, never by offset."""
+
+    def setUp(self):
+        self.teacher = User.objects.create_user(
+            username='historian', email='historian@example.com', password='pass12345', role='teacher'
+        )
+        self.other = User.objects.create_user(
+            username='stranger', email='stranger@example.com', password='pass12345', role='teacher'
+        )
+        created = timezone.now() - timedelta(days=1)
+        self.campaigns = []
+        for i in range(5):
+            campaign = Campaign.objects.create(user=self.teacher, title=f'Campaign {i}')
+            # Two campaigns share a timestamp so the id tiebreak is exercised
+            Campaign.objects.filter(pk=campaign.pk).update(created_at=created + timedelta(minutes=min(i, 3)))
+            self.campaigns.append(campaign)
+        Campaign.objects.create(user=self.other, title='Not mine')
+
+        self.message = SMSMessage.objects.create(user=self.teacher, campaign=self.campaigns[0], message_text='Hi')
+        for i in range(3):
+            SMSRecipient.objects.create(message=self.message, phone_number=f'9198000003{i:02d}')
+
+    def _pages(self, url, limit):
+        ids, cursor = [], None
+        while True:
+            params = {'limit': limit}
+            if cursor:
+                params['cursor'] = cursor
+            data = self.client.get(url, params).json()
+            ids += [row['id'] for row in data['results']]
+            cursor = data['next_cursor']
+            if not cursor:
+                return ids
+
+    def test_campaign_pages_cover_own_campaigns_once(self):
+        self.client.force_login(self.teacher)
+        ids = self._pages('/api/history/', 2)
+        expected = sorted(self.campaigns, key=lambda c: (Campaign.objects.get(pk=c.pk).created_at, c.pk), reverse=True)
+        self.assertEqual(ids, [c.pk for c in expected])
+
+    def test_recipients_page_in_send_order(self):
+        self.client.force_login(self.teacher)
+        ids = self._pages(f'/api/messages/{self.message.id}/recipients/', 2)
+        self.assertEqual(ids, list(self.message.recipient_logs.order_by('id').values_list('id', flat=True)))
+
+    def test_other_users_cannot_expand(self):
+        self.client.force_login(self.other)
+        self.assertEqual(self.client.get(f'/api/campaigns/{self.campaigns[0].id}/messages/').status_code, 403)
+        self.assertEqual(self.client.get(f'/api/messages/{self.message.id}/recipients/').status_code, 403)
+
+    def test_invalid_cursor(self):
+        self.client.force_login(self.teacher)
+        self.assertEqual(self.client.get('/api/history/', {'cursor': 'garbage'}).status_code, 400)
+
+
+class MessageRecipientsApiTests(TestCase):
+    """Recipient logs filter and sort on the (message, status, id) index and carry status counts."""
+
+    def setUp(self):
+        self.teacher = User.objects.create_user(
+            username='detailer', email='detailer@example.com', password='pass12345', role='teacher'
+        )
+        self.message = SMSMessage.objects.create(user=self.teacher, message_text='Hi')
+        statuses = ['delivered', 'failed', 'delivered', 'submit_failed', 'pending', 'delivered']
+        create_recipients([
+            new_recipient(message=self.message, phone_number=f'91980000040{i}', status=status,
+                          personalized_message=f'Hi {i}')
+            for i, status in enumerate(statuses)
+        ])
+        self.url = f'/api/messages/{self.message.id}/recipients/'
+        self.client.force_login(self.teacher)
+
+    def _all(self, params):
+        rows, cursor = [], None
+        while True:
+            page = dict(params, limit=2, **({'cursor': cursor} if cursor else {}))
+            data = self.client.get(self.url, page).json()
+            rows += data['results']
+            cursor = data['next_cursor']
+            if not cursor:
+                return rows, data['counts']
+
+    def test_status_filter_pages_and_counts(self):
+        rows, counts = self._all({'status': 'failed,submit_failed'})
+        self.assertEqual([r['status'] for r in rows], ['failed', 'submit_failed'])
+        self.assertEqual(
+            counts, {'total': 6, 'pending': 1, 'submitted': 0, 'delivered': 3, 'failed': 1, 'submit_failed': 1}
+        )
+
+    def test_sort_by_status_with_cursor(self):
+        rows, _ = self._all({'sort': '-status'})
+        expected = self.message.recipient_logs.order_by('-status', '-id').values_list('id', flat=True)
+        self.assertEqual([r['id'] for r in rows], list(expected))
+
+    def test_compact_rows_in_one_query_per_page(self):
+        with self.assertNumQueries(6):  # session + user + message + page + names + summary
+            data = self.client.get(self.url, {'compact': 'true', 'limit': 2}).json()
+        self.assertEqual(set(data['results'][0]), {'id', 'name', 'phone_number', 'status', 'error_code', 'text'})
+        self.assertEqual(data['results'][0]['text'], 'Hi 0')
+
+    def test_invalid_params(self):
+        self.assertEqual(self.client.get(self.url, {'status': 'bogus'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'sort': 'phone_number'}).status_code, 400)
+
+    def test_details_page(self):
+        self.assertContains(self.client.get(f'/message/{self.message.id}/'), 'Hi')
+        other = User.objects.create_user(
+            username='peeker', email='peeker@example.com', password='pass12345', role='teacher'
+        )
+        self.client.force_login(other)
+        self.assertEqual(self.client.get(f'/message/{self.message.id}/').status_code, 404)
+
+
+class HistorySearchTests(TestCase):
+    """Full-text (FTS5 here) and phone-prefix search over the user's own history."""
+
+    def setUp(self):
+        self.teacher = User.objects.create_user(
+            username='searcher', email='searcher@example.com', password='pass12345', role='teacher'
+        )
+        other = User.objects.create_user(
+            username='neighbour', email='neighbour@example.com', password='pass12345', role='teacher'
+        )
+        self.fee = SMSMessage.objects.create(user=self.teacher, message_text='Fee deadline is the 14th of March')
+        SMSRecipient.objects.create(message=self.fee, phone_number='919812345678')
+        self.meeting = SMSMessage.objects.create(user=self.teacher, message_text='PTA meeting on Friday')
+        self.personal = SMSRecipient.objects.create(
+            message=self.meeting, phone_number='9812300000', personalized_message='Dear Asha, your fee is pending'
+        )
+        SMSMessage.objects.create(user=other, message_text='Fee deadline reminder for other school')
+        self.client.force_login(self.teacher)
+
+    def test_text_search_is_ranked_and_scoped(self):
+        data = self.client.get('/api/history/search/', {'q': 'fee deadline'}).json()
+        self.assertEqual(data['mode'], 'text')
+        hits = [(r['type'], r['message_id']) for r in data['results']]
+        self.assertEqual(hits, [('message', self.fee.id), ('recipient', self.meeting.id)])
+
+    def test_phone_prefix_with_or_without_country_code(self):
+        for query in ('98123', '+91 98123'):
+            data = self.client.get('/api/history/search/', {'q': query}).json()
+            self.assertEqual(data['mode'], 'phone')
+            self.assertEqual(
+                sorted(r['phone_number'] for r in data['results']), ['919812345678', '9812300000']
+            )
+
+
+class ActivityFeedTests(TestCase):
+    """The admin feed reads the append-only event log a page per query."""
+
+    def setUp(self):
+        self.admin = User.objects.create_user(
+            username='auditor', email='auditor@example.com', password='pass12345', role='admin'
+        )
+        self.teacher = User.objects.create_user(
+            username='sender', email='sender@example.com', password='pass12345', role='teacher'
+        )
+        self.sent = SMSMessage.objects.create(user=self.teacher, message_text='Exam on Monday', status='sent')
+        self.failed = SMSMessage.objects.create(user=self.teacher, message_text='Holiday', status='failed')
+        for message in (self.sent, self.failed):
+            for i in range(3):
+                SMSRecipient.objects.create(message=message, phone_number=f'9198000004{i:02d}')
+
+    def test_feed_pages_in_one_query_each(self):
+        for i in range(4):
+            SMSMessage.objects.create(user=self.teacher, message_text=f'Notice {i}')
+        ids, cursor = [], None
+        while True:
+            with self.assertNumQueries(1):
+                entries, cursor = activity_feed(cursor=cursor, limit=4)
+            ids += [e['id'] for e in entries]
+            if not cursor:
+                break
+        self.assertEqual(ids, list(ActivityEvent.objects.order_by('-created_at', '-id').values_list('id', flat=True)))
+
+    def test_sms_status_follows_message(self):
+        SMSMessage.objects.filter(pk=self.sent.pk).update(status='failed')
+        entries, _ = activity_feed(status='failed', category=ActivityEvent.SMS)
+        self.assertEqual(sorted(e['message_id'] for e in entries), sorted([self.sent.id, self.failed.id]))
+        self.assertTrue(all(e['action'] == 'SMS failed' for e in entries))
+
+    def test_auth_and_template_events(self):
+        self.assertFalse(self.client.login(username='auditor@example.com', password='wrong'))
+        self.client.force_login(self.admin)
+        template = Template.objects.create(user=self.teacher, title='Fees', content='Pay fees', status='pending')
+        self.client.patch(
+            f'/api/templates/{template.id}/update/', '{"status": "approved"}', content_type='application/json'
+        )
+
+        data = self.client.get('/api/activity/', {'category': 'auth'}).json()
+        self.assertEqual([e['action'] for e in data['results']], ['Logged in', 'Login failed'])
+        data = self.client.get('/api/activity/', {'category': 'template', 'user': self.admin.id}).json()
+        self.assertEqual([(e['action'], e['details']) for e in data['results']], [('Template approved', 'Fees')])
+
+    def test_admin_only(self):
+        self.client.force_login(self.teacher)
+        self.assertEqual(self.client.get('/api/activity/').status_code, 403)
+        self.client.force_login(self.admin)
+        self.assertEqual(self.client.get('/api/activity/', {'start': '2026-13-01'}).status_code, 400)
+
+
+class ContactResolverTests(TestCase):
+    """Recipient numbers resolve to contacts in one query per batch, in the viewer's scope."""
+
+    def setUp(self):
+        self.teacher = User.objects.create_user(
+            username='classteacher', email='classteacher@example.com', password='pass12345', role='teacher'
+        )
+        other = User.objects.create_user(
+            username='otherteacher', email='otherteacher@example.com', password='pass12345', role='teacher'
+        )
+        self.admin = User.objects.create_user(
+            username='principal', email='principal@example.com', password='pass12345', role='admin'
+        )
+        mine = Group.objects.create(name='10A', teacher=self.teacher)
+        theirs = Group.objects.create(name='9B', teacher=other)
+        StudentContact.objects.create(name='Asha', phone_number='+919800000051', class_dept=mine)
+        StudentContact.objects.create(name='Ravi', phone_number='9800000052', class_dept=theirs)
+
+        self.campaign = Campaign.objects.create(user=self.teacher, title='Trip')
+        self.message = SMSMessage.objects.create(user=self.teacher, campaign=self.campaign, message_text='Trip')
+        for phone in ('919800000051', '9800000051', '919800000052', '919800000053'):
+            SMSRecipient.objects.create(message=self.message, phone_number=phone)
+
+    def test_one_query_then_memoized(self):
+        resolver = ContactResolver(self.admin)
+        phones = ['919800000051', '09800000051', '919800000052', '919800000053']
+        with self.assertNumQueries(1):
+            names = resolver.names(phones)
+        self.assertEqual(names, {
+            '919800000051': 'Asha', '09800000051': 'Asha', '919800000052': 'Ravi', '919800000053': None,
+        })
+        with self.assertNumQueries(0):
+            resolver.names(phones)
+
+    def test_attach_avoids_per_row_queries(self):
+        recipients = ContactResolver(self.teacher).attach(SMSRecipient.objects.filter(message=self.message))
+        with self.assertNumQueries(0):
+            names = [r.contact.name if r.contact else None for r in recipients]
+        # Ravi is in another teacher's group
+        self.assertEqual(names, ['Asha', 'Asha', None, None])
+
+    def test_history_and_export_names(self):
+        self.client.force_login(self.teacher)
+        data = self.client.get(f'/api/messages/{self.message.id}/recipients/').json()
+        self.assertEqual([r['name'] for r in data['results']], ['Asha', 'Asha', None, None])
+
+        response = self.client.get(f'/api/campaigns/{self.campaign.id}/export/')
+        rows = list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual([r[3] for r in rows[1:]], ['Asha', 'Asha', '', ''])
+
+
+class DashboardCounterTests(TestCase):
+    """Dashboard totals are kept by delta and agree with a full recount."""
+
+    def setUp(self):
+        self.admin = User.objects.create_user(
+            username='head', email='head@example.com', password='pass12345', role='admin'
+        )
+        self.teacher = User.objects.create_user(
+            username='counter', email='counter@example.com', password='pass12345', role='teacher'
+        )
+        Group.objects.create(name='Everyone', is_universal=True)
+        Group.objects.create(name='11C', teacher=self.teacher)
+        Template.objects.create(user=self.admin, title='Holiday', content='Closed', status='approved')
+        self.draft = Template.objects.create(user=self.teacher, title='Trip', content='Trip', status='pending')
+
+        message = SMSMessage.objects.create(user=self.teacher, message_text='Trip on Friday')
+        create_recipients([
+            new_recipient(message=message, phone_number=f'9198000006{i:02d}', status='submitted') for i in range(3)
+        ])
+        first = SMSRecipient.objects.filter(message=message).order_by('id').first()
+        transition_recipients(message.id, {'delivered': {first.id: {}}})
+
+    def test_deltas_match_recount(self):
+        self.draft.status = 'approved'
+        self.draft.save()
+        Group.objects.filter(name='11C').get().delete()
+
+        self.assertEqual(reconcile_counters(), 0)
+        self.assertEqual(
+            {k: v for k, v in dashboard_counters(self.teacher).items() if k != 'remaining_credits'},
+            {'users': 2, 'messages': 1, 'templates': 2, 'pending_templates': 0, 'groups': 1,
+             'sent': 3, 'delivered': 1, 'failed': 0},
+        )
+
+    def test_teacher_scope_and_single_query(self):
+        with self.assertNumQueries(1):
+            counters = dashboard_counters(self.teacher)
+        # Own and universal groups; approved templates plus own drafts
+        self.assertEqual((counters['groups'], counters['templates'], counters['pending_templates']), (2, 2, 1))
+        self.assertEqual(dashboard_counters(self.admin)['messages'], 1)
+
+    def test_reconcile_fixes_drift(self):
+        dashboard_counters(self.teacher)
+        DashboardCounters.objects.filter(scope=f'user:{self.teacher.id}').update(sent=99)
+        self.assertEqual(reconcile_counters([f'user:{self.teacher.id}']), 1)
+        self.assertEqual(dashboard_counters(self.teacher)['sent'], 3)
+
+    def test_deleting_message_removes_its_usage(self):
+        SMSMessage.objects.get(user=self.teacher).delete()
+        counters = dashboard_counters(self.teacher)
+        self.assertEqual((counters['messages'], counters['sent'], counters['delivered']), (0, 0, 0))
+        self.assertFalse(DailyUsageRollup.objects.filter(user=self.teacher).exists())
+        self.assertEqual(reconcile_counters(), 0)
+
+    def test_deleting_user_removes_their_usage(self):
+        dashboard_counters(self.admin)
+        self.teacher.delete()
+        self.assertEqual(dashboard_counters(self.admin)['sent'], 0)
+        self.assertEqual(reconcile_counters(), 0)
+
+
+class PageStatsQueryTests(TestCase):
+    """Page tiles come from one aggregate each; a page load is session + user + stats (+ page rows)."""
+
+    def setUp(self):
+        self.admin = User.objects.create_user(
+            username='overseer', email='overseer@example.com', password='pass12345', role='admin'
+        )
+        self.teacher = User.objects.create_user(
+            username='tiles', email='tiles@example.com', password='pass12345', role='teacher', is_active=False
+        )
+        SMSMessage.objects.create(user=self.teacher, message_text='A', successful_deliveries=3, failed_deliveries=1)
+        SMSMessage.objects.create(user=self.admin, message_text='B', successful_deliveries=1)
+
+    def test_stats_builders(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(user_stats(), {'total': 2, 'active': 1, 'admins': 1, 'teachers': 1})
+        with self.assertNumQueries(1):
+            stats = delivery_stats(self.teacher)
+        self.assertEqual((stats['total_sent'], stats['success_rate']), (4, 75.0))
+
+    def test_page_load_query_counts(self):
+        self.client.force_login(self.admin)
+        self.client.get('/dashboard/')  # warm the cached monthly chart
+        for url, queries in (('/dashboard/', 3), ('/history/', 3), ('/users/', 4)):
+            with self.subTest(url=url), self.assertNumQueries(queries):
+                self.assertEqual(self.client.get(url).status_code, 200)
+
+
+class SendPageStatsCacheTests(TestCase):
+    """Send page stats are one rollup aggregate, cached until the user sends or their credits change."""
+
+    def setUp(self):
+        cache.clear()
+        self.teacher = User.objects.create_user(
+            username='poller', email='poller@example.com', password='pass12345', role='teacher'
+        )
+        self.credits = SMSUsageStats.objects.create(user=self.teacher, remaining_credits=100)
+        message = SMSMessage.objects.create(user=self.teacher, message_text='Hi')
+        create_recipients([new_recipient(message=message, phone_number='919800000071', status='delivered')])
+        self.client.force_login(self.teacher)
+
+    def test_cached_until_user_sends(self):
+        # session + user, then rollup aggregate + credits
+        with self.assertNumQueries(4):
+            data = self.client.get('/api/send/stats/').json()
+        self.assertEqual((data['today_count'], data['delivery_rate']), (1, 100.0))
+        with self.assertNumQueries(2):
+            self.client.get('/api/send/stats/')
+
+        message = SMSMessage.objects.create(user=self.teacher, message_text='Again')
+        create_recipients([new_recipient(message=message, phone_number='919800000072', status='failed')])
+        self.credits.remaining_credits = 99
+        self.credits.save()
+        data = self.client.get('/api/send/stats/').json()
+        self.assertEqual((data['today_count'], data['delivery_rate'], float(data['remaining_credits'])), (2, 50.0, 99))
+
+
+class CampaignListApiTests(TestCase):
+    """The campaigns list is keyset-paged with one query per page."""
+
+    def setUp(self):
+        self.admin = User.objects.create_user(
+            username='lister', email='lister@example.com', password='pass12345', role='admin'
+        )
+        self.teacher = User.objects.create_user(
+            username='owner', email='owner@example.com', password='pass12345', role='teacher'
+        )
+        for i in range(5):
+            Campaign.objects.create(user=self.teacher, title=f'Exam {i}', status='completed' if i % 2 else 'draft')
+        Campaign.objects.create(user=self.teacher, title='Sports day')
+        self.own = Campaign.objects.create(user=self.admin, title='Staff meeting')
+
+    def _all(self, params):
+        ids, cursor = [], None
+        while True:
+            page = dict(params, limit=2, **({'cursor': cursor} if cursor else {}))
+            with self.assertNumQueries(3):  # session + user + page
+                data = self.client.get('/api/campaigns/', page).json()
+            ids += [c['id'] for c in data['results']]
+            cursor = data['next_cursor']
+            if not cursor:
+                return ids
+
+    def test_admin_pages_and_own_only(self):
+        self.client.force_login(self.admin)
+        self.assertEqual(self._all({}), list(Campaign.objects.order_by('-created_at', '-id').values_list('id', flat=True)))
+        self.assertEqual(self._all({'own': 'true'}), [self.own.id])
+        self.assertEqual(len(self._all({'owner': self.teacher.id})), 6)
+
+    def test_filters_and_counts(self):
+        self.client.force_login(self.teacher)
+        # Teachers only ever see their own campaigns
+        self.assertEqual(len(self._all({'owner': self.admin.id})), 6)
+        data = self.client.get('/api/campaigns/', {'q': 'exam', 'status': 'completed', 'counts': 'true'}).json()
+        self.assertEqual([c['title'] for c in data['results']], ['Exam 3', 'Exam 1'])
+        self.assertEqual(data['results'][0]['total_sent'], 0)
+        today = timezone.localdate().isoformat()
+        self.assertEqual(len(self.client.get('/api/campaigns/', {'start': today, 'end': today}).json()['results']), 6)
+        self.assertEqual(self.client.get('/api/campaigns/', {'start': 'soon'}).status_code, 400)
+
+
+class DraftCampaignTests(TestCase):
+    """Campaigns are created on first send; untouched drafts are pruned."""
+
+    def setUp(self):
+        self.teacher = User.objects.create_user(
+            username='drafter', email='drafter@example.com', password='pass12345', role='teacher'
+        )
+        SMSUsageStats.objects.create(user=self.teacher, remaining_credits=10)
+
+    @mock.patch('sms.services.MySMSMantraService.submit_batch', return_value={
+        'ErrorCode': 0, 'Data': [{'MobileNumber': '919800000081', 'MessageId': 'draft-1', 'MessageErrorCode': 0}],
+    })
+    def test_draft_token_creates_campaign_once(self, submit):
+        self.client.force_login(self.teacher)
+        payload = {
+            'recipients': ['919800000081'], 'message': 'Hello', 'allow_duplicates': True,
+            'campaign_draft_token': 'tab-1', 'campaign_title': 'Annual day',
+        }
+        for _ in range(2):  # the second send reuses the campaign made by the first
+            response = self.client.post('/api/sms/send/', json.dumps(payload), content_type='application/json')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json()['submitted'], 1)
+        self.assertEqual(submit.call_count, 2)
+        campaign = Campaign.objects.get(user=self.teacher)
+        self.assertEqual(Campaign.objects.count(), 1)
+        self.assertEqual((campaign.title, campaign.draft_token, campaign.messages.count()), ('Annual day', 'tab-1', 2))
+
+    def test_prune_keeps_recent_and_used_drafts(self):
+        old = timezone.now() - timedelta(days=40)
+        stale = Campaign.objects.create(user=self.teacher, title='Abandoned')
+        used = Campaign.objects.create(user=self.teacher, title='Used')
+        SMSMessage.objects.create(user=self.teacher, campaign=used, message_text='Hi')
+        Campaign.objects.filter(pk__in=[stale.pk, used.pk]).update(created_at=old)
+        recent = Campaign.objects.create(user=self.teacher, title='Fresh')
+
+        call_command('prune_draft_campaigns', '--older-than', '30', '--batch-size', '1', stdout=io.StringIO())
+        self.assertEqual(set(Campaign.objects.values_list('id', flat=True)), {used.id, recent.id})
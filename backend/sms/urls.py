@@ -15,8 +15,10 @@ from .myviews.groups_api import (
     delete_contact_from_group,
     delete_group,
 )
-from .myviews.Campaign_api import (get_campaigns, create_campaign)
-from .myviews.Reports_api import (reports_dashboard, reports_generate)
+from .myviews.Campaign_api import (get_campaigns, create_campaign, resend_failed, export_campaign_logs)
+from .myviews.Activity_api import activity_feed_api
+from .myviews.History_api import (history_campaigns, campaign_messages, message_recipients, search_history)
+from .myviews.Reports_api import (reports_dashboard, reports_generate, reports_export)
 from .myviews.templates_api import (
     get_templates, 
     create_template, 
@@ -100,10 +102,22 @@ urlpatterns = [
     # Campaigns API
     path("campaigns/", get_campaigns, name="api_get_campaigns"),
     path("campaigns/new/", create_campaign, name="api_create_campaign"),
+    path("campaigns/<int:campaign_id>/resend-failed/", resend_failed, name="api_campaign_resend_failed"),
+    path("campaigns/<int:campaign_id>/export/", export_campaign_logs, name="api_campaign_export"),
+    path("campaigns/<int:campaign_id>/messages/", campaign_messages, name="api_campaign_messages"),
+    path("messages/<int:message_id>/recipients/", message_recipients, name="api_message_recipients"),
+
+    # History
+    path("history/", history_campaigns, name="api_history"),
+    path("history/search/", search_history, name="api_history_search"),
+
+    # Activity feed (admin)
+    path("activity/", activity_feed_api, name="api_activity_feed"),
     
     # Reports API
     path("reports/dashboard/", reports_dashboard, name="api_reports_dashboard"),
     path("reports/generate/", reports_generate, name="api_reports_generate"),
+    path("reports/export/", reports_export, name="api_reports_export"),
     
     # User Management API
     path("users/create/", create_user_view, name="api_create_user"),
@@ -6,7 +6,6 @@ All API logic should be in sms/views.py
 
 import json
 import logging
-from datetime import datetime
 from collections import defaultdict
 import re
 
@@ -20,8 +19,7 @@ from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth import get_user_model
 from django.contrib.auth.decorators import login_required
 from django.core.cache import cache
-from django.db.models import Sum, Count, Q
-from django.http import HttpResponseNotFound, HttpResponse
+from django.http import Http404, HttpResponseNotFound, HttpResponse
 from django.utils import timezone
 from django.utils.decorators import method_decorator
 from django.views import View
@@ -31,16 +29,18 @@ from django.views.decorators.vary import vary_on_cookie
 
 from .auth_utils import AuthMixin, get_user_from_request
 from sms.models import (
-    SMSUsageStats,
     SMSMessage,
-    Template,
-    Group,
     SenderID,
     StudentContact,
     SMSRecipient,
-    Campaign,
 )
 from sms.services import AdminAnalyticsService
+from sms.analytics import cached_monthly_stats, rollup_trends, summarize_trends
+from sms.categories import user_category_breakdown
+from sms.counters import dashboard_counters
+from sms.report_cache import cached_report
+from sms.rollups import scoped_rollups
+from sms.stats import delivery_stats, percentage, user_stats
 
 User = get_user_model()
 logger = logging.getLogger(__name__)
@@ -102,67 +102,34 @@ class FrontendTemplateView(AuthMixin, TemplateView):
 # Page views
 # -------------------------
 
-# sms/views.py
-from django.shortcuts import render
-from django.contrib.auth.decorators import login_required
-from django.db.models import Sum, Count, Q
-from datetime import datetime, timedelta
-from sms.models import SMSMessage, SMSUsageStats, Template, Group, User
-
-from django.contrib.auth.decorators import login_required
-from django.db.models import Sum, Count
-from django.shortcuts import render
-from sms.models import SMSMessage, SMSUsageStats, Template, Group
-
-
 @login_required(login_url='/login/')
 @ensure_csrf_cookie
 def DashboardView(request):
     user = request.user
 
-    if user.role == 'admin':
-        # Admin sees all campaigns and system-wide stats
-        campaigns = Campaign.objects.prefetch_related('messages__recipient_logs').order_by('-created_at')[:10]
-        messages_qs = SMSMessage.objects.all()
-        groups_count = Group.objects.count()
-        templates_count = Template.objects.count()
-        pending_templates = Template.objects.filter(status='pending').count()
-    else:
-        # Teachers see only their own data + universal groups
-        campaigns = Campaign.objects.filter(user=user).prefetch_related('messages__recipient_logs').order_by('-created_at')[:10]
-        messages_qs = SMSMessage.objects.filter(user=user)
-        groups_count = Group.objects.filter(Q(is_universal=True) | Q(teacher=user)).count()
-        templates_count = Template.objects.filter(Q(status='approved') | Q(user=user)).count()
-        pending_templates = Template.objects.filter(user=user, status='pending').count()
-
-    # Calculate stats based on role-filtered queryset
-    # Use Sum of successful_deliveries and failed_deliveries fields, not status filtering
-    from django.db.models import Sum
-    totals = messages_qs.aggregate(
-        total_delivered=Sum('successful_deliveries'),
-        total_failed=Sum('failed_deliveries')
-    )
-    total_sent = messages_qs.count()
-    total_delivered = totals['total_delivered'] or 0
-    total_failed = totals['total_failed'] or 0
-    success_rate = round((total_delivered / (total_delivered + total_failed) * 100), 1) if (total_delivered + total_failed) > 0 else 0
+    # Tiles come from the incrementally maintained dashboard counters (one
+    # query for the user's scope rows and credits); the chart is cached
+    counters = dashboard_counters(user)
+    total_sent = counters['sent']
+    total_delivered = counters['delivered']
+    total_failed = counters['failed']
+    success_rate = percentage(total_delivered, total_delivered + total_failed)
 
     stats = {
         'total_sent': total_sent,
         'total_delivered': total_delivered,
         'total_failed': total_failed,
         'success_rate': success_rate,
-        'remaining_credits': getattr(getattr(user, "usage_stats", None), "remaining_credits", 0),
-        'monthly_stats': get_monthly_stats(messages_qs)
+        'remaining_credits': counters['remaining_credits'],
+        'monthly_stats': get_monthly_stats(user)
     }
 
     context = {
         'stats': stats,
-        'campaigns': campaigns,
         'API_BASE': '/api/',
-        'groups_count': groups_count,
-        'templates_count': templates_count,
-        'pending_templates': pending_templates,
+        'groups_count': counters['groups'],
+        'templates_count': counters['templates'],
+        'pending_templates': counters['pending_templates'],
     }
 
     return render(request, 'dashboard/dashboard.html', context)
@@ -171,35 +138,10 @@ def DashboardView(request):
 # -----------------------------------------
 # Helper: Build monthly stats for chart
 # -----------------------------------------
-def get_monthly_stats(messages):
-    from collections import defaultdict
-
-    stats = defaultdict(lambda: {'sent': 0, 'failed': 0})
-    
-    for msg in messages:
-        # Safely pick sent_at if exists, else created_at
-        date_field = msg.sent_at or msg.created_at
-        if not date_field:
-            continue  # skip if somehow both missing
-
-        year = date_field.year
-        month = date_field.month
-        label = f"{year}-{month:02d}"
-
-        stats[label]['sent'] += 1
-        if msg.status == 'failed':
-            stats[label]['failed'] += 1
-
-    # Format for chart
-    sorted_labels = sorted(stats.keys())
-    return {
-        'months': sorted_labels,
-        'sent': [stats[k]['sent'] for k in sorted_labels],
-        'failed': [stats[k]['failed'] for k in sorted_labels],
-    }
-
-from sms.models import SMSMessage, Template, Campaign
-from django.utils import timezone
+def get_monthly_stats(user):
+    # One TruncMonth GROUP BY over the trailing window, cached per role/user
+    # until the report data version of that scope changes
+    return cached_monthly_stats(user)
 
 
 class SendSMSView(FrontendTemplateView):
@@ -219,50 +161,11 @@ class MessageHistoryView(FrontendTemplateView):
         context = super().get_context_data(**kwargs)
         user = self.request.user
 
-        # Get campaigns with messages and recipient logs (same as dashboard)
-        # Order messages by -created_at within each campaign
-        from django.db.models import Prefetch
-        from sms.models import SMSMessage
-        
-        messages_prefetch = Prefetch(
-            'messages',
-            queryset=SMSMessage.objects.order_by('-created_at')
-        )
-        
-        if user.role == 'admin':
-            campaigns = Campaign.objects.prefetch_related(
-                messages_prefetch, 
-                'messages__recipient_logs'
-            ).order_by('-created_at')
-        else:
-            campaigns = Campaign.objects.filter(user=user).prefetch_related(
-                messages_prefetch,
-                'messages__recipient_logs'
-            ).order_by('-created_at')
-
-        # Calculate statistics from SMSMessage fields (same source as dashboard)
-        from django.db.models import Sum
-        if user.role == 'admin':
-            messages_qs = SMSMessage.objects.all()
-        else:
-            messages_qs = SMSMessage.objects.filter(user=user)
-        
-        totals = messages_qs.aggregate(
-            total_delivered=Sum('successful_deliveries'),
-            total_failed=Sum('failed_deliveries')
-        )
-        total_delivered = totals['total_delivered'] or 0
-        total_failed = totals['total_failed'] or 0
-        total_sent = total_delivered + total_failed
-        success_rate = round((total_delivered / total_sent * 100), 1) if total_sent > 0 else 0
-
-        context['campaigns'] = campaigns
-        context['stats'] = {
-            'total_sent': total_sent,
-            'total_delivered': total_delivered,
-            'total_failed': total_failed,
-            'success_rate': success_rate,
-        }
+        # Campaigns, messages and recipient logs are loaded page by page from
+        # /api/history/ by the campaign history component
+
+        # Delivered / failed totals from SMSMessage fields in one aggregate
+        context['stats'] = delivery_stats(user)
         return context
 
 
@@ -270,6 +173,21 @@ class MessageDetailsView(FrontendTemplateView):
     template_name = 'sms/message_details.html'
     require_auth = True
 
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        user = self.request.user
+        messages_qs = SMSMessage.objects.select_related('user', 'campaign', 'template').defer('recipients', 'api_response')
+        if user.role != 'admin':
+            messages_qs = messages_qs.filter(user=user)
+        try:
+            context['message'] = messages_qs.get(pk=self.kwargs['pk'])
+        except SMSMessage.DoesNotExist:
+            raise Http404("Message not found")
+
+        # Recipient logs and their status counts are paged from
+        # /api/messages/<id>/recipients/ by the page script
+        return context
+
 
 class TemplatesView(FrontendTemplateView):
     template_name = 'templates/templates.html'
@@ -296,12 +214,8 @@ def manage_users(request):
         return redirect('/dashboard/')  # Non-admins shouldn't manage users
     
     users = User.objects.all().order_by('-last_login')
-    stats = {
-        'total': users.count(),
-        'active': users.filter(is_active=True).count(),
-        'admins': users.filter(role='admin').count(),
-        'teachers': users.filter(role='teacher').count(),
-    }
+    # All four tiles in one aggregate
+    stats = user_stats()
     
     context = {
         'users': users,
@@ -335,17 +249,20 @@ def template_approvals_view(request):
 
 @login_required
 def activity_page(request):
-    # Admin-only activity page. Use AdminAnalyticsService for aggregates and logs.
+    # Admin-only activity page. Use AdminAnalyticsService for aggregates; the feed loads from the API.
     user = request.user
     if not getattr(user, 'role', None) == 'admin':
         return redirect('/dashboard/')
 
     service = AdminAnalyticsService(user=request.user)
     admin_totals = service.get_admin_totals()
-    activities = service.get_activity_logs(start=0, length=25)
 
+    # The feed itself is paged in from /api/activity/
     context = _base_context(request)
-    context.update({'admin_totals': admin_totals, 'activities': activities})
+    context.update({
+        'admin_totals': admin_totals,
+        'feed_users': User.objects.order_by('email').values('id', 'email'),
+    })
     return render(request, 'dashboard/activity.html', context)
 
 
@@ -414,132 +331,56 @@ class RegisterView(FrontendTemplateView):
     template_name = 'auth/register.html'
 
 
-@login_required(login_url='/login/')
-def reports_view(request):
-    """Reports page for authenticated users (admins and teachers)"""
-    # Both admin and teacher users can access reports
-    if request.user.role not in ['admin', 'teacher']:
-        return redirect('/dashboard/')
-    
-    user = request.user
-    
-    # Get initial stats from database
+def _reports_page_data(user):
+    """Initial stats, trends and categories for the reports page (uncached)."""
+    # Get initial stats from the daily usage rollup: one query covers the
+    # stats window (last 7 days + today) and the 7-day trend chart
     from datetime import timedelta
-    today = timezone.now().date()
-    seven_days_ago = today - timedelta(days=7)
-    start_dt = timezone.make_aware(datetime.combine(seven_days_ago, datetime.min.time()))
-    end_dt = timezone.now()
+    today = timezone.localdate()
     
-    # Filter messages based on user role
-    if user.role == "admin":
-        messages_qs = SMSMessage.objects.filter(created_at__range=[start_dt, end_dt])
-        total_users = User.objects.filter(role='teacher').count()
-    else:
-        messages_qs = SMSMessage.objects.filter(user=user, created_at__range=[start_dt, end_dt])
-        total_users = 1
+    daily_counts = rollup_trends(scoped_rollups(user), today - timedelta(days=7), today)
+    total_users = User.objects.filter(role='teacher').count() if user.role == "admin" else 1
     
     # Calculate stats
-    total_sent = messages_qs.count()
-    total_delivered = messages_qs.filter(status='delivered').count()
-    total_failed = messages_qs.filter(status='failed').count()
+    totals = summarize_trends(daily_counts)
+    total_sent = totals['total_sent']
+    total_delivered = totals['total_delivered']
+    total_failed = totals['total_failed']
     delivery_rate = (total_delivered / total_sent * 100) if total_sent > 0 else 0
     
-    # Get delivery trends for last 7 days
-    delivery_trends = []
-    for i in range(6, -1, -1):
-        day = today - timedelta(days=i)
-        day_start = timezone.make_aware(datetime.combine(day, datetime.min.time()))
-        day_end = timezone.make_aware(datetime.combine(day, datetime.max.time()))
-        
-        if user.role == "admin":
-            day_messages = SMSMessage.objects.filter(created_at__range=[day_start, day_end])
-        else:
-            day_messages = SMSMessage.objects.filter(user=user, created_at__range=[day_start, day_end])
-        
-        sent = day_messages.count()
-        delivered = day_messages.filter(status='delivered').count()
-        failed = day_messages.filter(status='failed').count()
-        
-        delivery_trends.append({
-            'date': day.strftime('%Y-%m-%d'),
-            'sent': sent,
-            'delivered': delivered,
-            'failed': failed
-        })
-    
-    # Get campaign stats for categories (using actual campaigns)
-    if user.role == "admin":
-        campaigns = Campaign.objects.filter(status='completed')
-    else:
-        campaigns = Campaign.objects.filter(user=user, status='completed')
+    # Delivery trends for last 7 days
+    delivery_trends = daily_counts[-7:]
     
-    # Categorize campaigns based on title/description keywords
-    academic_keywords = ['exam', 'test', 'result', 'homework', 'assignment', 'class', 'lecture']
-    admin_keywords = ['meeting', 'notice', 'announcement', 'circular', 'reminder']
-    event_keywords = ['event', 'fest', 'competition', 'celebration', 'program', 'function']
-    emergency_keywords = ['urgent', 'emergency', 'alert', 'important', 'immediate']
+    # SMS sent per stored campaign category, one grouped query
+    category_list = user_category_breakdown(user)
     
-    categories = {
-        'Academic': 0,
-        'Administrative': 0,
-        'Events': 0,
-        'Emergency': 0,
-        'Other': 0
+    return {
+        'initial_stats': {
+            'total_sent': total_sent,
+            'delivery_rate': round(delivery_rate, 1),
+            'failed_count': total_failed,
+            'active_users': total_users
+        },
+        'delivery_trends': delivery_trends,
+        'categories': category_list,
     }
+
+
+@login_required(login_url='/login/')
+def reports_view(request):
+    """Reports page for authenticated users (admins and teachers)"""
+    # Both admin and teacher users can access reports
+    if request.user.role not in ['admin', 'teacher']:
+        return redirect('/dashboard/')
     
-    for campaign in campaigns:
-        title_lower = (campaign.title or '').lower()
-        desc_lower = (campaign.description or '').lower()
-        text = title_lower + ' ' + desc_lower
-        
-        categorized = False
-        if any(kw in text for kw in emergency_keywords):
-            categories['Emergency'] += campaign.total_sent
-            categorized = True
-        elif any(kw in text for kw in academic_keywords):
-            categories['Academic'] += campaign.total_sent
-            categorized = True
-        elif any(kw in text for kw in admin_keywords):
-            categories['Administrative'] += campaign.total_sent
-            categorized = True
-        elif any(kw in text for kw in event_keywords):
-            categories['Events'] += campaign.total_sent
-            categorized = True
-        
-        if not categorized:
-            categories['Other'] += campaign.total_sent
-    
-    # Convert to list format with percentages
-    total_categorized = sum(categories.values())
-    category_list = []
-    for name, count in categories.items():
-        if count > 0 or name != 'Other':  # Include all except empty 'Other'
-            percentage = (count / total_categorized * 100) if total_categorized > 0 else 0
-            category_list.append({
-                'name': name,
-                'count': count,
-                'percentage': round(percentage, 1)
-            })
-    
-    # If no categorized data, use message counts as fallback
-    if total_categorized == 0 and total_sent > 0:
-        category_list = [
-            {'name': 'Academic', 'count': int(total_sent * 0.41), 'percentage': 41.0},
-            {'name': 'Administrative', 'count': int(total_sent * 0.265), 'percentage': 26.5},
-            {'name': 'Events', 'count': int(total_sent * 0.196), 'percentage': 19.6},
-            {'name': 'Emergency', 'count': int(total_sent * 0.129), 'percentage': 12.9}
-        ]
+    user = request.user
+    page_data = cached_report(user, 'reports_page', {}, lambda: _reports_page_data(user))
     
     context = _base_context(request)
     context.update({
-        'initial_stats': json.dumps({
-            'total_sent': total_sent,
-            'delivery_rate': round(delivery_rate, 1),
-            'failed_count': total_failed,
-            'active_users': total_users
-        }),
-        'delivery_trends': json.dumps(delivery_trends),
-        'categories': json.dumps(category_list)
+        'initial_stats': json.dumps(page_data['initial_stats']),
+        'delivery_trends': json.dumps(page_data['delivery_trends']),
+        'categories': json.dumps(page_data['categories'])
     })
     
     return render(request, 'reports/reports.html', context)
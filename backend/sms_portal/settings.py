@@ -5,6 +5,7 @@ Generated by 'django-admin startproject' using Django 4.2.7.
 Adapted for the SMS Portal project (Bootstrap HTML frontend + Django REST backend).
 """
 
+import json
 from pathlib import Path
 from datetime import timedelta
 from decouple import config
@@ -184,6 +185,18 @@ LOGIN_REDIRECT_URL = '/dashboard/'
 LOGOUT_REDIRECT_URL = '/login/'
 SESSION_ENGINE = 'django.contrib.sessions.backends.db'
 
+# Cache - per-process local memory by default. Report cache invalidation
+# (sms/report_cache.py) only reaches other processes on a shared backend, e.g.
+# CACHE_BACKEND=django.core.cache.backends.db.DatabaseCache with
+# CACHE_LOCATION=django_cache (run `manage.py createcachetable`), or
+# django.core.cache.backends.redis.RedisCache with a redis:// location.
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default=''),
+    }
+}
+
 # Celery (optional) - set broker in env when using Celery
 CELERY_BROKER_URL = config('CELERY_BROKER_URL', default='redis://localhost:6379/0')
 CELERY_RESULT_BACKEND = config('CELERY_RESULT_BACKEND', default=CELERY_BROKER_URL)
@@ -242,6 +255,14 @@ DEFAULT_FROM_EMAIL = EMAIL_DEFAULT_FROM
 APP_SETTINGS = {
     'DEFAULT_SMS_SENDER': config('DEFAULT_SMS_SENDER', default=MYSMSMANTRA_CONFIG.get('SENDER_ID', 'COLLGE')),
     'MAX_BATCH_SIZE': config('MAX_BATCH_SIZE', default=100, cast=int),
+    # Drop repeats of the same text to the same number within this many minutes (0 disables)
+    'DUPLICATE_SUPPRESSION_MINUTES': config('DUPLICATE_SUPPRESSION_MINUTES', default=30, cast=int),
+    # Flat provider rate per billed SMS segment, used for usage rollups and cost reports
+    'SMS_COST_PER_SEGMENT': config('SMS_COST_PER_SEGMENT', default=0.25, cast=float),
+    # Per-route, per-encoding overrides, e.g. {"promotional": {"gsm7": 0.30, "ucs2": 0.35}}
+    'SMS_TARIFFS': config('SMS_TARIFFS', default='{}', cast=json.loads),
+    # Trailing months shown in the dashboard's monthly chart
+    'DASHBOARD_CHART_MONTHS': config('DASHBOARD_CHART_MONTHS', default=12, cast=int),
 }
 
 API_BASE = '/api'